@@ -1,5 +1,6 @@
 """CCL's abstract syntax tree elements"""
 
+import copy
 from enum import Enum
 from typing import List, Optional, Iterator, Any, Tuple, Union, TYPE_CHECKING
 
@@ -109,6 +110,46 @@ def search_ast_element(node: ASTNode, query: ASTNode) -> Optional[ASTNode]:
     return None
 
 
+def replace_node(old: ASTNode, new: ASTNode) -> None:
+    """Replace a node in AST by another one"""
+    parent = old.parent
+    assert parent is not None
+    for attr, value in parent:
+        if isinstance(value, list):
+            value[:] = [new if item is old else item for item in value]
+        elif isinstance(value, tuple):
+            setattr(parent, attr, tuple(new if item is old else item for item in value))
+        elif value is old:
+            setattr(parent, attr, new)
+
+    new.parent = parent
+    set_parent_nodes(new)
+
+
+def copy_path(old: ASTNode, new: ASTNode) -> ASTNode:
+    """Return a copy of AST with a node replaced by another one
+
+    Only the ancestors of the node are copied, the rest of AST is shared with the original one and its nodes keep
+    their original parents.
+    """
+    set_parent_nodes(new)
+    child, replacement = old, new
+    while child.parent is not None:
+        parent = copy.copy(child.parent)
+        for attr, value in child.parent:
+            if isinstance(value, list):
+                setattr(parent, attr, [replacement if item is child else item for item in value])
+            elif isinstance(value, tuple):
+                setattr(parent, attr, tuple(replacement if item is child else item for item in value))
+            elif value is child:
+                setattr(parent, attr, replacement)
+
+        replacement.parent = parent
+        child, replacement = child.parent, parent
+
+    return replacement
+
+
 class Statement(ASTNode):
     """Base class for every statement in CCL"""
 
@@ -167,6 +208,18 @@ class RegressionExpr(Expression):
         return NumericType.FLOAT
 
 
+class RegressionProgram(Expression):
+    """Placeholder for symbolic regression evaluated by the runtime interpreter using the values of the terminals"""
+
+    def __init__(self, pos: Tuple[int, int], terminals: List[Expression]) -> None:
+        super().__init__(pos)
+        self.terminals: List[Expression] = terminals
+
+    @property
+    def result_type(self) -> NumericType:
+        return NumericType.FLOAT
+
+
 class Number(Expression):
     """Integer or floating point number"""
     def __init__(self, pos: Tuple[int, int], val: Union[int, float], ntype: NumericType) -> None:
@@ -17,6 +17,20 @@ with open(os.path.join(os.path.dirname(__file__), 'templates', 'method.cpp')) as
 with open(os.path.join(os.path.dirname(__file__), 'templates', 'CMakeLists.txt')) as template_f:
     cmake_template = template_f.read()
 
+with open(os.path.join(os.path.dirname(__file__), 'templates', 'regression.h')) as template_f:
+    regression_template = template_f.read()
+
+method_export_template = 'CHARGEFW2_METHOD({method_name})'
+
+regression_function_template = 'extern "C" double {name}({args});'
+
+# ChargeFW2 exports the method object under the name 'method', rename it so that more methods can share a library
+renamed_method_export_template = '''\
+#define method {export_name}
+CHARGEFW2_METHOD({method_name})
+#undef method
+'''
+
 sys_include_template = '#include <{file}>'
 
 user_include_template = '#include "{file}"'
@@ -90,6 +104,13 @@ Eigen::VectorXd {method_name}::_EE_{number}({args}) const {{
 }}
 '''
 
+# Supported since CMake 3.16
+precompiled_headers_template = '''\
+if(COMMAND target_precompile_headers)
+    target_precompile_headers(method PRIVATE {headers})
+endif()
+'''
+
 functions = {
     'electronegativity': 'electronegativity',
     'covalent radius': 'covalent_radius',
@@ -117,6 +138,11 @@ class Cpp(ast.ASTVisitor):
 
         self.output_dir: Optional[str] = cast(str, kwargs.get('output_dir', None))
         self.format_code: bool = cast(bool, kwargs.get('format_code', True))
+        self.class_name: Optional[str] = cast(str, kwargs.get('class_name', None))
+        self.export_name: Optional[str] = cast(str, kwargs.get('export_name', None))
+        self.precompiled_headers: bool = cast(bool, kwargs.get('precompiled_headers', True))
+        self.inline_header: bool = cast(bool, kwargs.get('inline_header', False))
+        self.regression_function: Optional[str] = cast(str, kwargs.get('regression_function', None))
 
         self.sys_includes: Set[str] = set()
         self.user_includes: Set[str] = set()
@@ -133,6 +159,8 @@ class Cpp(ast.ASTVisitor):
 
         self.substitutions_needing_q: Set[str] = set()
 
+        self.uses_regression_program: bool = False
+
     def define_substitutions(self) -> None:
         assert self.symbol_table.parent is not None
         table = self.symbol_table.parent
@@ -187,7 +215,10 @@ class Cpp(ast.ASTVisitor):
 
     def visit_Method(self, node: ast.Method) -> str:
 
-        self.method_name = node.name.capitalize()
+        if self.class_name is not None:
+            self.method_name = self.class_name
+        else:
+            self.method_name = node.name.capitalize()
 
         self.define_substitutions()
 
@@ -195,10 +226,10 @@ class Cpp(ast.ASTVisitor):
         for statement in node.statements:
             code.append(self.visit(statement))
 
-        sys_includes = [sys_include_template.format(file=file) for file in self.sys_includes]
+        sys_includes = [sys_include_template.format(file=file) for file in sorted(self.sys_includes)]
         sys_include_str = '\n'.join(sys_includes)
 
-        user_includes = [user_include_template.format(file=file) for file in self.user_includes]
+        user_includes = [user_include_template.format(file=file) for file in sorted(self.user_includes)]
         user_include_str = '\n'.join(user_includes)
 
         code_str = '\n'.join(code)
@@ -208,8 +239,17 @@ class Cpp(ast.ASTVisitor):
         prototypes_str = '\n'.join(self.prototypes)
 
         var_defs_str = '\n'.join(var_def for var_def in self.var_definitions.values())
+        if self.uses_regression_program:
+            var_defs_str += '\nccl_regression::load_program();'
+
+        if self.export_name is not None:
+            method_export_str = renamed_method_export_template.format(method_name=self.method_name,
+                                                                      export_name=self.export_name)
+        else:
+            method_export_str = method_export_template.format(method_name=self.method_name)
 
         method = method_template.format(method_name=self.method_name,
+                                        method_export=method_export_str,
                                         sys_includes=sys_include_str,
                                         user_includes=user_include_str,
                                         defs=defs_str,
@@ -249,11 +289,11 @@ class Cpp(ast.ASTVisitor):
             common_parameters_enum_str = 'enum common{{{cp_spec}}};'.format(cp_spec=', '.join(common_parameters))
             common_parameters_str = ', '.join(f'"{par}"' for par in common_parameters)
 
-        required_features_str = ', '.join(self.required_features)
+        required_features_str = ', '.join(sorted(self.required_features))
 
         method_type = 'EEMethod' if self.ee_count else 'Method'
 
-        header = header_template.format(method_name=node.name.capitalize(),
+        header = header_template.format(method_name=self.method_name,
                                         method_type=method_type,
                                         common_parameters_enum=common_parameters_enum_str,
                                         atom_parameters_enum=atom_parameters_enum_str,
@@ -271,6 +311,15 @@ class Cpp(ast.ASTVisitor):
             p = subprocess.run(args, input=method.encode('ascii'), stdout=subprocess.PIPE)
             method = p.stdout.decode('ascii')
 
+        if self.inline_header:
+            # Single translation unit the compiler can read from its standard input
+            inlined = {'ccl_method.h': header}
+            if self.uses_regression_program:
+                inlined['ccl_regression.h'] = regression_template
+            for file, content in inlined.items():
+                method = method.replace(user_include_template.format(file=file), content.replace('#pragma once', ''))
+            return method
+
         if self.output_dir is not None:
             with open(os.path.join(self.output_dir, 'ccl_method.cpp'), 'w') as f:
                 f.write(method)
@@ -278,8 +327,24 @@ class Cpp(ast.ASTVisitor):
             with open(os.path.join(self.output_dir, 'ccl_method.h'), 'w') as f:
                 f.write(header)
 
+            precompiled_headers_str = ''
+            if self.precompiled_headers:
+                headers = ['<vector>', '<Eigen/LU>', '<functional>',
+                           *(f'<{file}>' for file in sorted(self.sys_includes)),
+                           '[["structures/molecule.h"]]', '[["method.h"]]',
+                           *(f'[["{file}"]]' for file in sorted(self.user_includes) if not file.startswith('ccl_'))]
+                precompiled_headers_str = precompiled_headers_template.format(headers=' '.join(headers))
+
             with open(os.path.join(self.output_dir, 'CMakeLists.txt'), 'w') as f:
-                f.write(cmake_template.format(method_name=node.name))
+                f.write(cmake_template.format(method_name=node.name, precompiled_headers=precompiled_headers_str))
+
+            if self.uses_regression_program:
+                with open(os.path.join(self.output_dir, 'ccl_regression.h'), 'w') as f:
+                    f.write(regression_template)
+
+        if self.uses_regression_program:
+            return f'// ccl_method.h\n\n{header}\n// ccl_method.cpp\n\n{method}\n' \
+                   f'// ccl_regression.h\n\n{regression_template}'
 
         return f'// ccl_method.h\n\n{header}\n// ccl_method.cpp\n\n{method}'
 
@@ -383,6 +448,21 @@ class Cpp(ast.ASTVisitor):
 
         return f'_{node.val}'
 
+    def visit_RegressionProgram(self, node: ast.RegressionProgram) -> str:
+        if self.regression_function is not None:
+            # Expression is compiled separately and linked with the method
+            declaration = regression_function_template.format(name=self.regression_function,
+                                                              args=', '.join(['double'] * len(node.terminals)))
+            if declaration not in self.defs:
+                self.defs.insert(0, declaration)
+            terminals = ', '.join(self.visit(terminal) for terminal in node.terminals)
+            return f'{self.regression_function}({terminals})'
+
+        self.uses_regression_program = True
+        self.user_includes.add('ccl_regression.h')
+        terminals = ', '.join(self.visit(terminal) for terminal in node.terminals)
+        return f'ccl_regression::evaluate({{{terminals}}})'
+
     @staticmethod
     def visit_Number(node: ast.Number) -> str:
         return f'{node.val}'
@@ -466,7 +546,7 @@ class Cpp(ast.ASTVisitor):
         formal_args = ['const Molecule &molecule']
         args = ['molecule']
 
-        for name in used_names:
+        for name in sorted(used_names):
             s = self.symbol_table.parent.resolve(name)
             if s is None:
                 local_symbol = symboltable.SymbolTable.get_table_for_node(node).resolve(name)
@@ -547,7 +627,7 @@ class Cpp(ast.ASTVisitor):
         args = ['atoms, total_charge']
         captures = ['this']
 
-        for name in used_names:
+        for name in sorted(used_names):
             s = self.symbol_table.parent.resolve(name)
             if s is None:
                 local_symbol = symboltable.SymbolTable.get_table_for_node(node).resolve(name)
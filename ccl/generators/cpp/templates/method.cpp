@@ -7,7 +7,7 @@
 #include "ccl_method.h"
 {user_includes}
 
-CHARGEFW2_METHOD({method_name})
+{method_export}
 
 {defs}
 
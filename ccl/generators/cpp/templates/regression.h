@@ -0,0 +1,139 @@
+#pragma once
+
+#include <cctype>
+#include <cmath>
+#include <cstdlib>
+#include <initializer_list>
+#include <sstream>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+// Stack-based interpreter of the expressions found by the symbolic regression. The program is set by the caller of
+// the library through ccl_regression_set_program as a space-separated list of instructions in reversed prefix order:
+// numbers are constants, @N pushes the value of the N-th terminal, anything else is a name of an operation.
+
+namespace ccl_regression {
+
+inline std::string &program_source() {
+    static std::string source;
+    return source;
+}
+
+enum class Op {
+    CONST, TERM, ADD, SUB, MUL, DIV, SQRT, CBRT, SQUARE, CUBE, EXP, INV, DOUBLE, HALF,
+    SIN, COS, TAN, SINH, COSH, TANH
+};
+
+struct Instruction {
+    Op op;
+    double value;
+    size_t index;
+};
+
+struct Program {
+    std::string source;
+    std::vector<Instruction> code;
+    std::vector<double> stack;
+};
+
+inline Program &current_program() {
+    thread_local Program program;
+    return program;
+}
+
+inline Op parse_op(const std::string &name) {
+    static const std::pair<const char *, Op> ops[] = {
+        {"add", Op::ADD}, {"sub", Op::SUB}, {"mul", Op::MUL}, {"div", Op::DIV}, {"sqrt", Op::SQRT},
+        {"cbrt", Op::CBRT}, {"square", Op::SQUARE}, {"cube", Op::CUBE}, {"exp", Op::EXP}, {"inv", Op::INV},
+        {"double", Op::DOUBLE}, {"half", Op::HALF}, {"sin", Op::SIN}, {"cos", Op::COS}, {"tan", Op::TAN},
+        {"sinh", Op::SINH}, {"cosh", Op::COSH}, {"tanh", Op::TANH}
+    };
+    for (const auto &[op_name, op]: ops) {
+        if (name == op_name) {
+            return op;
+        }
+    }
+    throw std::runtime_error("Unknown regression instruction: " + name);
+}
+
+// Parse the program set by the caller unless it is the same as the one already loaded
+inline void load_program() {
+    auto &program = current_program();
+    const std::string &source = program_source();
+    if (source == program.source && !program.code.empty()) {
+        return;
+    }
+
+    program.source = source;
+    program.code.clear();
+
+    std::istringstream in(source);
+    std::string token;
+    while (in >> token) {
+        if (token[0] == '@') {
+            program.code.push_back({Op::TERM, 0.0, std::stoul(token.substr(1))});
+        } else if (std::isdigit(token[0]) || token[0] == '-' || token[0] == '.') {
+            program.code.push_back({Op::CONST, std::stod(token), 0});
+        } else {
+            program.code.push_back({parse_op(token), 0.0, 0});
+        }
+    }
+    program.stack.reserve(program.code.size());
+}
+
+inline double evaluate(std::initializer_list<double> terminals) {
+    auto &program = current_program();
+    auto &stack = program.stack;
+    stack.clear();
+
+    auto pop = [&stack]() {
+        double x = stack.back();
+        stack.pop_back();
+        return x;
+    };
+
+    const double *t = terminals.begin();
+    for (const auto &ins: program.code) {
+        if (ins.op == Op::CONST) {
+            stack.push_back(ins.value);
+            continue;
+        }
+        if (ins.op == Op::TERM) {
+            stack.push_back(t[ins.index]);
+            continue;
+        }
+
+        double x = pop();
+        switch (ins.op) {
+            case Op::ADD: x = x + pop(); break;
+            case Op::SUB: x = x - pop(); break;
+            case Op::MUL: x = x * pop(); break;
+            case Op::DIV: x = x / pop(); break;
+            case Op::SQRT: x = std::sqrt(x); break;
+            case Op::CBRT: x = std::pow(x, 1.0 / 3.0); break;
+            case Op::SQUARE: x = std::pow(x, 2.0); break;
+            case Op::CUBE: x = std::pow(x, 3.0); break;
+            case Op::EXP: x = std::exp(x); break;
+            case Op::INV: x = 1.0 / x; break;
+            case Op::DOUBLE: x = 2.0 * x; break;
+            case Op::HALF: x = 0.5 * x; break;
+            case Op::SIN: x = std::sin(x); break;
+            case Op::COS: x = std::cos(x); break;
+            case Op::TAN: x = std::tan(x); break;
+            case Op::SINH: x = std::sinh(x); break;
+            case Op::COSH: x = std::cosh(x); break;
+            case Op::TANH: x = std::tanh(x); break;
+            default: break;
+        }
+        stack.push_back(x);
+    }
+
+    return stack.empty() ? NAN : stack.back();
+}
+
+}
+
+extern "C" __attribute__((visibility("default"))) void ccl_regression_set_program(const char *source) {
+    ccl_regression::program_source() = source;
+}
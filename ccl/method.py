@@ -1,13 +1,14 @@
 """CCL Method"""
 
+import copy
 import importlib
 from typing import Union, Optional
 
 import ccl.ast
 import ccl.types
 from ccl.parser import process_source
-from ccl.symboltable import SymbolTable
-from ccl.errors import CCLError
+from ccl.symboltable import SymbolTable, SubstitutionSymbol
+from ccl.errors import CCLError, CCLTypeError
 from ccl.complexity import Complexity
 from ccl.regression import run_symbolic_regression
 
@@ -45,6 +46,44 @@ class CCLMethod:
         """Return the expression node {} used for symbolic regression"""
         return ccl.ast.search_ast_element(self.ast, ccl.ast.RegressionExpr((-1, -1)))
 
+    def substitute_regression_expr(self, expr: ccl.ast.Expression, code: str) -> 'CCLMethod':
+        """Return a copy of the method with the expression {} replaced by the given one
+
+        The method is not parsed and analyzed again, only the types of the new expression are checked. The code of the
+        expression replaces the placeholder in the source of the new method.
+        """
+        placeholder = self.get_regression_expr()
+        if placeholder is None:
+            raise CCLError('Method has no regression expression to substitute')
+
+        node = placeholder
+        while node is not None and not isinstance(node, ccl.ast.Substitution):
+            node = node.parent
+
+        if node is None:
+            # Nodes outside the path to the placeholder and the symbol table are shared with the skeleton
+            method_ast = ccl.ast.copy_path(placeholder, expr)
+            table = self.symbol_table
+        else:
+            # Rules of the substitution symbols refer to their expressions, so the symbol table is copied as well
+            method_ast, table, placeholder = copy.deepcopy((self.ast, self.symbol_table, placeholder))
+            ccl.ast.replace_node(placeholder, expr)
+            for symbol in table.get_symbols(recursive=True):
+                if isinstance(symbol, SubstitutionSymbol):
+                    for constraint, rule in symbol.rules.items():
+                        if rule is placeholder:
+                            symbol.rules[constraint] = expr
+
+        SymbolTable.check_expression(expr)
+        if not isinstance(expr.result_type, ccl.types.NumericType):
+            raise CCLTypeError(expr, f'Regression expression has to be a Number not {expr.result_type}.')
+
+        method = self.__class__.__new__(self.__class__)
+        method.source = self.source.format(f'({code})')
+        method.symbol_table = table
+        method.ast = method_ast
+        return method
+
     def get_complexity(self, asymptotic: bool = True) -> str:
         """Return complexity of a method in CCL"""
 
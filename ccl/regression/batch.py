@@ -0,0 +1,157 @@
+"""Evaluate a batch of individuals compiled together into a single object file"""
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple, Optional
+
+import ccl.regression.evaluate as evaluate_module
+from ccl.regression.evaluate import INVALID_RESULT, EncodedIndividual, prepare_individual, run_compiler, \
+    evaluate_library, get_compile_flags, with_precompiled_header, get_compiler_limits
+from ccl.regression.pch import common_header
+
+
+batch_include_template = '#include "{directory}/ccl_method.cpp"'
+
+# Source of an individual compiled alone with its class and exported method renamed, so that the members of a batch
+# do not clash. The common headers are already included, so only the individual's own code is renamed.
+batch_member_template = '''\
+#define {class_name} {class_name}_{suffix}
+#define method ccl_method_{suffix}
+{source}
+#undef method
+#undef {class_name}
+'''
+
+
+def get_member_suffix(individual: EncodedIndividual) -> str:
+    """Return the suffix of the names of the individual's method, it is the same in all batches"""
+    return hashlib.sha256(individual.code.encode('utf-8')).hexdigest()[:16]
+
+
+def get_batch_compiler_args(options: dict) -> List[str]:
+    """Return the arguments used to compile a batch of methods into an object file"""
+    return ['g++', *get_compile_flags(options), '-c', '-o', 'batch.o', 'batch.cpp']
+
+
+def get_link_args(options: dict, export_name: str, object_file: str, library: str) -> List[str]:
+    """Return the arguments used to create a library exporting a single method from the batch object file"""
+    chargefw2_dir = options['chargefw2_dir']
+
+    return ['g++', '-s', '-shared', '-Wl,-soname,libREGRESSION.so', f'-Wl,--defsym,method={export_name}',
+            f'-L{chargefw2_dir}/lib', f'-Wl,-rpath,{chargefw2_dir}lib:', '-o', library, object_file, '-lchargefw2']
+
+
+def compile_batch(directory: str, members: List[Tuple[int, str]], options: dict,
+                  message_queue: multiprocessing.Queue) -> List[Tuple[str, List[int]]]:
+    """Compile the members into object files
+
+    If the batch fails to compile, it is split into halves which are compiled separately, so that only the
+    individuals that cannot be compiled are isolated. Batch exceeding the compiler time limit is split the same way.
+    Returns the list of object files with the members they contain.
+    """
+    batch_dir = tempfile.mkdtemp(prefix='batch_', dir=directory)
+    with open(os.path.join(batch_dir, 'batch.cpp'), 'w') as f:
+        # Parsing the common headers once per batch instead of once per individual is the main source of the speedup
+        f.write(common_header)
+        for _, member_dir in members:
+            f.write(batch_include_template.format(directory=member_dir) + '\n')
+
+    description = ', '.join(f'#{idx}' for idx, _ in members)
+    try:
+        compiled = run_compiler(with_precompiled_header(get_batch_compiler_args(options)), batch_dir,
+                                f'batch of individuals {description}', message_queue, **get_compiler_limits(options))
+    except subprocess.TimeoutExpired:
+        print(f'Compilation timed out: batch of individuals {description}', file=sys.stderr)
+        compiled = False
+
+    if compiled:
+        return [(os.path.join(batch_dir, 'batch.o'), [idx for idx, _ in members])]
+
+    if len(members) == 1:
+        return []
+
+    half = len(members) // 2
+    return compile_batch(directory, members[:half], options, message_queue) + \
+        compile_batch(directory, members[half:], options, message_queue)
+
+
+def evaluate_batch(individuals: List[EncodedIndividual]) -> List[Tuple[float, float, float, float, float]]:
+    """Evaluate individuals, those not found in caches are compiled together as a single translation unit
+
+    Each individual is translated into the same source as when it is compiled alone, so the libraries and their
+    fitness in the persistent cache are shared with the other modes of evaluation.
+    """
+    method_skeleton, cache, _, options, message_queue = evaluate_module.context
+    results: List[Optional[Tuple[float, float, float, float, float]]] = [None] * len(individuals)
+
+    tmpdir = tempfile.mkdtemp(prefix='ccl_regression_batch_', dir=evaluate_module.build_directory)
+    keys: List[Optional[str]] = [None] * len(individuals)
+    libraries: List[Optional[str]] = [None] * len(individuals)
+    # Links to the libraries from the persistent cache, they are outside of the batch's directory
+    cached_libraries: List[str] = []
+    try:
+        members: List[Tuple[int, str]] = []
+        # Individuals with the same source as an earlier member would export the same names, they share its result
+        emitted: Dict[str, int] = {}
+        duplicates: Dict[int, int] = {}
+        for idx, individual in enumerate(individuals):
+            prepared = prepare_individual(individual, method_skeleton, cache, options, message_queue)
+            if prepared.result is not None:
+                results[idx] = prepared.result
+                continue
+
+            keys[idx] = prepared.key
+            if prepared.library is not None:
+                libraries[idx] = prepared.library
+                cached_libraries.append(prepared.library)
+                continue
+
+            if prepared.source in emitted:
+                duplicates[idx] = emitted[prepared.source]
+                continue
+            emitted[prepared.source] = idx
+
+            member_dir = os.path.join(tmpdir, f'ind_{idx}')
+            os.mkdir(member_dir)
+            with open(os.path.join(member_dir, 'ccl_method.cpp'), 'w') as f:
+                f.write(batch_member_template.format(class_name=method_skeleton.name.capitalize(),
+                                                     suffix=get_member_suffix(individual), source=prepared.source))
+            members.append((idx, member_dir))
+
+        if members:
+            for object_file, compiled in compile_batch(tmpdir, members, options, message_queue):
+                for idx in compiled:
+                    library = os.path.join(tmpdir, f'ind_{idx}', 'libREGRESSION.so')
+                    link_args = get_link_args(options, f'ccl_method_{get_member_suffix(individuals[idx])}',
+                                              object_file, library)
+                    if not run_compiler(link_args, tmpdir, individuals[idx].code):
+                        continue
+
+                    libraries[idx] = library
+                    if keys[idx] is not None:
+                        evaluate_module.library_cache.store_library(keys[idx], library)
+
+        for idx, individual in enumerate(individuals):
+            if results[idx] is not None or idx in duplicates:
+                continue
+            if libraries[idx] is None:
+                results[idx] = INVALID_RESULT
+                continue
+
+            results[idx] = evaluate_library(individual, libraries[idx], keys[idx], cache, options, message_queue)
+
+        for idx, original in duplicates.items():
+            results[idx] = results[original]
+            cache[individuals[idx].sympy_code] = results[idx]
+            message_queue.put(('Cached', individuals[idx].sympy_code, results[idx]))
+    finally:
+        shutil.rmtree(tmpdir)
+        for library in cached_libraries:
+            os.remove(library)
+
+    return results
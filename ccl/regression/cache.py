@@ -0,0 +1,284 @@
+"""Caches of compiled regression libraries and fitness values"""
+
+import collections
+import contextlib
+import errno
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def file_digest(filename: Optional[str]) -> str:
+    """Return SHA-256 digest of a file's content (empty string for no file)"""
+    if filename is None:
+        return ''
+
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def data_digest(dataset: str, ref_charges: str, parameters: Optional[str]) -> str:
+    """Return a digest identifying the combination of input files"""
+    h = hashlib.sha256()
+    for filename in (dataset, ref_charges, parameters):
+        h.update(file_digest(filename).encode('ascii'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class LibraryCache:
+    """Content-addressed store of compiled libraries and their fitness values
+
+    Libraries are keyed by the hash of the generated C++ code and the compiler arguments, the fitness values are keyed
+    additionally by the digest of the dataset, reference charges and parameters. The index is kept in a sqlite database
+    in WAL mode, so that all worker processes can access the cache concurrently. When the total size of the stored
+    libraries exceeds the limit, the least recently used ones are evicted.
+    """
+
+    def __init__(self, directory: str, size_limit: int, digest: str) -> None:
+        self.directory: str = directory
+        self.size_limit: int = size_limit
+        self.digest: str = digest
+
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __getstate__(self) -> dict:
+        # sqlite connection cannot be shared between processes, each one opens its own
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_pid'] = None
+        return state
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Return the connection to the index valid in the current process"""
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), timeout=60,
+                                               isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS libraries '
+                                     '(key TEXT PRIMARY KEY, size INTEGER, last_access REAL)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS fitness '
+                                     '(key TEXT, digest TEXT, rmsd REAL, r2 REAL, dmax REAL, davg REAL, '
+                                     'PRIMARY KEY (key, digest))')
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def make_key(source: str, compiler_args: Sequence[str]) -> str:
+        """Return the key of a library compiled from the source using the given compiler arguments"""
+        h = hashlib.sha256()
+        h.update(source.encode('utf-8'))
+        for arg in compiler_args:
+            h.update(b'\0')
+            h.update(arg.encode('utf-8'))
+        return h.hexdigest()
+
+    def _library_filename(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.so')
+
+    def get_fitness(self, key: str) -> Optional[Tuple[float, float, float, float]]:
+        """Return the stored fitness of a library evaluated on the current data"""
+        row = self.connection.execute('SELECT rmsd, r2, dmax, davg FROM fitness WHERE key = ? AND digest = ?',
+                                      (key, self.digest)).fetchone()
+        if row is None:
+            return None
+
+        return tuple(_to_float(x) for x in row)
+
+    def get_library(self, key: str, directory: Optional[str]) -> Optional[str]:
+        """Return a private link in the directory to a stored library or None if not present
+
+        Another process may evict the library at any time, the link keeps it until the caller removes the link.
+        Library is copied if the directory is on another file system.
+        """
+        cursor = self.connection.execute('UPDATE libraries SET last_access = ? WHERE key = ?', (time.time(), key))
+        if cursor.rowcount == 0:
+            return None
+
+        fd, library = tempfile.mkstemp(prefix='lib', suffix='.so', dir=directory)
+        os.close(fd)
+        os.remove(library)
+        try:
+            try:
+                os.link(self._library_filename(key), library)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.copyfile(self._library_filename(key), library)
+        except FileNotFoundError:
+            # Evicted since the index was updated
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(library)
+            return None
+
+        return library
+
+    def store_library(self, key: str, library: str) -> str:
+        """Copy the compiled library to the store and return its new location"""
+        filename = self._library_filename(key)
+        fd, tmp_filename = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(library, tmp_filename)
+            os.replace(tmp_filename, filename)
+        except OSError:
+            os.unlink(tmp_filename)
+            raise
+
+        self.connection.execute('INSERT OR REPLACE INTO libraries VALUES (?, ?, ?)',
+                                (key, os.path.getsize(filename), time.time()))
+        self._evict()
+        return filename
+
+    def store_fitness(self, key: str, fitness: Tuple[float, float, float, float]) -> None:
+        """Store the fitness of a library evaluated on the current data"""
+        self.connection.execute('INSERT OR REPLACE INTO fitness VALUES (?, ?, ?, ?, ?, ?)',
+                                (key, self.digest, *(float(x) for x in fitness)))
+
+    def _evict(self) -> None:
+        """Remove least recently used libraries until the size limit is met"""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            total_size, = connection.execute('SELECT COALESCE(SUM(size), 0) FROM libraries').fetchone()
+            evicted = []
+            if total_size > self.size_limit:
+                for key, size in connection.execute('SELECT key, size FROM libraries ORDER BY last_access'):
+                    if total_size <= self.size_limit:
+                        break
+                    evicted.append(key)
+                    total_size -= size
+
+                connection.executemany('DELETE FROM libraries WHERE key = ?', ((key,) for key in evicted))
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            connection.execute('ROLLBACK')
+            raise
+
+        for key in evicted:
+            try:
+                os.unlink(self._library_filename(key))
+            except FileNotFoundError:
+                pass
+
+
+Fitness = Tuple[float, float, float, float, float]
+
+# Fitness cache of each process by the database location
+_fitness_caches: Dict[str, 'FitnessCache'] = {}
+
+
+def open_fitness_cache(filename: str, local_size: int, shared_size: int) -> 'FitnessCache':
+    """Return the instance of the fitness cache belonging to the current process"""
+    cache = _fitness_caches.get(filename)
+    if cache is None or cache.pid != os.getpid():
+        cache = FitnessCache(filename, local_size, shared_size)
+        _fitness_caches[filename] = cache
+    return cache
+
+
+class FitnessCache:
+    """Fitness values of the individuals by their sympy code, shared by all the worker processes
+
+    Each process keeps recently used values in a bounded LRU, so that the repeated lookups are served without leaving
+    the process. Other values are shared via a sqlite database in WAL mode stored in shared memory if possible, which
+    keeps only the most recently inserted values up to its size. Pickling the cache transfers only its location, the
+    unpickled object is the instance owned by the receiving process, so that its local values are kept between tasks.
+    """
+
+    def __init__(self, filename: str, local_size: int, shared_size: int) -> None:
+        self.filename: str = filename
+        self.local_size: int = local_size
+        self.shared_size: int = shared_size
+        self.pid: int = os.getpid()
+
+        self.local: collections.OrderedDict = collections.OrderedDict()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    @classmethod
+    def create(cls, local_size: int, shared_size: int) -> 'FitnessCache':
+        """Create an empty cache in a new temporary directory"""
+        directory = tempfile.mkdtemp(prefix='ccl_fitness_', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+        return open_fitness_cache(os.path.join(directory, 'fitness.sqlite'), local_size, shared_size)
+
+    def remove(self) -> None:
+        """Remove the shared database"""
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+            self._connection = None
+        shutil.rmtree(os.path.dirname(self.filename))
+
+    def __reduce__(self) -> tuple:
+        return open_fitness_cache, (self.filename, self.local_size, self.shared_size)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Return the connection to the database valid in the current process"""
+        # Forked process inherits the object with the connection of its parent, which it must not use
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.filename, timeout=60, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=OFF')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS fitness '
+                                     '(sympy_code TEXT PRIMARY KEY, obj REAL, rmsd REAL, r2 REAL, dmax REAL, '
+                                     'davg REAL)')
+            self._pid = os.getpid()
+        return self._connection
+
+    def lookup(self, sympy_code: str) -> Tuple[Optional[Fitness], bool]:
+        """Return the fitness (None if unknown) and whether it was found in the local tier"""
+        fitness = self.local.get(sympy_code)
+        if fitness is not None:
+            self.local.move_to_end(sympy_code)
+            return fitness, True
+
+        row = self.connection.execute('SELECT obj, rmsd, r2, dmax, davg FROM fitness WHERE sympy_code = ?',
+                                      (sympy_code,)).fetchone()
+        if row is None:
+            return None, False
+
+        fitness = tuple(_to_float(x) for x in row)
+        self._store_local(sympy_code, fitness)
+        return fitness, False
+
+    def __setitem__(self, sympy_code: str, fitness: Fitness) -> None:
+        self._store_local(sympy_code, fitness)
+        connection = self.connection
+        connection.execute('INSERT OR REPLACE INTO fitness VALUES (?, ?, ?, ?, ?, ?)',
+                           (sympy_code, *(float(x) for x in fitness)))
+        # Row ids are increasing, so only the most recently inserted values are kept
+        connection.execute('DELETE FROM fitness WHERE rowid <= (SELECT MAX(rowid) FROM fitness) - ?',
+                           (self.shared_size,))
+
+    def items(self) -> List[Tuple[str, Fitness]]:
+        """Return all the values of the shared tier in the order of their insertion"""
+        rows = self.connection.execute('SELECT sympy_code, obj, rmsd, r2, dmax, davg FROM fitness ORDER BY rowid')
+        return [(row[0], tuple(_to_float(x) for x in row[1:])) for row in rows]
+
+    def update(self, values: List[Tuple[str, Fitness]]) -> None:
+        """Insert the values into the shared tier, e.g. when resuming from a checkpoint"""
+        self.connection.executemany('INSERT OR REPLACE INTO fitness VALUES (?, ?, ?, ?, ?, ?)',
+                                    ((sympy_code, *(float(x) for x in fitness)) for sympy_code, fitness in values))
+
+    def _store_local(self, sympy_code: str, fitness: Fitness) -> None:
+        self.local[sympy_code] = fitness
+        self.local.move_to_end(sympy_code)
+        if len(self.local) > self.local_size:
+            self.local.popitem(last=False)
+
+
+def _to_float(x: Optional[float]) -> float:
+    """Convert value loaded from sqlite back to float (NaN is stored as NULL)"""
+    return float('nan') if x is None else x
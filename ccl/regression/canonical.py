@@ -0,0 +1,339 @@
+"""Canonical form of individuals used to identify equivalent ones without sympy
+
+The expression is represented as a sum of terms, each term is a coefficient and a product of factors raised to
+rational exponents. Constants are folded, sums and products are flattened and sorted, so that expressions differing
+only in the order of operands or in the way an operation is written (e.g. inv(x) and div(1, x)) have the same form.
+Only the transformations valid for all real values of the symbols are applied, e.g. sqrt(square(x)) is not
+simplified to x unless x is a distance.
+"""
+
+import math
+from fractions import Fraction
+from typing import Dict, Iterator, Tuple
+
+from deap import gp
+
+import ccl.functions
+
+# Kinds of factors: 's' - symbol, 'p' - positive symbol, 'f' - function of a sum, 'a' - sum
+Factor = tuple
+Monomial = Tuple[Tuple[Factor, Fraction], ...]
+Sum = Dict[Monomial, float]
+FrozenSum = Tuple[Tuple[Monomial, float], ...]
+
+ONE = Fraction(1)
+HALF = Fraction(1, 2)
+
+
+class NonRealError(Exception):
+    """Raised when a constant part of the expression is not a finite real number"""
+    pass
+
+
+def _number(x: float) -> float:
+    """Round a folded constant, so that rounding errors of the arithmetic do not change the canonical form"""
+    if isinstance(x, complex) or not math.isfinite(x):
+        raise NonRealError
+    # Adding zero turns -0.0 into 0.0
+    return float(f'{x:.12g}') + 0.0
+
+
+def _freeze(s: Sum) -> FrozenSum:
+    return tuple(sorted(s.items()))
+
+
+def _constant(c: float) -> Sum:
+    return {(): c} if c else {}
+
+
+def _add(a: Sum, b: Sum) -> Sum:
+    result = dict(a)
+    for m, c in b.items():
+        value = _number(result.get(m, 0.0) + c)
+        if value:
+            result[m] = value
+        else:
+            result.pop(m, None)
+    return result
+
+
+def _scale(a: Sum, k: float) -> Sum:
+    if not k:
+        return {}
+    return {m: _number(c * k) for m, c in a.items()}
+
+
+def _is_constant(a: Sum) -> bool:
+    return not a or (len(a) == 1 and () in a)
+
+
+def _value(a: Sum) -> float:
+    return a.get((), 0.0)
+
+
+def _is_positive(factor: Factor) -> bool:
+    return factor[0] == 'p' or (factor[0] == 'f' and factor[1] == 'exp')
+
+
+def _make_term(coefficient: float, factors: Dict[Factor, Fraction]) -> Sum:
+    """Create a sum from a single term, the factors are normalized"""
+    exp_argument: Sum = {}
+    result: Dict[Factor, Fraction] = {}
+    expanded: Dict[Factor, Fraction] = {}
+    for factor, e in factors.items():
+        if not e:
+            continue
+        if factor[0] == 'f' and factor[1] == 'exp':
+            # exp(a)^e * exp(b) = exp(e * a + b)
+            exp_argument = _add(exp_argument, _scale(dict(factor[2]), float(e)))
+        elif factor[0] == 'a' and e.denominator == 1 and len(factor[1]) == 1:
+            # Power of a single term raised to an integer exponent
+            (m, c), = factor[1]
+            coefficient *= c ** int(e)
+            for inner, inner_e in m:
+                expanded[inner] = expanded.get(inner, 0) + inner_e * e
+        else:
+            result[factor] = e
+
+    if expanded:
+        for factor, e in result.items():
+            expanded[factor] = expanded.get(factor, 0) + e
+        if exp_argument:
+            expanded[('f', 'exp', _freeze(exp_argument))] = ONE
+        return _make_term(coefficient, expanded)
+
+    if () in exp_argument:
+        coefficient *= math.exp(exp_argument.pop(()))
+    if exp_argument:
+        result[('f', 'exp', _freeze(exp_argument))] = ONE
+
+    coefficient = _number(coefficient)
+    if not coefficient:
+        return {}
+
+    monomial = tuple(sorted(result.items()))
+    if len(monomial) == 1 and monomial[0][0][0] == 'a' and monomial[0][1] == 1:
+        return _scale(dict(monomial[0][0][1]), coefficient)
+
+    return {monomial: coefficient}
+
+
+def _as_term(a: Sum) -> Tuple[float, Dict[Factor, Fraction]]:
+    """Split a non-constant sum into a coefficient and factors, sum of more terms becomes a single factor"""
+    if len(a) == 1:
+        (m, c), = a.items()
+        return c, dict(m)
+
+    # The sum is scaled so that its first term has unit coefficient
+    content = a[min(a)]
+    return content, {('a', _freeze(_scale(a, 1 / content))): ONE}
+
+
+def _mul(a: Sum, b: Sum) -> Sum:
+    if not a or not b:
+        return {}
+    if _is_constant(a):
+        return _scale(b, _value(a))
+    if _is_constant(b):
+        return _scale(a, _value(b))
+
+    c1, f1 = _as_term(a)
+    c2, f2 = _as_term(b)
+    for factor, e in f2.items():
+        f1[factor] = f1.get(factor, 0) + e
+    return _make_term(c1 * c2, f1)
+
+
+def _pow(a: Sum, n: Fraction) -> Sum:
+    if not a:
+        if n > 0:
+            return {}
+        raise NonRealError
+
+    if _is_constant(a):
+        c = _value(a)
+        if c < 0 and n.denominator != 1:
+            raise NonRealError
+        try:
+            return _constant(_number(c ** (int(n) if n.denominator == 1 else float(n))))
+        except (OverflowError, ZeroDivisionError):
+            raise NonRealError
+
+    if n == 1:
+        return a
+
+    c, factors = _as_term(a)
+    if n.denominator == 1:
+        return _make_term(c ** int(n), {factor: e * n for factor, e in factors.items()})
+
+    # (x * y)^n = x^n * y^n holds for non-integer n only if the factors are positive
+    result = {factor: e * n for factor, e in factors.items() if _is_positive(factor)}
+    rest = {factor: e for factor, e in factors.items() if not _is_positive(factor)}
+    if not rest and c < 0:
+        raise NonRealError
+
+    if len(rest) == 1 and c > 0 and next(iter(rest.values())) == 1:
+        factor, = rest
+        result[factor] = n
+    elif rest:
+        base = _make_term(-1.0 if c < 0 else 1.0, rest)
+        result[('a', _freeze(base))] = n
+
+    return _make_term(abs(c) ** float(n), result)
+
+
+def _function(name: str, a: Sum) -> Sum:
+    if name == 'exp':
+        return _make_term(1.0, {('f', 'exp', _freeze(a)): ONE})
+
+    if _is_constant(a):
+        try:
+            return _constant(_number(getattr(math, name)(_value(a))))
+        except (OverflowError, ValueError):
+            raise NonRealError
+
+    return {((('f', name, _freeze(a)), ONE),): 1.0}
+
+
+def _format_number(x: float) -> str:
+    return f'{x:.12g}'
+
+
+def _render_factor(factor: Factor, e: Fraction) -> str:
+    if factor[0] in ('s', 'p'):
+        base = factor[1]
+    elif factor[0] == 'f':
+        base = f'{factor[1]}({render(factor[2])})'
+    else:
+        base = f'({render(factor[1])})'
+
+    if e == 1:
+        return base
+    elif e.denominator == 1:
+        return f'{base}**{e}'
+    else:
+        return f'{base}**({e})'
+
+
+def render(expr: FrozenSum) -> str:
+    """Return the string representation of the canonical form"""
+    if not expr:
+        return '0'
+
+    terms = []
+    for m, c in expr:
+        factors = '*'.join(_render_factor(factor, e) for factor, e in m)
+        if not m:
+            terms.append(_format_number(c))
+        elif c == 1:
+            terms.append(factors)
+        elif c == -1:
+            terms.append(f'-{factors}')
+        else:
+            terms.append(f'{_format_number(c)}*{factors}')
+
+    return ' + '.join(terms)
+
+
+def constants(expr: FrozenSum) -> Iterator[float]:
+    """Return all numbers in the canonical form including the exponents"""
+    for m, c in expr:
+        if c != 1:
+            yield c
+        for factor, e in m:
+            if e != 1:
+                yield float(e)
+            if factor[0] == 'f':
+                yield from constants(factor[2])
+            elif factor[0] == 'a':
+                yield from constants(factor[1])
+
+
+class Canonicalizer:
+    """Convert individuals into their canonical form"""
+
+    def __init__(self, ccl_objects: dict) -> None:
+        self.ccl_objects: dict = ccl_objects
+        self.distance_name: str = ccl_objects.get('distance', None)
+        self.atom_names: list = ccl_objects['atom_objects']
+        self.terminals: Dict[str, Sum] = {}
+
+        self.unary = {
+            'sqrt': lambda a: _pow(a, HALF),
+            'cbrt': lambda a: _pow(a, Fraction(1, 3)),
+            'square': lambda a: _pow(a, Fraction(2)),
+            'cube': lambda a: _pow(a, Fraction(3)),
+            'inv': lambda a: _pow(a, -ONE),
+            'double': lambda a: _scale(a, 2.0),
+            'half': lambda a: _scale(a, 0.5),
+            'exp': lambda a: _function('exp', a),
+        }
+        for fn in ccl.functions.MATH_FUNCTIONS:
+            if fn not in self.unary:
+                self.unary[fn] = lambda a, name=fn: _function(name, a)
+
+        self.binary = {
+            'add': _add,
+            'sub': lambda a, b: _add(a, _scale(b, -1.0)),
+            'mul': _mul,
+            'div': lambda a, b: _mul(a, _pow(b, -ONE)),
+        }
+
+    def _symbol(self, name: str, positive: bool = False) -> Sum:
+        return {((('p' if positive else 's', name), ONE),): 1.0}
+
+    def terminal(self, node: gp.Terminal) -> Sum:
+        """Return the canonical form of a terminal"""
+        text = node.format()
+        try:
+            return _constant(_number(float(text)))
+        except ValueError:
+            pass
+
+        if text in self.terminals:
+            return self.terminals[text]
+
+        atom_names = self.atom_names
+        if text.startswith('_sym_add'):
+            x = text.split('_')[-1]
+            value = _add(self._symbol(f'{x}({atom_names[0]})'), self._symbol(f'{x}({atom_names[1]})'))
+        elif text.startswith('_sym_inv_add'):
+            x = text.split('_')[-1]
+            value = _add(_pow(self._symbol(f'{x}({atom_names[0]})'), -ONE),
+                         _pow(self._symbol(f'{x}({atom_names[1]})'), -ONE))
+        elif text.startswith('_sym_mul'):
+            x = text.split('_')[-1]
+            value = _mul(self._symbol(f'{x}({atom_names[0]})'), self._symbol(f'{x}({atom_names[1]})'))
+        elif self.distance_name is not None and text == self.distance_name:
+            value = self._symbol(f'{self.distance_name}({atom_names[0]}{atom_names[1]})', positive=True)
+        elif text.startswith('_term'):
+            x, atom_name = text.split('_')[-2:]
+            value = self._symbol(f'{x}({atom_name})')
+        else:
+            value = self._symbol(text)
+
+        self.terminals[text] = value
+        return value
+
+    def canonicalize(self, individual: gp.PrimitiveTree) -> FrozenSum:
+        """Return the canonical form of the individual, NonRealError is raised if it is not real"""
+        stack = []
+        for node in reversed(individual):
+            if isinstance(node, gp.Primitive):
+                if node.arity == 1:
+                    stack.append(self.unary[node.name](stack.pop()))
+                else:
+                    a = stack.pop()
+                    b = stack.pop()
+                    stack.append(self.binary[node.name](a, b))
+            else:
+                stack.append(self.terminal(node))
+
+        return _freeze(stack[0])
+
+    def code(self, individual: gp.PrimitiveTree) -> str:
+        """Return the code identifying the individual, non-real ones are marked as in generate_sympy_code"""
+        try:
+            return render(self.canonicalize(individual))
+        except (NonRealError, OverflowError):
+            return f'<non-real>: {individual}'
@@ -0,0 +1,109 @@
+"""Periodic checkpoints of the regression, so that an interrupted run can be resumed"""
+
+import gzip
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from deap import gp, tools
+
+from ccl.regression.cache import Fitness
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint(NamedTuple):
+    """State of the regression after a finished generation"""
+    version: int
+    source: str
+    gen: int
+    population: List[gp.PrimitiveTree]
+    hall_of_fame: List[gp.PrimitiveTree]
+    logbook: tools.Logbook
+    rng_state: tuple
+    global_rng_state: tuple
+    wanted: Optional[Dict[str, Optional[int]]]
+    fitted_constants: Optional[Dict[str, Optional[List[float]]]]
+    fitness_values: List[Tuple[str, Fitness]]
+
+
+def restore_hall_of_fame(hof: tools.HallOfFame, items: List[gp.PrimitiveTree]) -> None:
+    """Fill the empty hall of fame with the items in the same order as they were stored"""
+    hof.items = list(items)
+    # Keys are the fitness values of the items in the ascending order
+    hof.keys = [ind.fitness for ind in reversed(hof.items)]
+
+
+def load_checkpoint(filename: str, source: str) -> Checkpoint:
+    """Load the checkpoint and check that it belongs to the regression of the same skeleton"""
+    with gzip.open(filename, 'rb') as f:
+        checkpoint = pickle.load(f)
+
+    if checkpoint.version != CHECKPOINT_VERSION:
+        raise RuntimeError(f'Unsupported checkpoint version: {checkpoint.version}')
+    if checkpoint.source != source:
+        raise RuntimeError('Checkpoint was created by the regression of a different skeleton')
+
+    return checkpoint
+
+
+class CheckpointWriter:
+    """Write the checkpoints every given number of generations or minutes, whichever comes first (None disables either)
+
+    The state is pickled immediately, so that it does not change while being written, compressing and writing it to the
+    disk happens in a background thread. The checkpoint replaces the previous one atomically, so an interrupted write
+    never leaves a broken file behind.
+    """
+
+    def __init__(self, filename: str, generations: Optional[int], minutes: Optional[float]) -> None:
+        self.filename: str = filename
+        self.generations: Optional[int] = generations
+        self.minutes: Optional[float] = minutes
+        self.last_time: float = time.monotonic()
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[Exception] = None
+        self.written: int = 0
+
+    def due(self, gen: int) -> bool:
+        """Return whether the checkpoint should be written after the generation"""
+        if self.generations and gen % self.generations == 0:
+            return True
+        return self.minutes is not None and time.monotonic() - self.last_time >= self.minutes * 60
+
+    def write(self, checkpoint: Checkpoint) -> None:
+        """Start writing the checkpoint, the previous one has to be written first"""
+        data = pickle.dumps(checkpoint, protocol=pickle.HIGHEST_PROTOCOL)
+        self.wait()
+        self.last_time = time.monotonic()
+        self.thread = threading.Thread(target=self._write, args=(data,), daemon=True)
+        self.thread.start()
+
+    def wait(self) -> None:
+        """Wait until the last checkpoint is written, its failure is raised here"""
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError(f'Cannot write checkpoint {self.filename}') from error
+
+    def _write(self, data: bytes) -> None:
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        fd, tmp_name = tempfile.mkstemp(prefix='.checkpoint_', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                # Low compression level is enough for the repetitive pickled trees and keeps the writes fast
+                f.write(gzip.compress(data, compresslevel=3))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, self.filename)
+            self.written += 1
+        except Exception as e:
+            self.error = e
+            try:
+                os.remove(tmp_name)
+            except FileNotFoundError:
+                pass
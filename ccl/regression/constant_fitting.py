@@ -0,0 +1,220 @@
+"""Fit numeric constants of the individuals to the reference charges"""
+
+import concurrent.futures
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from deap import gp
+
+from ccl.regression.constraints import check_max_constant
+from ccl.regression.dataset import Dataset
+from ccl.regression.generators import generate_sympy_expr
+from ccl.regression.interpreter import create_program_skeleton, generate_program, is_constant
+from ccl.regression.vectorized import VectorizedEvaluator, parse_program
+
+
+def levenberg_marquardt(residuals: Callable[[np.ndarray], np.ndarray], x0: np.ndarray,
+                        max_iterations: int) -> Optional[np.ndarray]:
+    """Minimize the sum of squared residuals, None is returned if the initial point cannot be improved
+
+    The Jacobian is approximated by forward differences, so each iteration evaluates the residuals once per parameter.
+    """
+    x = np.array(x0, dtype=np.float64)
+    r = residuals(x)
+    if not np.all(np.isfinite(r)):
+        return None
+
+    cost = initial_cost = float(r @ r)
+    damping = 1e-3
+    for _ in range(max_iterations):
+        jacobian = np.empty((len(r), len(x)))
+        for i in range(len(x)):
+            h = 1e-6 * max(1.0, abs(x[i]))
+            shifted = x.copy()
+            shifted[i] += h
+            jacobian[:, i] = (residuals(shifted) - r) / h
+
+        if not np.all(np.isfinite(jacobian)):
+            break
+
+        gradient = jacobian.T @ r
+        hessian = jacobian.T @ jacobian
+        # Marquardt scaling, the small constant keeps the system regular for parameters without effect
+        scale = np.diag(np.maximum(np.diag(hessian), 1e-12))
+
+        improvement = None
+        while damping < 1e10:
+            try:
+                step = np.linalg.solve(hessian + damping * scale, -gradient)
+            except np.linalg.LinAlgError:
+                break
+
+            candidate = x + step
+            candidate_r = residuals(candidate)
+            candidate_cost = float(candidate_r @ candidate_r)
+            if np.isfinite(candidate_cost) and candidate_cost < cost:
+                improvement = cost - candidate_cost
+                x, r, cost = candidate, candidate_r, candidate_cost
+                damping = max(damping / 10, 1e-12)
+                break
+
+            damping *= 10
+
+        if improvement is None or improvement <= 1e-10 * cost:
+            break
+
+    return x if cost < initial_cost else None
+
+
+def round_constant(x: float) -> Optional[float]:
+    """Round the fitted value, None is returned if it cannot be written as a CCL number (no exponent allowed)"""
+    value = float(f'{x:.6g}') + 0.0
+    if 'e' in repr(value):
+        value = round(value, 4) + 0.0
+    return value if 'e' not in repr(value) else None
+
+
+def constant_indices(individual: gp.PrimitiveTree) -> List[int]:
+    """Return the positions of numeric constants in the individual"""
+    return [i for i, node in enumerate(individual) if isinstance(node, gp.Terminal) and is_constant(node)]
+
+
+def structure_key(individual: gp.PrimitiveTree) -> str:
+    """Return the key of the individual in which all the constants are replaced by a placeholder"""
+    return ' '.join('#' if isinstance(node, gp.Terminal) and is_constant(node) else node.name for node in individual)
+
+
+def set_constants(individual: gp.PrimitiveTree, values: List[float]) -> bool:
+    """Replace the constants of the individual by the values in the order of the program, return whether it changed
+
+    Constants are written the same way as gp.PrimitiveTree.from_string reads them.
+    """
+    changed = False
+    for i, value in zip(reversed(constant_indices(individual)), values):
+        if float(individual[i].name) != value:
+            individual[i] = gp.Terminal(value, False, individual[i].ret)
+            changed = True
+
+    return changed
+
+
+def set_allowed_constants(individual: gp.PrimitiveTree, values: List[float], ccl_objects: dict, options: dict) -> bool:
+    """Replace the constants as set_constants does unless the result exceeds the maximal allowed constant
+
+    The original constants are kept if the expression does not pass the same check as the generated individuals.
+    """
+    original = list(individual)
+    if not set_constants(individual, values):
+        return False
+
+    if options['max_constant_allowed'] is None:
+        return True
+
+    try:
+        allowed = check_max_constant(generate_sympy_expr(individual, ccl_objects), options)
+    except RuntimeError:
+        allowed = False
+    if not allowed:
+        for i in constant_indices(individual):
+            individual[i] = original[i]
+    return allowed
+
+
+evaluator: Optional[VectorizedEvaluator] = None
+max_iterations: int = 0
+
+
+def init_fitting(method_skeleton: 'CCLMethod', dataset: Dataset, terminals: List[str], ccl_objects: dict,
+                 options: dict) -> None:
+    """Initialize the evaluator used to fit the constants in the worker"""
+    global evaluator, max_iterations
+    evaluator = VectorizedEvaluator(create_program_skeleton(method_skeleton, terminals, ccl_objects), dataset)
+    max_iterations = options['constant_fitting_iterations']
+
+
+def fit_program(code: str) -> Optional[List[float]]:
+    """Fit the constants of the program to minimize RMSD, the values are in the order of the program"""
+    program = parse_program(code)
+    positions = [i for i, (op, _) in enumerate(program) if op == 'const']
+
+    # Weighted RMSD of a coreset is minimized by the residuals scaled by the square roots of the weights
+    scale = np.sqrt(evaluator.weights) if evaluator.weights is not None else 1.0
+
+    def residuals(x: np.ndarray) -> np.ndarray:
+        for i, value in zip(positions, x):
+            program[i] = ('const', float(value))
+        return (evaluator.calculate_program_charges(program) - evaluator.dataset.ref_charges) * scale
+
+    fitted = levenberg_marquardt(residuals, np.array([program[i][1] for i in positions]), max_iterations)
+    if fitted is None:
+        return None
+
+    values = [round_constant(x) for x in fitted]
+    return None if any(x is None for x in values) else values
+
+
+class ConstantFitter:
+    """Pool of workers fitting the constants of the individuals using the NumPy evaluator
+
+    Individuals differing only in the values of constants share the same structure, which is fitted only once per run.
+    The fitted values are then written into all the individuals with that structure, so they have the same code and
+    only one of them is actually evaluated.
+    """
+
+    def __init__(self, method_skeleton: 'CCLMethod', dataset: Dataset, terminals: List[str], ccl_objects: dict,
+                 options: dict) -> None:
+        self.terminals: List[str] = terminals
+        self.ccl_objects: dict = ccl_objects
+        self.options: dict = options
+        self.executor = concurrent.futures.ProcessPoolExecutor(options['ncpus'], initializer=init_fitting,
+                                                               initargs=(method_skeleton, dataset, terminals,
+                                                                         ccl_objects, options))
+        self.fitted: Dict[str, Optional[List[float]]] = {}
+        self.stats: Dict[str, int] = {'Structures fitted': 0, 'Fits improved': 0, 'Individuals changed': 0,
+                                      'Individuals reused fit': 0}
+        self.time: float = 0.0
+
+    def fit(self, individuals: List[gp.PrimitiveTree]) -> List[gp.PrimitiveTree]:
+        """Fit the constants of the individuals, return those that were changed"""
+        groups: Dict[str, List[gp.PrimitiveTree]] = {}
+        for ind in individuals:
+            if ind.sympy_code == '<expr-error>' or ind.sympy_code.startswith('<non-real>'):
+                continue
+            if not constant_indices(ind):
+                continue
+            groups.setdefault(structure_key(ind), []).append(ind)
+
+        # Only the first individual of a new structure is fitted, its constants are the starting point
+        codes_by_key = {key: generate_program(members[0], self.terminals) for key, members in groups.items()
+                        if key not in self.fitted}
+
+        start = time.perf_counter()
+        for key, values in zip(codes_by_key, self.executor.map(fit_program, codes_by_key.values())):
+            self.fitted[key] = values
+            self.stats['Structures fitted'] += 1
+            self.stats['Fits improved'] += values is not None
+        self.time += time.perf_counter() - start
+
+        changed = []
+        for key, members in groups.items():
+            values = self.fitted[key]
+            if values is None:
+                continue
+            if key not in codes_by_key:
+                self.stats['Individuals reused fit'] += len(members)
+            for ind in members:
+                if set_allowed_constants(ind, values, self.ccl_objects, self.options):
+                    changed.append(ind)
+
+        self.stats['Individuals changed'] += len(changed)
+        return changed
+
+    def summary(self) -> List[str]:
+        """Return the statistics of the fitting"""
+        lines = [f'{name:<22}: {value}' for name, value in self.stats.items()]
+        lines.append(f'{"Time":<22}: {self.time:.2f} s')
+        return lines
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
@@ -4,6 +4,8 @@ import sympy
 from collections import Counter
 from deap import gp
 
+from ccl.regression.canonical import FrozenSum, constants
+
 
 def _get_primitive_name(primitive: gp.Primitive) -> str:
     """Get the original name from a possibly mangled primitive"""
@@ -34,3 +36,8 @@ def check_max_constant(sympy_expr: sympy.Expr, options: dict) -> bool:
         if atom.is_real and abs(atom) > options['max_constant_allowed']:
             return False
     return True
+
+
+def check_max_canonical_constant(expr: FrozenSum, options: dict) -> bool:
+    """Check whether the canonical form contains constant that is higher than allowed"""
+    return all(abs(x) <= options['max_constant_allowed'] for x in constants(expr))
@@ -0,0 +1,105 @@
+"""Selection of a weighted subset of molecules representing the whole dataset"""
+
+import heapq
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from deap import gp
+
+from ccl.regression.dataset import Dataset
+from ccl.regression.evaluate import INVALID_RESULT, process_result
+from ccl.regression.interpreter import create_program_skeleton, generate_program
+from ccl.regression.vectorized import VectorizedEvaluator
+
+# Number of quantile bins of the spread of the reference charges within a molecule
+CHARGE_BINS = 4
+
+
+def get_strata(dataset: Dataset) -> Dict[tuple, List[int]]:
+    """Group the molecules by element composition, size and the spread of their reference charges
+
+    Molecules of a stratum are sorted by the spread of the charges.
+    """
+    spreads = np.array([np.std(dataset.ref_charges[dataset.atoms(m)]) for m in range(len(dataset))])
+    edges = np.quantile(spreads, np.linspace(0, 1, CHARGE_BINS + 1)[1:-1])
+
+    strata: Dict[tuple, List[int]] = {}
+    for m in range(len(dataset)):
+        atoms = dataset.atoms(m)
+        composition = tuple(sorted(set(dataset.elements[atoms])))
+        size = int(math.log2(atoms.stop - atoms.start))
+        key = composition, size, int(np.searchsorted(edges, spreads[m], side='right'))
+        strata.setdefault(key, []).append(m)
+
+    for members in strata.values():
+        members.sort(key=lambda m: spreads[m])
+
+    return strata
+
+
+def allocate(counts: List[int], total: int) -> List[int]:
+    """Split the total number of molecules among the strata of the given sizes
+
+    Each stratum gets at least one molecule, the largest strata first if there are more strata than molecules. The rest
+    is given one by one to the stratum whose selected molecules represent the most molecules.
+    """
+    allocated = [0] * len(counts)
+    for s in sorted(range(len(counts)), key=lambda x: -counts[x])[:total]:
+        allocated[s] = 1
+
+    heap = [(-counts[s] / allocated[s], s) for s in range(len(counts)) if allocated[s] and counts[s] > 1]
+    heapq.heapify(heap)
+    for _ in range(total - sum(allocated)):
+        if not heap:
+            break
+        _, s = heapq.heappop(heap)
+        allocated[s] += 1
+        if allocated[s] < counts[s]:
+            heapq.heappush(heap, (-counts[s] / allocated[s], s))
+
+    return allocated
+
+
+def select_coreset(dataset: Dataset, ratio: float) -> Tuple[List[int], np.ndarray]:
+    """Return the molecules of the coreset and their weights
+
+    The molecules of each stratum are picked evenly over the range of their charge spreads, each of them is weighted by
+    the number of molecules of the stratum it represents. Strata left without a molecule are not represented at all.
+    """
+    strata = list(get_strata(dataset).values())
+    total = max(1, math.ceil(ratio * len(dataset)))
+
+    molecules = []
+    weights = []
+    for members, count in zip(strata, allocate([len(x) for x in strata], total)):
+        for j in range(count):
+            molecules.append(members[int((j + 0.5) * len(members) / count)])
+            weights.append(len(members) / count)
+
+    order = np.argsort(molecules)
+    return [molecules[i] for i in order], np.array(weights)[order]
+
+
+def evaluate_on_dataset(individuals: List[gp.PrimitiveTree], method_skeleton: 'CCLMethod', dataset: Dataset,
+                        terminals: List[str], ccl_objects: dict,
+                        options: dict) -> List[Tuple[float, float, float, float, float]]:
+    """Evaluate the individuals on the given dataset in the current process"""
+    evaluator = VectorizedEvaluator(create_program_skeleton(method_skeleton, terminals, ccl_objects), dataset)
+    results = []
+    for ind in individuals:
+        try:
+            results.append(process_result(evaluator.evaluate(generate_program(ind, terminals)), options))
+        except RuntimeError:
+            results.append(INVALID_RESULT)
+
+    return results
+
+
+def get_correlation(xs: List[float], ys: List[float]) -> Optional[float]:
+    """Return Pearson correlation coefficient of the finite pairs, None if it is not defined"""
+    pairs = np.array([(x, y) for x, y in zip(xs, ys) if math.isfinite(x) and math.isfinite(y)])
+    if len(pairs) < 2 or np.std(pairs[:, 0]) == 0 or np.std(pairs[:, 1]) == 0:
+        return None
+
+    return float(np.corrcoef(pairs[:, 0], pairs[:, 1])[0, 1])
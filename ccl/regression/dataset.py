@@ -0,0 +1,314 @@
+"""Dataset of molecules, reference charges and parameters loaded into NumPy arrays"""
+
+import csv
+import functools
+import json
+import mmap
+import os
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Charge field of the V2000 atom block
+_SDF_CHARGES = {1: 3, 2: 2, 3: 1, 5: -1, 6: -2, 7: -3}
+
+
+def read_sdf(filename: str) -> List[Tuple[str, List[str], np.ndarray, np.ndarray, int]]:
+    """Read molecules from SDF (V2000) file
+
+    Returns a list of tuples (name, elements, coordinates, bonds, total charge), bonds are stored as rows
+    (first atom, second atom, order) using zero-based indices.
+    """
+    molecules = []
+    with open(filename) as f:
+        lines = f.read().splitlines()
+
+    i = 0
+    while i < len(lines):
+        if not lines[i].strip() and i + 3 >= len(lines):
+            break
+        name = lines[i].strip()
+        counts = lines[i + 3]
+        if 'V3000' in counts:
+            raise RuntimeError(f'Only V2000 SDF files are supported: {name}')
+        n_atoms = int(counts[0:3])
+        n_bonds = int(counts[3:6])
+
+        elements = []
+        coordinates = np.empty((n_atoms, 3))
+        total_charge = 0
+        for j in range(n_atoms):
+            line = lines[i + 4 + j]
+            x, y, z, element = line.split()[:4]
+            coordinates[j] = float(x), float(y), float(z)
+            elements.append(element)
+            if len(line) >= 39 and line[36:39].strip():
+                total_charge += _SDF_CHARGES.get(int(line[36:39]), 0)
+
+        bonds = np.empty((n_bonds, 3), dtype=np.int64)
+        for j in range(n_bonds):
+            line = lines[i + 4 + n_atoms + j]
+            bonds[j] = int(line[0:3]) - 1, int(line[3:6]) - 1, int(line[6:9])
+
+        i += 4 + n_atoms + n_bonds
+        charges = {}
+        while lines[i].strip() != '$$$$':
+            if lines[i].startswith('M  CHG'):
+                values = lines[i].split()[3:]
+                for atom, charge in zip(values[::2], values[1::2]):
+                    charges[int(atom)] = int(charge)
+            i += 1
+            if i == len(lines):
+                break
+        i += 1
+
+        if charges:
+            total_charge = sum(charges.values())
+
+        molecules.append((name, elements, coordinates, bonds, total_charge))
+
+    return molecules
+
+
+def read_charges(filename: str) -> Dict[str, np.ndarray]:
+    """Read reference charges from a file in ChargeFW2 format"""
+    charges = {}
+    with open(filename) as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+
+    i = 0
+    while i < len(lines):
+        name = lines[i].strip()
+        n = int(lines[i + 1])
+        charges[name] = np.array([float(line.split()[-1]) for line in lines[i + 2: i + 2 + n]])
+        i += 2 + n
+
+    return charges
+
+
+@functools.lru_cache(maxsize=None)
+def read_element_properties() -> Dict[str, Dict[str, float]]:
+    """Read the properties of the elements keyed by the name of the property in CCL and the element's symbol
+
+    Electronegativities are Pauling's, covalent radii are those of Cordero et al., van der Waals radii those of Bondi
+    (Mantina et al. for the elements he did not cover), ionization potentials and electron affinities are in eV and the
+    hardness is half of their difference.
+    """
+    with open(os.path.join(os.path.dirname(__file__), 'element_properties.csv')) as f:
+        rows = list(csv.DictReader(f))
+
+    return {name: {row['symbol']: float(row[name]) for row in rows} for name in rows[0] if name != 'symbol'}
+
+
+AtomParameters = Dict[Tuple[str, str, str], List[float]]
+
+# Arrays stored in the shared file, the names and parameters are small enough to be copied to every process
+_SHARED_ARRAYS = ('elements', 'coordinates', 'atom_offsets', 'bonds', 'bond_offsets', 'total_charges', 'ref_charges',
+                  'atom_parameters', 'weights')
+_ALIGNMENT = 64
+
+
+def read_parameters(filename: Optional[str]) -> Tuple[Dict[str, float], List[str], AtomParameters]:
+    """Read parameters from a JSON file in ChargeFW2 format
+
+    Returns common parameters, names of the atom parameters and atom parameters keyed by (element, classifier, type).
+    """
+    if filename is None:
+        return {}, [], {}
+
+    with open(filename) as f:
+        data = json.load(f)
+
+    common = {}
+    if 'common' in data:
+        common = dict(zip(data['common']['names'], data['common']['values']))
+
+    atom_names = []
+    atom = {}
+    if 'atom' in data:
+        atom_names = data['atom']['names']
+        for record in data['atom']['data']:
+            atom[tuple(record['key'])] = record['value']
+
+    return common, atom_names, atom
+
+
+class SharedLayout(NamedTuple):
+    """File with the arrays of a dataset and their (name, offset, dtype, shape) in it"""
+    filename: str
+    arrays: List[Tuple[str, int, str, Tuple[int, ...]]]
+
+
+class Dataset:
+    """Molecules with reference charges and parameters stored in flat arrays
+
+    Values of atom i of molecule m are stored at index atom_offsets[m] + i, bonds are stored similarly using
+    bond_offsets and zero-based atom indices local to the molecule. Molecules of a subset representing a larger dataset
+    can have weights, the metrics are then weighted accordingly.
+    """
+
+    def __init__(self, names: List[str], elements: List[str], coordinates: np.ndarray, atom_offsets: np.ndarray,
+                 bonds: np.ndarray, bond_offsets: np.ndarray, total_charges: np.ndarray, ref_charges: np.ndarray,
+                 atom_parameters: np.ndarray, atom_parameter_names: List[str],
+                 common_parameters: Dict[str, float], weights: Optional[np.ndarray] = None) -> None:
+        self.names: List[str] = names
+        self.elements: List[str] = elements
+        self.coordinates: np.ndarray = coordinates
+        self.atom_offsets: np.ndarray = atom_offsets
+        self.bonds: np.ndarray = bonds
+        self.bond_offsets: np.ndarray = bond_offsets
+        self.total_charges: np.ndarray = total_charges
+        self.ref_charges: np.ndarray = ref_charges
+        self.atom_parameters: np.ndarray = atom_parameters
+        self.atom_parameter_names: List[str] = atom_parameter_names
+        self.common_parameters: Dict[str, float] = common_parameters
+        self.weights: Optional[np.ndarray] = weights
+        self.shared: Optional[SharedLayout] = None
+
+    def __getstate__(self) -> dict:
+        # Shared arrays are mapped from the file by the receiving process instead of being copied
+        state = self.__dict__.copy()
+        if self.shared is not None:
+            for name, *_ in self.shared.arrays:
+                state[name] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if self.shared is not None:
+            self.attach()
+
+    def share(self) -> None:
+        """Move the arrays into a read-only file in shared memory
+
+        Processes receiving the dataset then map the same pages instead of having their own copies of the data.
+        Elements are stored as an array of strings.
+        """
+        fd, filename = tempfile.mkstemp(prefix='ccl_regression_dataset_',
+                                        dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+        arrays = []
+        with os.fdopen(fd, 'wb') as f:
+            for name in _SHARED_ARRAYS:
+                value = getattr(self, name)
+                if value is None:
+                    continue
+
+                array = np.ascontiguousarray(value)
+                f.write(b'\0' * (-f.tell() % _ALIGNMENT))
+                arrays.append((name, f.tell(), array.dtype.str, array.shape))
+                f.write(array.tobytes())
+
+        self.shared = SharedLayout(filename, arrays)
+        self.attach()
+
+    def attach(self) -> None:
+        """Map the arrays from the shared file"""
+        with open(self.shared.filename, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        for name, offset, dtype, shape in self.shared.arrays:
+            setattr(self, name, np.frombuffer(buffer, dtype, int(np.prod(shape)), offset).reshape(shape))
+
+    def release(self) -> None:
+        """Remove the shared file, the processes that already mapped it keep their arrays"""
+        if self.shared is not None:
+            os.remove(self.shared.filename)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def atoms(self, m: int) -> slice:
+        """Return the slice of atom arrays belonging to the molecule m"""
+        return slice(self.atom_offsets[m], self.atom_offsets[m + 1])
+
+    def molecule_bonds(self, m: int) -> np.ndarray:
+        """Return bonds of the molecule m"""
+        return self.bonds[self.bond_offsets[m]:self.bond_offsets[m + 1]]
+
+    def element_property(self, name: str) -> np.ndarray:
+        """Return the property of the element of every atom"""
+        values = read_element_properties()[name]
+        try:
+            return np.array([values[element] for element in self.elements])
+        except KeyError as e:
+            raise RuntimeError(f'Element property {name} is not known for {e.args[0]}')
+
+    def atom_weights(self) -> Optional[np.ndarray]:
+        """Return the weights of the molecules repeated for each of their atoms, None if not weighted"""
+        if self.weights is None:
+            return None
+        return np.repeat(self.weights, np.diff(self.atom_offsets))
+
+    def subset(self, molecules: Sequence[int], weights: Optional[np.ndarray] = None) -> 'Dataset':
+        """Return the dataset of the given molecules"""
+        atoms = np.concatenate([np.arange(self.atom_offsets[m], self.atom_offsets[m + 1]) for m in molecules])
+        bonds = [self.molecule_bonds(m) for m in molecules]
+        return Dataset([self.names[m] for m in molecules], [self.elements[i] for i in atoms], self.coordinates[atoms],
+                       np.concatenate([[0], np.cumsum(np.diff(self.atom_offsets)[molecules])]),
+                       np.concatenate(bonds).reshape(-1, 3),
+                       np.concatenate([[0], np.cumsum([len(x) for x in bonds])]), self.total_charges[molecules],
+                       self.ref_charges[atoms], self.atom_parameters[atoms], self.atom_parameter_names,
+                       self.common_parameters, weights)
+
+    @classmethod
+    def load(cls, dataset: str, ref_charges: str, parameters: Optional[str]) -> 'Dataset':
+        """Load the dataset, molecules without reference charges or parameters are skipped"""
+        molecules = read_sdf(dataset)
+        charges = read_charges(ref_charges)
+        common, atom_names, atom = read_parameters(parameters)
+
+        names = []
+        elements: List[str] = []
+        coordinates = []
+        atom_offsets = [0]
+        bonds = []
+        bond_offsets = [0]
+        total_charges = []
+        all_ref_charges = []
+        atom_parameters = []
+
+        skipped = 0
+        for name, mol_elements, mol_coordinates, mol_bonds, total_charge in molecules:
+            if name not in charges or len(charges[name]) != len(mol_elements):
+                skipped += 1
+                continue
+
+            mol_parameters = np.empty((len(mol_elements), len(atom_names)))
+            if atom_names:
+                # Highest bond order of each atom used by the 'hbo' classifier
+                hbo = np.ones(len(mol_elements), dtype=np.int64)
+                for a1, a2, order in mol_bonds:
+                    hbo[a1] = max(hbo[a1], order)
+                    hbo[a2] = max(hbo[a2], order)
+
+                try:
+                    for i, element in enumerate(mol_elements):
+                        key = (element, 'hbo', str(hbo[i]))
+                        if key not in atom:
+                            key = (element, 'plain', '*')
+                        mol_parameters[i] = atom[key]
+                except KeyError:
+                    skipped += 1
+                    continue
+
+            names.append(name)
+            elements.extend(mol_elements)
+            coordinates.append(mol_coordinates)
+            atom_offsets.append(atom_offsets[-1] + len(mol_elements))
+            bonds.append(mol_bonds.reshape(-1, 3))
+            bond_offsets.append(bond_offsets[-1] + len(mol_bonds))
+            total_charges.append(total_charge)
+            all_ref_charges.append(charges[name])
+            atom_parameters.append(mol_parameters)
+
+        if skipped:
+            print(f'Skipped {skipped} molecules without reference charges or parameters')
+
+        if not names:
+            raise RuntimeError('No molecule could be loaded from the dataset')
+
+        return cls(names, elements, np.concatenate(coordinates), np.array(atom_offsets), np.concatenate(bonds),
+                   np.array(bond_offsets), np.array(total_charges, dtype=np.float64), np.concatenate(all_ref_charges),
+                   np.concatenate(atom_parameters), atom_names, common)
@@ -6,9 +6,9 @@ import copy
 from functools import wraps
 
 
-from typing import List, Tuple, Callable
+from typing import List, NamedTuple, Tuple, Callable
 
-from deap import gp
+from deap import base, gp
 
 
 def gen_full(pset: gp.PrimitiveSetTyped, min_: int, max_: int, rng: random.Random, type_=None) -> List[gp.Primitive]:
@@ -79,10 +79,11 @@ def cx_one_point(ind1: gp.PrimitiveTree, ind2: gp.PrimitiveTree, rng: random.Ran
         types1[node.ret].append(idx)
     for idx, node in enumerate(ind2[1:], 1):
         types2[node.ret].append(idx)
-    common_types = set(types1.keys()).intersection(set(types2.keys()))
+    # Types are ordered by their first occurrence, a set of classes would depend on their ids and break reproducibility
+    common_types = [type_ for type_ in types1 if type_ in types2]
 
     if len(common_types) > 0:
-        type_ = rng.choice(list(common_types))
+        type_ = rng.choice(common_types)
 
         index1 = rng.choice(types1[type_])
         index2 = rng.choice(types2[type_])
@@ -185,3 +186,58 @@ def staticLimit(key: Callable, max_value: int) -> Callable:
             return new_inds
         return wrapper
     return decorator
+
+
+class Snapshot(NamedTuple):
+    """Nodes and evaluation of an individual before it was varied"""
+    nodes: List[gp.Primitive]
+    values: tuple
+    fidelity: float
+    sympy_code: str
+
+
+def take_snapshot(individual: gp.PrimitiveTree) -> Snapshot:
+    # Operators replace the nodes but never modify them, so a shallow copy is enough
+    return Snapshot(list(individual), individual.fitness.values, individual.fidelity, individual.sympy_code)
+
+
+def restore_unchanged(individual: gp.PrimitiveTree, snapshots: List[Snapshot]) -> bool:
+    """Keep the evaluation of the individual if it is equal to one of the snapshots, otherwise invalidate its fitness"""
+    for snapshot in snapshots:
+        if snapshot.values and snapshot.nodes == list(individual):
+            individual.fitness.values = snapshot.values
+            individual.fidelity = snapshot.fidelity
+            individual.sympy_code = snapshot.sympy_code
+            return True
+
+    del individual.fitness.values
+    return False
+
+
+def var_and(population: List[gp.PrimitiveTree], toolbox: base.Toolbox, cxpb: float,
+            mutpb: float) -> Tuple[List[gp.PrimitiveTree], int]:
+    """Apply crossover and mutation like algorithms.varAnd, but keep the fitness of the individuals left unchanged
+
+    Shrinking may not find a node to remove, crossover does nothing with single node trees and the limits replace the
+    offspring by copies of the parents, all these individuals do not need to be evaluated again. Returns the offspring
+    and the number of varied individuals that kept their fitness.
+    """
+    offspring = [toolbox.clone(ind) for ind in population]
+    varied = set()
+
+    for i in range(1, len(offspring), 2):
+        if random.random() < cxpb:
+            snapshots = [take_snapshot(offspring[i - 1]), take_snapshot(offspring[i])]
+            offspring[i - 1], offspring[i] = toolbox.mate(offspring[i - 1], offspring[i])
+            restore_unchanged(offspring[i - 1], snapshots)
+            restore_unchanged(offspring[i], snapshots[::-1])
+            varied.update((i - 1, i))
+
+    for i in range(len(offspring)):
+        if random.random() < mutpb:
+            snapshot = take_snapshot(offspring[i])
+            offspring[i], = toolbox.mutate(offspring[i])
+            restore_unchanged(offspring[i], [snapshot])
+            varied.add(i)
+
+    return offspring, sum(offspring[i].fitness.valid for i in varied)
@@ -1,30 +1,107 @@
 """Evaluate the fitness of an individual"""
 
-import concurrent.futures
+import contextlib
 import functools
+import itertools
 import math
 import multiprocessing
-import shutil
+import os
+import resource
+import shlex
 import subprocess
 import sys
 import tempfile
-from typing import Tuple, List
+import time
+from typing import Callable, Dict, Iterable, Iterator, Tuple, List, NamedTuple, Optional, Sequence, Union
 
-import chargefw2_python
 import sympy
 from deap import gp, base
 
 import ccl.errors
-from ccl.regression.generators import generate_optimized_ccl_code, generate_sympy_expr
+from ccl.regression.cache import FitnessCache, LibraryCache, open_fitness_cache
+from ccl.regression.generators import generate_optimized_ccl_code, generate_sympy_expr, read_optimized_ccl
+
+try:
+    import chargefw2_python
+except ImportError:
+    # Only the NumPy evaluator can be used without ChargeFW2
+    chargefw2_python = None
+
+
+class EncodedIndividual(NamedTuple):
+    """Compact form of an individual sent to the workers"""
+    sympy_code: str
+    code: str
+
+
+def task_individuals(task: Union[EncodedIndividual, List[EncodedIndividual]]) -> List[EncodedIndividual]:
+    """Return the encoded individuals of a task, which is either a single individual or a batch of them"""
+    return [task] if isinstance(task, EncodedIndividual) else list(task)
+
+
+class EvaluationContext(NamedTuple):
+    """Objects shared by all the evaluations, installed once in each worker instead of being sent with every task"""
+    method_skeleton: 'CCLMethod'
+    cache: FitnessCache
+    ccl_objects: dict
+    options: dict
+    message_queue: multiprocessing.Queue
 
 
 data = None
+library_cache: Optional[LibraryCache] = None
+precompiled_header: Optional[str] = None
+build_directory: Optional[str] = None
+context: Optional[EvaluationContext] = None
+
+# Arguments making the compiler read the source from its standard input
+STDIN_SOURCE = ('-x', 'c++', '-')
+
+
+def install_context(worker_context: EvaluationContext) -> None:
+    """Install the context in the worker with the fitness cache of the worker process
 
+    Forked worker inherits the initializer arguments instead of unpickling them, so the cache would be the instance of
+    the main process.
+    """
+    global context
+    cache = worker_context.cache
+    context = worker_context._replace(cache=open_fitness_cache(cache.filename, cache.local_size, cache.shared_size))
 
-def init(dataset: str, ref_charges: str, parameters: str) -> None:
-    """Initialize the data shared across the evaluations"""
+
+def init(dataset: str, ref_charges: str, parameters: str, worker_context: EvaluationContext,
+         cache: Optional[LibraryCache] = None, pch: Optional[str] = None, build_dir: Optional[str] = None) -> None:
+    """Initialize the data shared across the evaluations
+
+    The data parsed by the main process before the worker was forked are used instead of parsing them again.
+    """
+    global data, library_cache, precompiled_header, build_directory
+    start = time.perf_counter()
+    precompiled_header = pch
+    build_directory = build_dir
+    install_context(worker_context)
+    if data is None:
+        data = load_data(dataset, ref_charges, parameters)
+    library_cache = cache
+    report_stat(worker_context.message_queue, 'Worker initialization time', time.perf_counter() - start)
+
+
+def load_data(dataset: str, ref_charges: str, parameters: str) -> 'chargefw2_python.Data':
+    """Parse the dataset for ChargeFW2"""
+    if chargefw2_python is None:
+        raise RuntimeError('ChargeFW2 Python module not found, use the NumPy evaluator instead')
+    return chargefw2_python.Data(dataset, ref_charges, parameters)
+
+
+def share_data(dataset: str, ref_charges: str, parameters: str) -> None:
+    """Parse the dataset once in the main process, the forked workers inherit it instead of each parsing a copy"""
     global data
-    data = chargefw2_python.Data(dataset, ref_charges, parameters)
+    data = load_data(dataset, ref_charges, parameters)
+
+
+def report_stat(message_queue: multiprocessing.Queue, name: str, value: float) -> None:
+    """Send a value to be summarized at the end of the run"""
+    message_queue.put(('stat', name, value))
 
 
 def get_objective_value(fitness: Tuple[float, float, float, float], options: dict) -> float:
@@ -46,78 +123,404 @@ def get_objective_value(fitness: Tuple[float, float, float, float], options: dic
         return 1 - fitness[1]
 
 
-def evaluate(individual: 'creator.Individual', method_skeleton: 'CCLMethod', cache: dict, ccl_objects: dict, options: dict,
-             message_queue: multiprocessing.Queue) -> Tuple[float, float, float, float, float]:
-    """Evaluate individual by calculating RMSD or R2 between new and reference charges"""
-    invalid_result = math.inf, -math.inf, math.inf, math.inf, math.inf
+def get_compile_flags(options: dict, promoted: bool = False) -> List[str]:
+    """Return the flags used to compile the generated methods, the precompiled header is built with the same ones
+
+    Individuals are first compiled with the screening optimization flags, the promoted ones are rebuilt with the
+    promotion flags.
+    """
+    optimization = options['promotion_flags'] if promoted else options['screening_flags']
+    return [*shlex.split(optimization), '-fPIC', f'-isystem{options["eigen_include"]}',
+            f'-I{options["chargefw2_dir"]}/include']
+
+
+def get_compiler_args(options: dict, library: str = 'libREGRESSION.so',
+                      sources: Sequence[str] = ('ccl_method.cpp',), promoted: bool = False) -> List[str]:
+    """Return the arguments used to compile the generated method into a shared library"""
+    chargefw2_dir = options['chargefw2_dir']
+
+    return ['g++', *get_compile_flags(options, promoted), '-s', '-shared', '-Wl,-soname,libREGRESSION.so',
+            f'-L{chargefw2_dir}/lib', f'-Wl,-rpath,{chargefw2_dir}lib:', '-o', library, *sources, '-lchargefw2']
+
+
+def create_build_directory() -> str:
+    """Create the directory of the libraries compiled during the run, in memory if possible"""
+    return tempfile.mkdtemp(prefix='ccl_regression_build_', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+
+
+@contextlib.contextmanager
+def temporary_library() -> Iterator[str]:
+    """Return the name of a file in the build directory for the compiled library, it is removed on leaving"""
+    fd, library = tempfile.mkstemp(prefix='lib', suffix='.so', dir=build_directory)
+    os.close(fd)
+    try:
+        yield library
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(library)
+
+
+def with_precompiled_header(args: List[str]) -> List[str]:
+    """Add the precompiled header to the compiler arguments if it is used"""
+    if precompiled_header is None:
+        return args
+
+    return [args[0], '-include', precompiled_header, *args[1:]]
+
+
+def process_result(result: Tuple[float, float, float, float],
+                   options: dict) -> Tuple[float, float, float, float, float]:
+    """Add the objective value to the metrics computed by ChargeFW2"""
+    # Check whether the charges were successfully computed
+    if any(x < 0 for x in result):
+        return math.inf, -math.inf, math.inf, math.inf, math.inf
+
+    return get_objective_value(result, options), *result
+
 
+INVALID_RESULT = math.inf, -math.inf, math.inf, math.inf, math.inf
+
+
+def encode_individual(individual: 'creator.Individual', ccl_objects: dict) -> EncodedIndividual:
+    """Convert an individual into the form sent to the workers, the code is inserted into the skeleton"""
+    return EncodedIndividual(individual.sympy_code, generate_optimized_ccl_code(individual, ccl_objects))
+
+
+def get_cached_result(individual: EncodedIndividual, cache: FitnessCache,
+                      message_queue: multiprocessing.Queue) -> Optional[Tuple[float, float, float, float, float]]:
+    """Return the fitness if it is known without evaluating the individual"""
     assert hasattr(individual, 'sympy_code')
     assert individual.sympy_code != ''
 
     if individual.sympy_code == '<expr-error>' or individual.sympy_code.startswith('<non-real>'):
-        message_queue.put(('Invalid', individual.sympy_code, invalid_result))
-        return invalid_result
+        message_queue.put(('Invalid', individual.sympy_code, INVALID_RESULT))
+        return INVALID_RESULT
+
+    result, local = cache.lookup(individual.sympy_code)
+    if result is not None:
+        message_queue.put(('Cached' if local else 'Shared', individual.sympy_code, result))
+        return result
+
+    return None
+
+
+def get_stored_result(individual: EncodedIndividual, key: str, cache: FitnessCache, options: dict,
+                      message_queue: multiprocessing.Queue) -> Optional[Tuple[float, float, float, float, float]]:
+    """Return the fitness stored in the persistent cache"""
+    global library_cache
+    stored_result = library_cache.get_fitness(key)
+    if stored_result is None:
+        return None
+
+    result = process_result(stored_result, options)
+    message_queue.put(('Stored', individual.sympy_code, result))
+    cache[individual.sympy_code] = result
+    return result
+
 
-    if str(individual.sympy_code) in cache:
-        message_queue.put(('Cached', individual.sympy_code, cache[individual.sympy_code]))
-        return cache[individual.sympy_code]
+def translate_individual(individual: EncodedIndividual, method_skeleton: 'CCLMethod',
+                         **kwargs: Union[str, bool]) -> Optional[Tuple['CCLMethod', str]]:
+    """Create a new method by inserting the individual into the skeleton and translate it into C++
 
-    new_expr = generate_optimized_ccl_code(individual, ccl_objects)
-    new_source = method_skeleton.source.format(f'({new_expr})')
+    The AST of the individual's code is spliced into the analyzed skeleton if it can be read without the parser, the
+    whole source is parsed otherwise.
+    """
+    new_source = method_skeleton.source.format(f'({individual.code})')
+    expr = read_optimized_ccl(individual.code)
 
-    tmpdir = tempfile.mkdtemp(prefix='ccl_regression_')
     try:
-        new_method = method_skeleton.__class__(new_source)
-        new_method.translate('cpp', output_dir=tmpdir)
+        if expr is not None:
+            new_method = method_skeleton.substitute_regression_expr(expr, individual.code)
+        else:
+            new_method = method_skeleton.__class__(new_source)
+        cpp_code = new_method.translate('cpp', **kwargs)
     except ccl.errors.CCLCodeError as e:
-        line = new_source.split('\n')[e.line - 1]
-        print(f'CCL Compilation Error: {e.line}:{e.column}: {line}: {e.message}', file=sys.stderr)
-        return invalid_result
+        if expr is not None:
+            print(f'CCL Compilation Error: {individual.code}: {e.message}', file=sys.stderr)
+        else:
+            line = new_source.split('\n')[e.line - 1]
+            print(f'CCL Compilation Error: {e.line}:{e.column}: {line}: {e.message}', file=sys.stderr)
+        return None
     except Exception as e:
         print(f'Unknown error during compilation: {e}', file=sys.stderr)
         print(new_source)
-        return invalid_result
+        return None
 
-    chargefw2_dir = options['chargefw2_dir']
+    return new_method, cpp_code
+
+
+def get_compiler_limits(options: dict) -> Dict[str, Optional[float]]:
+    """Return the time (in seconds) and memory (in bytes) limits of the compiler as arguments of run_compiler"""
+    memory_limit = options['compile_memory_limit']
+    return {'timeout': options['compile_timeout'],
+            'memory_limit': memory_limit * 1024 * 1024 if memory_limit is not None else None}
+
+
+def limit_address_space(limit: Optional[int]) -> Optional[Callable[[], None]]:
+    """Return the function setting the address space limit of a child process before it executes
+
+    The limit of the evaluation worker is lifted for the compiler it runs unless the compiler has its own one.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if limit is None and soft == hard:
+        return None
 
-    args = ['g++', '-O1', '-s', '-fPIC', f'-isystem{options["eigen_include"]}', f'-I{chargefw2_dir}/include', '-shared',
-            '-Wl,-soname,libREGRESSION.so', f'-L{chargefw2_dir}/lib', f'-Wl,-rpath,{chargefw2_dir}lib:',
-            '-o', 'libREGRESSION.so', 'ccl_method.cpp', '-lchargefw2']
+    value = hard if limit is None else limit if hard == resource.RLIM_INFINITY else min(limit, hard)
+    return lambda: resource.setrlimit(resource.RLIMIT_AS, (value, hard))
 
-    p = subprocess.run(args, cwd=tmpdir, stderr=subprocess.PIPE)
-    if p.stderr:
-        print(f'Warning issued: {new_expr}', file=sys.stderr)
-        print(p.stderr.decode('utf-8'))
-        return invalid_result
-    if p.returncode:
-        print(f'Cannot compile: {new_expr}', file=sys.stderr)
-        return invalid_result
 
+def run_compiler(args: List[str], cwd: Optional[str], description: str,
+                 message_queue: Optional[multiprocessing.Queue] = None, timeout: Optional[float] = None,
+                 memory_limit: Optional[int] = None, source: Optional[str] = None) -> bool:
+    """Run the compiler, return whether it succeeded without any warning
+
+    If the message queue is given, the time spent in the compiler is reported. The compiler running longer than the
+    timeout is killed and subprocess.TimeoutExpired is raised. If the source is given, it is passed to the standard
+    input of the compiler.
+    """
+    start = time.perf_counter()
+    p = subprocess.run(args, cwd=cwd, stderr=subprocess.PIPE, timeout=timeout,
+                       input=source.encode('utf-8') if source is not None else None,
+                       preexec_fn=limit_address_space(memory_limit))
+    if message_queue is not None:
+        report_compilation_time(message_queue, args, time.perf_counter() - start)
+
+    return check_compiler_output(p.returncode, p.stderr, description)
+
+
+def report_library(message_queue: multiprocessing.Queue, library: str, stored: bool) -> None:
+    """Report the files created for a compiled library and their size"""
+    size = os.path.getsize(library) / 1024
+    report_stat(message_queue, 'Files created', 2 if stored else 1)
+    report_stat(message_queue, 'Disk usage (KiB)', 2 * size if stored else size)
+
+
+def report_compilation_time(message_queue: multiprocessing.Queue, args: List[str], elapsed: float) -> None:
+    """Report the time spent in the compiler"""
+    kind = 'with precompiled header' if '-include' in args else 'without precompiled header'
+    report_stat(message_queue, f'Compilation time ({kind})', elapsed)
+
+
+def check_compiler_output(returncode: int, stderr: bytes, description: str) -> bool:
+    """Return whether the compiler succeeded without any warning"""
+    if stderr:
+        print(f'Warning issued: {description}', file=sys.stderr)
+        print(stderr.decode('utf-8'))
+        return False
+    if returncode:
+        print(f'Cannot compile: {description}', file=sys.stderr)
+        return False
+
+    return True
+
+
+def evaluate_library(individual: EncodedIndividual, library: str, key: Optional[str], cache: FitnessCache,
+                     options: dict, message_queue: multiprocessing.Queue) -> Tuple[float, float, float, float, float]:
+    """Calculate the charges using the compiled library and compare them to the reference ones"""
     global data
+    start = time.perf_counter()
     try:
-        result = chargefw2_python.evaluate(data, f'{tmpdir}/libREGRESSION.so')
+        raw_result = chargefw2_python.evaluate(data, library)
     except RuntimeError:
-        message_queue.put(('Invalid', individual.sympy_code, invalid_result))
-        return invalid_result
+        message_queue.put(('Invalid', individual.sympy_code, INVALID_RESULT))
+        return INVALID_RESULT
+    report_stat(message_queue, 'Evaluation time', time.perf_counter() - start)
 
-    shutil.rmtree(tmpdir)
+    return record_result(individual, raw_result, key, cache, options, message_queue)
 
-    # Check whether the charges were successfully computed
-    if any(x < 0 for x in result):
-        result = invalid_result
-    else:
-        result = get_objective_value(result, options), *result
+
+def record_result(individual: EncodedIndividual, raw_result: Tuple[float, float, float, float], key: Optional[str],
+                  cache: FitnessCache, options: dict,
+                  message_queue: multiprocessing.Queue) -> Tuple[float, float, float, float, float]:
+    """Store the metrics of an evaluated individual in the caches and report them"""
+    global library_cache
+    if key is not None:
+        library_cache.store_fitness(key, raw_result)
+
+    result = process_result(raw_result, options)
 
     message_queue.put(('Evaluated', individual.sympy_code, result))
     cache[individual.sympy_code] = result
     return result
 
 
-def evaluate_population(pop: List[gp.PrimitiveTree], toolbox: base.Toolbox) -> None:
-    """Evaluate the fitness for each individual in the population"""
-    fitnesses = toolbox.map(toolbox.evaluate, pop)
-    for ind, fit in zip(pop, fitnesses):
-        ind.fitness.values = fit
+def reject_individual(sympy_code: str, kind: str, cache: FitnessCache,
+                      message_queue: multiprocessing.Queue) -> Tuple[float, float, float, float, float]:
+    """Give the invalid fitness to the individual stopped over a limit, so that it is not evaluated again"""
+    message_queue.put((kind, sympy_code, INVALID_RESULT))
+    cache[sympy_code] = INVALID_RESULT
+    return INVALID_RESULT
+
+
+class PreparedIndividual(NamedTuple):
+    """Individual translated into C++ and ready to be compiled"""
+    result: Optional[Tuple[float, float, float, float, float]]
+    source: Optional[str]
+    key: Optional[str]
+    library: Optional[str]
+
+
+def prepare_individual(individual: EncodedIndividual, method_skeleton: 'CCLMethod', cache: FitnessCache,
+                       options: dict, message_queue: multiprocessing.Queue) -> PreparedIndividual:
+    """Translate the individual into a single C++ source unless its fitness is already known
+
+    The key of the individual and the compiled library are set if the persistent cache is used, the library is a link
+    in the build directory to be removed by the caller.
+    """
+    result = get_cached_result(individual, cache, message_queue)
+    if result is not None:
+        return PreparedIndividual(result, None, None, None)
+
+    translated = translate_individual(individual, method_skeleton, inline_header=True)
+    if translated is None:
+        return PreparedIndividual(INVALID_RESULT, None, None, None)
+
+    _, cpp_code = translated
+
+    global library_cache
+    key = None
+    library = None
+    if library_cache is not None:
+        key = library_cache.make_key(cpp_code, get_compiler_args(options))
+        result = get_stored_result(individual, key, cache, options, message_queue)
+        if result is not None:
+            return PreparedIndividual(result, None, None, None)
+
+        library = library_cache.get_library(key, build_directory)
+
+    return PreparedIndividual(None, cpp_code, key, library)
+
+
+def evaluate(individual: EncodedIndividual) -> Tuple[float, float, float, float, float]:
+    """Evaluate individual by calculating RMSD or R2 between new and reference charges
+
+    The source is passed to the compiler through its standard input and the library is written to the build
+    directory, which is in memory if possible, and removed after the evaluation.
+    """
+    method_skeleton, cache, _, options, message_queue = context
+    prepared = prepare_individual(individual, method_skeleton, cache, options, message_queue)
+    if prepared.result is not None:
+        return prepared.result
+
+    if prepared.library is not None:
+        try:
+            return evaluate_library(individual, prepared.library, prepared.key, cache, options, message_queue)
+        finally:
+            os.remove(prepared.library)
+
+    return compile_and_evaluate(individual, prepared.source, STDIN_SOURCE, prepared.key, cache, options,
+                                message_queue)
+
+
+def compile_and_evaluate(individual: EncodedIndividual, source: str, sources: Sequence[str], key: Optional[str],
+                         cache: FitnessCache, options: dict, message_queue: multiprocessing.Queue,
+                         precompiled: bool = True) -> Tuple[float, float, float, float, float]:
+    """Compile the source passed to the standard input of the compiler together with the other sources and evaluate
+    the library, it is stored in the persistent cache if used"""
+    with temporary_library() as library:
+        args = get_compiler_args(options, library, sources)
+        if precompiled:
+            args = with_precompiled_header(args)
+        try:
+            compiled = run_compiler(args, None, individual.code, message_queue, **get_compiler_limits(options),
+                                    source=source)
+        except subprocess.TimeoutExpired:
+            return reject_individual(individual.sympy_code, 'Timeout', cache, message_queue)
+
+        if not compiled:
+            return INVALID_RESULT
+
+        report_library(message_queue, library, library_cache is not None)
+        if library_cache is not None:
+            library_cache.store_library(key, library)
+        return evaluate_library(individual, library, key, cache, options, message_queue)
+
+
+def rebuild_individual(individual: EncodedIndividual) -> Optional[float]:
+    """Compile the individual with the promotion flags, evaluate it again and return its objective value
+
+    Times of the optimized build are reported apart from the screening ones so that the tiers can be compared. The
+    library is not stored in the persistent cache, where nothing would look it up. None is returned if the build or
+    its evaluation fails.
+    """
+    method_skeleton, _, _, options, message_queue = context
+    translated = translate_individual(individual, method_skeleton, inline_header=True)
+    if translated is None:
+        return None
+
+    _, cpp_code = translated
+    with temporary_library() as library:
+        start = time.perf_counter()
+        try:
+            compiled = run_compiler(get_compiler_args(options, library, STDIN_SOURCE, promoted=True), None,
+                                    individual.code, **get_compiler_limits(options), source=cpp_code)
+        except subprocess.TimeoutExpired:
+            return None
+        if not compiled:
+            return None
+        report_stat(message_queue, 'Compilation time (promoted)', time.perf_counter() - start)
+
+        start = time.perf_counter()
+        try:
+            raw_result = chargefw2_python.evaluate(data, library)
+        except RuntimeError:
+            return None
+        report_stat(message_queue, 'Evaluation time (promoted)', time.perf_counter() - start)
+
+    return process_result(raw_result, options)[0]
+
+
+def select_unique(pop: List[gp.PrimitiveTree],
+                  evaluated: Iterable[gp.PrimitiveTree] = ()) -> Dict[str, gp.PrimitiveTree]:
+    """Return the first individual of each code that is not among the codes of the evaluated individuals"""
+    known = {ind.sympy_code for ind in evaluated if ind.fitness.valid}
+    unique: Dict[str, gp.PrimitiveTree] = {}
+    for ind in pop:
+        if ind.sympy_code not in known:
+            unique.setdefault(ind.sympy_code, ind)
+
+    return unique
+
+
+def evaluate_population(pop: List[gp.PrimitiveTree], toolbox: base.Toolbox, batch_size: Optional[int] = None,
+                        threshold: float = math.inf, evaluated: Iterable[gp.PrimitiveTree] = ()) -> None:
+    """Evaluate the fitness for each individual in the population
+
+    Each code is evaluated only once, the individuals with the same code as another one or as one of the already
+    evaluated individuals take its fitness. In the racing mode, the individuals whose objective value on a subset of
+    molecules exceeds the threshold keep the fitness computed on that subset, the fraction of the molecules used is
+    stored as their fidelity. Tasks stopped over the time or memory limit have no result, their individuals get the
+    invalid fitness.
+    """
+    evaluated = list(evaluated)
+    unique = select_unique(pop, evaluated)
+    dispatched = list(unique.values())
+
+    # Only the encoded individuals are sent to the workers, the rest is installed there by the pool initializer
+    encoded = [toolbox.encode(ind) for ind in dispatched]
+    if hasattr(toolbox, 'race'):
+        for ind, raced in zip(dispatched, toolbox.map(functools.partial(toolbox.race, threshold=threshold), encoded)):
+            ind.fitness.values, ind.fidelity = raced if raced is not None else (INVALID_RESULT, 1.0)
+    else:
+        if hasattr(toolbox, 'pipeline'):
+            fitnesses = toolbox.pipeline(encoded)
+        elif batch_size is None:
+            fitnesses = toolbox.map(toolbox.evaluate, encoded)
+        else:
+            batches = [encoded[i:i + batch_size] for i in range(0, len(encoded), batch_size)]
+            fitnesses = itertools.chain.from_iterable(
+                results if results is not None else [None] * len(batch)
+                for batch, results in zip(batches, toolbox.map(toolbox.evaluate_batch, batches)))
+        for ind, fit in zip(dispatched, fitnesses):
+            ind.fitness.values = fit if fit is not None else INVALID_RESULT
+
+    sources = {ind.sympy_code: ind for ind in evaluated if ind.fitness.valid}
+    sources.update(unique)
+    for ind in pop:
+        source = sources[ind.sympy_code]
+        if source is not ind:
+            ind.fitness.values = source.fitness.values
+            ind.fidelity = source.fidelity
 
 
 def generate_sympy_code(x: gp.PrimitiveTree, ccl_objects: dict) -> str:
@@ -131,10 +534,3 @@ def generate_sympy_code(x: gp.PrimitiveTree, ccl_objects: dict) -> str:
         return '<expr-error>'
     return str(sympy_expr)
 
-
-def generate_sympy_codes(pop: List[gp.PrimitiveTree], ccl_objects: dict) -> None:
-    """Generate sympy codes for all individuals in the population"""
-    executor = concurrent.futures.ProcessPoolExecutor()
-    sympy_codes = executor.map(functools.partial(generate_sympy_code, ccl_objects=ccl_objects), pop)
-    for ind, sympy_code in zip(pop, sympy_codes):
-        ind.sympy_code = sympy_code
@@ -0,0 +1,96 @@
+"""Generational loop of the GP algorithm"""
+
+import multiprocessing
+from typing import Callable, Dict, List, Optional
+
+from deap import base, gp, tools
+
+from ccl.regression.constant_fitting import ConstantFitter
+from ccl.regression.deap_gp import var_and
+from ccl.regression.evaluate import evaluate_population, select_unique
+from ccl.regression.racing import fully_evaluated, get_racing_threshold
+from ccl.regression.sympy_pool import SympyPool
+
+
+def compile_record(pop: List[gp.PrimitiveTree], toolbox: base.Toolbox, stats: tools.MultiStatistics) -> dict:
+    """Return the statistics of the population and of the scheduling of its evaluation if available"""
+    record = stats.compile(pop)
+    if hasattr(toolbox, 'schedule_stats'):
+        record['Schedule'] = toolbox.schedule_stats()
+    return record
+
+
+def evolve(pop: List[gp.PrimitiveTree], toolbox: base.Toolbox, options: dict, sympy_pool: SympyPool,
+           fitter: Optional[ConstantFitter], hof: tools.HallOfFame, stats: tools.MultiStatistics,
+           logbook: tools.Logbook, message_queue: multiprocessing.Queue, wanted: Optional[Dict[str, Optional[int]]],
+           get_batch_size: Callable[[int], Optional[int]],
+           migrate: Optional[Callable[[List[gp.PrimitiveTree], int], None]] = None,
+           checkpoint: Optional[Callable[[List[gp.PrimitiveTree], int], None]] = None,
+           start_gen: Optional[int] = None) -> None:
+    """Evaluate the initial population and evolve it for the given number of generations
+
+    The population is modified in place. If migrate is given, it is called after every generation with the population
+    and the number of the generation, it can exchange individuals with other populations. If checkpoint is given, it is
+    called with the population and the number of the next generation whenever a generation is finished. The evolution
+    of a population restored from a checkpoint continues from start_gen, its evaluation is skipped.
+    """
+    if start_gen is None:
+        if fitter is not None:
+            sympy_pool.generate_sympy_codes(fitter.fit(pop))
+        count = len(select_unique(pop))
+        message_queue.put(('gen', 0, count))
+        evaluate_population(pop, toolbox, get_batch_size(count))
+
+        hof.update(fully_evaluated(pop))
+        record = compile_record(pop, toolbox, stats)
+        logbook.record(gen=0, evals=len(pop), unchanged=0, **record, best=hof[0].sympy_code)
+
+        if checkpoint is not None:
+            checkpoint(pop, 0)
+        start_gen = 0
+
+    for gen in range(start_gen, options['generations']):
+        if options['early_exit']:
+            found = False
+            for individual in pop:
+                # Check if RMSD < 0.0001 and R2 > 0.9999
+                if individual.fitness.values[1] < 0.0001 and individual.fitness.values[2] > 0.9999:
+                    found = True
+                    break
+            if found:
+                break
+
+        # Offspring have to be as good as the current population on the subsets to be evaluated on all molecules
+        threshold = get_racing_threshold(pop, options)
+        offspring = toolbox.select(pop, len(pop))
+        offspring, unchanged = var_and(offspring, toolbox, options['crossover_probability'],
+                                       options['mutation_probability'])
+
+        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+
+        sympy_pool.generate_sympy_codes(invalid_ind)
+        if fitter is not None:
+            sympy_pool.generate_sympy_codes(fitter.fit(invalid_ind))
+
+        # Duplicates and the codes already present in the population are not sent to the workers
+        count = len(select_unique(invalid_ind, pop))
+        message_queue.put(('gen', gen + 1, count))
+        evaluate_population(invalid_ind, toolbox, get_batch_size(count), threshold, pop)
+        pop[:] = offspring
+
+        if migrate is not None:
+            migrate(pop, gen + 1)
+
+        hof.update(fully_evaluated(pop))
+        if hasattr(toolbox, 'promote'):
+            toolbox.promote(pop, hof)
+        record = compile_record(pop, toolbox, stats)
+        logbook.record(gen=gen + 1, evals=len(invalid_ind), unchanged=unchanged, **record, best=hof[0].sympy_code)
+
+        if wanted is not None:
+            for ind in pop:
+                if ind.sympy_code in wanted and wanted[ind.sympy_code] is None:
+                    wanted[ind.sympy_code] = gen
+
+        if checkpoint is not None:
+            checkpoint(pop, gen + 1)
@@ -1,10 +1,30 @@
 """Generate sympy or ccl code from an individual"""
 
 import decimal
+import re
+from typing import List, Optional, Tuple
 
 import sympy
 from deap import gp
 
+import ccl.ast
+from ccl.types import NumericType, ObjectType
+
+# Tokens of CCL expressions, a number may start with a minus sign just like in the lexer
+_TOKEN = re.compile(r'\s*(?:(?P<number>-?\d+(?:\.\d*)?)|(?P<name>[a-zA-Z][a-zA-Z0-9_]*)|(?P<symbol>[-+*/^()\[\],]))')
+
+# Words reserved by the lexer, the parser does not accept them as names
+_KEYWORDS = {'name', 'atom', 'bond', 'common', 'parameter', 'where', 'done', 'is', 'and', 'or', 'not', 'for', 'to',
+             'if', 'of', 'sum', 'cutoff', 'cover', 'EE'}
+
+# Precedence of the binary operators as given by the order of the alternatives in the grammar
+_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 4}
+_UNARY_PRECEDENCE = 3
+
+
+class _UnreadableCode(Exception):
+    """Code is not an expression generated for an individual"""
+
 
 def generate_sympy_expr(expr: gp.PrimitiveTree, ccl_objects: dict) -> sympy.Expr:
     """Generates optimized sympy expression from an individual"""
@@ -155,3 +175,134 @@ def generate_optimized_ccl_code(expr: gp.PrimitiveTree, ccl_objects: dict) -> st
             stack[-1][1].append(string)
 
     return string
+
+
+def read_optimized_ccl(code: str, pos: Tuple[int, int] = (-1, -1)) -> Optional[ccl.ast.Expression]:
+    """Build the AST of the code generated for an individual without the ANTLR parser
+
+    Only arithmetic, names, subscripts and functions are read, the AST is the same as the parser would build. None is
+    returned for any other code, which has to go through the parser to get its error reported.
+    """
+    tokens: List[Tuple[str, str]] = []
+    end = 0
+    while end < len(code.rstrip()):
+        match = _TOKEN.match(code, end)
+        if match is None:
+            return None
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        end = match.end()
+    tokens.append(('end', ''))
+
+    position = 0
+
+    def expect(text: str) -> None:
+        nonlocal position
+        if tokens[position][1] != text:
+            raise _UnreadableCode
+        position += 1
+
+    def name() -> str:
+        nonlocal position
+        kind, text = tokens[position]
+        if kind != 'name' or text in _KEYWORDS:
+            raise _UnreadableCode
+        position += 1
+        return text
+
+    def primary() -> ccl.ast.Expression:
+        nonlocal position
+        kind, text = tokens[position]
+        if text in ('+', '-'):
+            position += 1
+            operand = expression(_UNARY_PRECEDENCE)
+            return operand if text == '+' else ccl.ast.UnaryOp(pos, ccl.ast.UnaryOp.Ops.NEG, operand)
+        elif text == '(':
+            position += 1
+            node = expression(1)
+            expect(')')
+            return node
+        elif kind == 'number':
+            position += 1
+            try:
+                return ccl.ast.Number(pos, int(text), NumericType.INT)
+            except ValueError:
+                return ccl.ast.Number(pos, float(text), NumericType.FLOAT)
+
+        symbol = name()
+        if tokens[position][1] == '(':
+            position += 1
+            node = ccl.ast.Function(pos, symbol, expression(1))
+            expect(')')
+            return node
+        elif tokens[position][1] == '[':
+            position += 1
+            indices = [ccl.ast.Name(pos, name())]
+            if tokens[position][1] == ',':
+                position += 1
+                indices.append(ccl.ast.Name(pos, name()))
+            expect(']')
+            return ccl.ast.Subscript(pos, ccl.ast.Name(pos, symbol), tuple(indices))
+
+        return ccl.ast.Name(pos, symbol)
+
+    def expression(precedence: int) -> ccl.ast.Expression:
+        nonlocal position
+        left = primary()
+        while tokens[position][0] == 'symbol' and _PRECEDENCE.get(tokens[position][1], 0) >= precedence:
+            op = tokens[position][1]
+            position += 1
+            # Power is right associative, the other operators are left associative
+            right = expression(_PRECEDENCE[op] + (op != '^'))
+            left = ccl.ast.BinaryOp(pos, left, ccl.ast.BinaryOp.Ops(op), right)
+        return left
+
+    try:
+        node = expression(1)
+        expect('')
+    except _UnreadableCode:
+        return None
+
+    return node
+
+
+def generate_terminal_ast(name: str, ccl_objects: dict, pos: Tuple[int, int]) -> ccl.ast.Expression:
+    """Generates CCL expression for a terminal of the primitive set"""
+    distance_name = ccl_objects.get('distance', None)
+    atom_names = ccl_objects['atom_objects']
+
+    def subscript(symbol: str, *indices: str) -> ccl.ast.Subscript:
+        names = tuple(ccl.ast.Name(pos, index) for index in indices)
+        for index in names:
+            index.result_type = ObjectType.ATOM
+        node = ccl.ast.Subscript(pos, ccl.ast.Name(pos, symbol), names)
+        node.result_type = NumericType.FLOAT
+        return node
+
+    def binary_op(left: ccl.ast.Expression, op: ccl.ast.BinaryOp.Ops,
+                  right: ccl.ast.Expression) -> ccl.ast.BinaryOp:
+        node = ccl.ast.BinaryOp(pos, left, op, right)
+        node.result_type = NumericType.FLOAT
+        return node
+
+    def inverse(expr: ccl.ast.Expression) -> ccl.ast.BinaryOp:
+        return binary_op(ccl.ast.Number(pos, 1.0, NumericType.FLOAT), ccl.ast.BinaryOp.Ops.DIV, expr)
+
+    if name.startswith('_sym_add'):
+        x = name.split('_')[-1]
+        return binary_op(subscript(x, atom_names[0]), ccl.ast.BinaryOp.Ops.ADD, subscript(x, atom_names[1]))
+    elif name.startswith('_sym_inv_add'):
+        x = name.split('_')[-1]
+        return binary_op(inverse(subscript(x, atom_names[0])), ccl.ast.BinaryOp.Ops.ADD,
+                         inverse(subscript(x, atom_names[1])))
+    elif name.startswith('_sym_mul'):
+        x = name.split('_')[-1]
+        return binary_op(subscript(x, atom_names[0]), ccl.ast.BinaryOp.Ops.MUL, subscript(x, atom_names[1]))
+    elif distance_name is not None and name == distance_name:
+        return subscript(distance_name, atom_names[0], atom_names[1])
+    elif name.startswith('_term'):
+        x, atom_name = name.split('_')[-2:]
+        return subscript(x, atom_name)
+    else:
+        node = ccl.ast.Name(pos, name)
+        node.result_type = NumericType.FLOAT
+        return node
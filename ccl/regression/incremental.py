@@ -0,0 +1,135 @@
+"""Evaluate individuals compiled separately from the skeleton, which is compiled into an object file only once"""
+
+import os
+from typing import List, Optional, Tuple
+
+from deap import gp
+
+import ccl.regression.evaluate as evaluate_module
+from ccl.regression.cache import LibraryCache
+from ccl.regression.evaluate import STDIN_SOURCE, EncodedIndividual, EvaluationContext, get_cached_result, \
+    get_stored_result, get_compile_flags, run_compiler, evaluate_library, compile_and_evaluate, \
+    with_precompiled_header, init
+from ccl.regression.interpreter import create_program_skeleton, get_program_terminals
+
+# Name of the function computing the regression expression from the values of the terminals
+EXPRESSION_FUNCTION = 'ccl_regression_expression'
+
+expression_template = '''\
+#include <cmath>
+
+extern "C" double {name}({args}) {{
+    return {code};
+}}
+'''
+
+skeleton_object: Optional[str] = None
+skeleton_key: Optional[str] = None
+skeleton_terminals: int = 0
+
+
+def generate_expression(individual: gp.PrimitiveTree, terminals: List[str]) -> str:
+    """Generate C++ expression of the individual, the terminals are the arguments t0, t1, ..."""
+    terminal_indices = {name: idx for idx, name in enumerate(terminals)}
+    unary = {
+        'sqrt': 'std::sqrt({})',
+        'cbrt': 'std::pow({}, 1.0 / 3.0)',
+        'square': 'std::pow({}, 2.0)',
+        'cube': 'std::pow({}, 3.0)',
+        'exp': 'std::exp({})',
+        'inv': '(1.0 / {})',
+        'double': '(2.0 * {})',
+        'half': '(0.5 * {})',
+    }
+    binary = {'add': '+', 'sub': '-', 'mul': '*', 'div': '/'}
+
+    string = ''
+    stack = []
+    for node in individual:
+        stack.append((node, []))
+        while len(stack[-1][1]) == stack[-1][0].arity:
+            prim, args = stack.pop()
+            if prim.name in binary:
+                string = f'({args[0]} {binary[prim.name]} {args[1]})'
+            elif prim.name in unary:
+                string = unary[prim.name].format(args[0])
+            elif isinstance(prim, gp.Primitive):
+                # Math function
+                string = f'std::{prim.name}({args[0]})'
+            elif prim.name in terminal_indices:
+                string = f't{terminal_indices[prim.name]}'
+            else:
+                string = f'({float(prim.format())!r})'
+            if len(stack) == 0:
+                break  # If stack is empty, all nodes should have been seen
+            stack[-1][1].append(string)
+
+    return string
+
+
+def encode_expression(individual: 'creator.Individual', terminals: List[str]) -> EncodedIndividual:
+    """Convert an individual into the form sent to the workers"""
+    return EncodedIndividual(individual.sympy_code, generate_expression(individual, terminals))
+
+
+def get_expression_source(code: str, terminals: int) -> str:
+    """Return the translation unit defining the function with the expression"""
+    return expression_template.format(name=EXPRESSION_FUNCTION, code=code,
+                                      args=', '.join(f'double t{i}' for i in range(terminals)))
+
+
+def build_skeleton_object(method_skeleton: 'CCLMethod', primitive_set: gp.PrimitiveSetTyped, ccl_objects: dict,
+                          options: dict, directory: str) -> Tuple[str, str, List[str]]:
+    """Compile the skeleton with the regression expression replaced by a call of the separately compiled function
+
+    Returns the path to the object file, its key and the list of terminals in the order of the function arguments.
+    """
+    terminals = get_program_terminals(primitive_set)
+    method = create_program_skeleton(method_skeleton, terminals, ccl_objects)
+
+    cpp_code = method.translate('cpp', inline_header=True, regression_function=EXPRESSION_FUNCTION)
+    args = ['g++', *get_compile_flags(options), '-c', '-o', 'skeleton.o', *STDIN_SOURCE]
+    if not run_compiler(with_precompiled_header(args), directory, 'skeleton with the expression function',
+                        source=cpp_code):
+        raise RuntimeError('Cannot compile the skeleton with the expression function')
+
+    return os.path.join(directory, 'skeleton.o'), LibraryCache.make_key(cpp_code, args), terminals
+
+
+def init_incremental(dataset: str, ref_charges: str, parameters: str, worker_context: EvaluationContext,
+                     object_file: str, key: str, terminals: int, cache: Optional[LibraryCache] = None,
+                     build_dir: Optional[str] = None) -> None:
+    """Initialize the data shared across the evaluations and the compiled skeleton"""
+    global skeleton_object, skeleton_key, skeleton_terminals
+    init(dataset, ref_charges, parameters, worker_context, cache, build_dir=build_dir)
+    skeleton_object = object_file
+    skeleton_key = key
+    skeleton_terminals = terminals
+
+
+def evaluate_expression(individual: EncodedIndividual) -> Tuple[float, float, float, float, float]:
+    """Evaluate the individual by compiling only its expression and linking it with the compiled skeleton"""
+    _, cache, _, options, message_queue = evaluate_module.context
+    result = get_cached_result(individual, cache, message_queue)
+    if result is not None:
+        return result
+
+    source = get_expression_source(individual.code, skeleton_terminals)
+    key = LibraryCache.make_key(source, [skeleton_key])
+    library_cache = evaluate_module.library_cache
+    if library_cache is not None:
+        result = get_stored_result(individual, key, cache, options, message_queue)
+        if result is not None:
+            return result
+
+        library = library_cache.get_library(key, evaluate_module.build_directory)
+        if library is not None:
+            try:
+                return evaluate_library(individual, library, key, cache, options, message_queue)
+            finally:
+                os.remove(library)
+
+    # The expression is compiled alone, the rest is linked from the object file
+    return compile_and_evaluate(individual, source, (*STDIN_SOURCE, '-x', 'none', skeleton_object),
+                                key if library_cache is not None else None, cache, options, message_queue,
+                                precompiled=False)
@@ -32,7 +32,8 @@ def prepare_primitive_set(table: ccl.symboltable.SymbolTable, expr: ccl.ast.Regr
 
     distance_name = None
 
-    for s in table.get_symbols(recursive=True):
+    # Symbols are sorted, so that the order of the terminals and thus the whole run depends only on the seed
+    for s in sorted(table.get_symbols(recursive=True), key=lambda x: x.name):
         if isinstance(s, ccl.symboltable.ObjectSymbol):
             if s.constraints is not None:
                 continue
@@ -0,0 +1,124 @@
+"""Evaluate individuals by a runtime interpreter inside a skeleton compiled only once"""
+
+import ctypes
+import os
+from typing import Callable, List, Optional, Tuple
+
+from deap import gp
+
+import ccl.ast
+import ccl.regression.evaluate as evaluate_module
+from ccl.regression.cache import LibraryCache
+from ccl.regression.evaluate import EncodedIndividual, EvaluationContext, get_cached_result, get_stored_result, \
+    get_compiler_args, run_compiler, evaluate_library, with_precompiled_header, init
+from ccl.regression.generators import generate_terminal_ast
+
+
+skeleton_library: Optional[str] = None
+# Setter of the program interpreted by the skeleton, the handle keeps the library loaded between the evaluations
+set_program: Optional[Callable[[bytes], None]] = None
+skeleton_key: Optional[str] = None
+
+
+def is_constant(terminal: gp.Terminal) -> bool:
+    """Check whether the terminal is a numeric constant"""
+    # Names of CCL symbols have to start with a letter, fitted constants can be negative
+    return terminal.name[0].isdigit() or terminal.name[0] in '-.'
+
+
+def get_program_terminals(primitive_set: gp.PrimitiveSetTyped) -> List[str]:
+    """Return names of the terminals whose values are supplied to the interpreter by the skeleton"""
+    # Ephemeral constants are stored as classes in the primitive set
+    return [t.name for t in primitive_set.terminals[float] if not isinstance(t, type) and not is_constant(t)]
+
+
+def generate_program(individual: gp.PrimitiveTree, terminals: List[str]) -> str:
+    """Generate code for the interpreter, instructions are in reversed prefix order"""
+    terminal_indices = {name: idx for idx, name in enumerate(terminals)}
+    instructions = []
+    for node in reversed(individual):
+        if isinstance(node, gp.Primitive):
+            instructions.append(node.name)
+        elif node.name in terminal_indices:
+            instructions.append(f'@{terminal_indices[node.name]}')
+        else:
+            instructions.append(repr(float(node.name)))
+
+    return ' '.join(instructions)
+
+
+def encode_program(individual: 'creator.Individual', terminals: List[str]) -> EncodedIndividual:
+    """Convert an individual into the form sent to the workers"""
+    return EncodedIndividual(individual.sympy_code, generate_program(individual, terminals))
+
+
+def create_program_skeleton(method_skeleton: 'CCLMethod', terminals: List[str], ccl_objects: dict) -> 'CCLMethod':
+    """Create a copy of the skeleton with the regression expression replaced by a call to the interpreter"""
+    method = method_skeleton.__class__(method_skeleton.source)
+    expr = method.get_regression_expr()
+    pos = expr.line, expr.column
+    program = ccl.ast.RegressionProgram(pos, [generate_terminal_ast(name, ccl_objects, pos) for name in terminals])
+    ccl.ast.replace_node(expr, program)
+    return method
+
+
+def build_skeleton_library(method_skeleton: 'CCLMethod', primitive_set: gp.PrimitiveSetTyped, ccl_objects: dict,
+                           options: dict, library_cache: Optional[LibraryCache],
+                           directory: str) -> Tuple[str, str, List[str]]:
+    """Compile the skeleton with the regression expression replaced by a call to the interpreter
+
+    Returns the path to the library, its key and the list of terminals in the order expected by the interpreter. The
+    library is in the directory, so that it cannot be evicted from the persistent cache during the run.
+    """
+    terminals = get_program_terminals(primitive_set)
+    method = create_program_skeleton(method_skeleton, terminals, ccl_objects)
+
+    cpp_code = method.translate('cpp', output_dir=directory)
+    args = get_compiler_args(options)
+    key = LibraryCache.make_key(cpp_code, args)
+    library = os.path.join(directory, 'libREGRESSION.so')
+
+    if library_cache is not None:
+        cached = library_cache.get_library(key, directory)
+        if cached is not None:
+            os.replace(cached, library)
+            return library, key, terminals
+
+    if not run_compiler(with_precompiled_header(args), directory, 'skeleton with the expression interpreter'):
+        raise RuntimeError('Cannot compile the skeleton with the expression interpreter')
+
+    if library_cache is not None:
+        library_cache.store_library(key, library)
+
+    return library, key, terminals
+
+
+def init_interpreter(dataset: str, ref_charges: str, parameters: str, worker_context: EvaluationContext,
+                     library: str, key: str, cache: Optional[LibraryCache] = None, pch: Optional[str] = None) -> None:
+    """Initialize the data shared across the evaluations and the compiled skeleton with the interpreter"""
+    global skeleton_library, skeleton_key, set_program
+    init(dataset, ref_charges, parameters, worker_context, cache, pch)
+    skeleton_library = library
+    skeleton_key = key
+    set_program = ctypes.CDLL(library).ccl_regression_set_program
+    set_program.argtypes = [ctypes.c_char_p]
+    set_program.restype = None
+
+
+def evaluate_program(program: EncodedIndividual) -> Tuple[float, float, float, float, float]:
+    """Evaluate the individual using the interpreter in the precompiled skeleton"""
+    _, cache, _, options, message_queue = evaluate_module.context
+    result = get_cached_result(program, cache, message_queue)
+    if result is not None:
+        return result
+
+    key = None
+    if evaluate_module.library_cache is not None:
+        key = LibraryCache.make_key(program.code, [skeleton_key])
+        result = get_stored_result(program, key, cache, options, message_queue)
+        if result is not None:
+            return result
+
+    # The skeleton loads the program when calculating the charges
+    set_program(program.code.encode('ascii'))
+    return evaluate_library(program, skeleton_library, key, cache, options, message_queue)
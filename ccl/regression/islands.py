@@ -0,0 +1,190 @@
+"""Island model, sub-populations evolved by separate processes exchanging their best individuals"""
+
+import multiprocessing
+import os
+import queue
+import random
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from deap import base, gp, tools
+
+from ccl.regression.cache import FitnessCache
+from ccl.regression.constant_fitting import ConstantFitter
+from ccl.regression.evolution import evolve
+from ccl.regression.limits import LimitMonitor, TaskLimits, create_executor
+from ccl.regression.scheduling import register_map
+from ccl.regression.steady_state import evolve_steady_state
+from ccl.regression.sympy_pool import SympyPool
+
+
+class IslandResult(NamedTuple):
+    """Outcome of the evolution of an island sent back to the main process"""
+    population: List[gp.PrimitiveTree]
+    hall_of_fame: List[gp.PrimitiveTree]
+    logbook: tools.Logbook
+    wanted: Dict[str, Optional[int]]
+    fitting_summary: List[str]
+
+
+def get_neighbours(index: int, count: int, topology: str) -> List[int]:
+    """Return the islands receiving the emigrants of the island"""
+    if count == 1:
+        return []
+    if topology == 'ring':
+        return [(index + 1) % count]
+    elif topology == 'complete':
+        return [i for i in range(count) if i != index]
+
+    raise RuntimeError(f'Unknown migration topology: {topology}')
+
+
+def migrate(pop: List[gp.PrimitiveTree], gen: int, index: int, inboxes: List[multiprocessing.Queue],
+            options: dict) -> None:
+    """Send the best individuals to the neighbours and replace the worst ones by the received immigrants
+
+    Immigrants are taken only if they have already arrived, so the islands never wait for each other.
+    """
+    if gen % options['migration_interval']:
+        return
+
+    emigrants = tools.selBest(pop, options['migration_size'])
+    for neighbour in get_neighbours(index, len(inboxes), options['migration_topology']):
+        inboxes[neighbour].put(emigrants)
+
+    immigrants = []
+    while True:
+        try:
+            immigrants.extend(inboxes[index].get_nowait())
+        except queue.Empty:
+            break
+
+    codes = {ind.sympy_code for ind in pop}
+    immigrants = [ind for ind in immigrants if ind.sympy_code not in codes]
+    if not immigrants:
+        return
+
+    worst = sorted(range(len(pop)), key=lambda i: pop[i].fitness)
+    for i, ind in zip(worst, tools.selBest(immigrants, len(pop))):
+        pop[i] = ind
+
+
+def seed_island(index: int, rng: random.Random, options: dict) -> None:
+    """Reseed the random number generators of the forked island, so that the islands do not repeat the same choices
+
+    The operators draw from the shared generator, while the variation and the steady-state replacement draw from the
+    global one, both are inherited in the same state by all the islands.
+    """
+    seed = f'{options["seed"]}:{index}' if options['seed'] is not None else None
+    rng.seed(seed)
+    random.seed(seed)
+
+
+def run_island(index: int, pop: List[gp.PrimitiveTree], toolbox: base.Toolbox, rng: random.Random, options: dict,
+               ccl_objects: dict, initializer: Callable, initargs: tuple,
+               create_fitter: Callable[[], Optional[ConstantFitter]], stats: tools.MultiStatistics,
+               get_batch_size: Callable[[int], Optional[int]], inboxes: List[multiprocessing.Queue],
+               results: multiprocessing.Queue, message_queue: multiprocessing.Queue,
+               wanted_codes: Optional[List[str]], task_limits: Optional[TaskLimits] = None,
+               cache: Optional[FitnessCache] = None) -> None:
+    """Evolve the sub-population with its own pool of evaluation workers and send back the result
+
+    The process is forked from the main one, so the toolbox and the individuals' classes are inherited.
+    """
+    seed_island(index, rng, options)
+
+    ncpus = options['ncpus'] if options['ncpus'] is not None else os.cpu_count()
+    workers = max(1, ncpus // options['islands'])
+    monitor = None
+    if task_limits is not None:
+        # Each island restarts its own pool, so it has to see only the tasks of its workers
+        task_limits = task_limits._replace(directory=os.path.join(task_limits.directory, str(index)))
+        os.mkdir(task_limits.directory)
+        monitor = LimitMonitor(task_limits, cache, message_queue)
+    executor = create_executor(workers, initializer, initargs, task_limits)
+    register_map(toolbox, executor, workers, options, monitor)
+
+    sympy_pool = SympyPool(ccl_objects, {**options, 'ncpus': workers})
+    fitter = create_fitter()
+    hof = tools.HallOfFame(options['top_results'], similar=lambda x, y: x.sympy_code == y.sympy_code)
+    logbook = tools.Logbook()
+    wanted = dict.fromkeys(wanted_codes) if wanted_codes is not None else None
+
+    def migrate_island(population: List[gp.PrimitiveTree], gen: int) -> None:
+        migrate(population, gen, index, inboxes, options)
+
+    if options['steady_state']:
+        evolve_steady_state(pop, toolbox, options, sympy_pool, fitter, hof, stats, logbook, message_queue, wanted,
+                            workers, migrate_island)
+    else:
+        evolve(pop, toolbox, options, sympy_pool, fitter, hof, stats, logbook, message_queue, wanted, get_batch_size,
+               migrate_island)
+
+    fitting_summary = []
+    if fitter is not None:
+        fitting_summary = fitter.summary()
+        fitter.shutdown()
+    sympy_pool.shutdown()
+    executor.shutdown(wait=True)
+
+    # Emigrants not taken by the islands that already finished are dropped instead of blocking the exit
+    for inbox in inboxes:
+        inbox.cancel_join_thread()
+
+    results.put((index, IslandResult(pop, list(hof), logbook, wanted or {}, fitting_summary)))
+
+
+def merge_logbooks(logbooks: List[tools.Logbook]) -> tools.Logbook:
+    """Combine the logbooks of the islands into one, the records are ordered by generation and island"""
+    entries = []
+    for island, logbook in enumerate(logbooks):
+        for k, entry in enumerate(logbook):
+            chapters = {name: {key: value for key, value in chapter[k].items() if key not in entry}
+                        for name, chapter in logbook.chapters.items()}
+            entries.append({**entry, 'island': island, **chapters})
+
+    merged = tools.Logbook()
+    for entry in sorted(entries, key=lambda x: (x['gen'], x['island'])):
+        merged.record(**entry)
+
+    return merged
+
+
+def run_islands(pop: List[gp.PrimitiveTree], toolbox: base.Toolbox, rng: random.Random, options: dict,
+                ccl_objects: dict, initializer: Callable, initargs: tuple,
+                create_fitter: Callable[[], Optional[ConstantFitter]], stats: tools.MultiStatistics,
+                get_batch_size: Callable[[int], Optional[int]], message_queue: multiprocessing.Queue,
+                wanted_codes: Optional[List[str]], task_limits: Optional[TaskLimits] = None,
+                cache: Optional[FitnessCache] = None) -> List[IslandResult]:
+    """Split the population into islands, evolve each of them in its own process and return their results"""
+    count = options['islands']
+    inboxes = [multiprocessing.Queue() for _ in range(count)]
+    results = multiprocessing.Queue()
+
+    processes = []
+    for index in range(count):
+        args = (index, pop[index::count], toolbox, rng, options, ccl_objects, initializer, initargs, create_fitter,
+                stats, get_batch_size, inboxes, results, message_queue, wanted_codes, task_limits, cache)
+        process = multiprocessing.Process(target=run_island, args=args)
+        process.start()
+        processes.append(process)
+
+    # Results have to be received before joining, the processes cannot finish until their queues are flushed
+    island_results: List[Optional[IslandResult]] = [None] * count
+    received = 0
+    while received < count:
+        try:
+            index, result = results.get(timeout=1)
+        except queue.Empty:
+            if any(process.exitcode not in (None, 0) for process in processes):
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError('Evolution of an island failed')
+            continue
+
+        island_results[index] = result
+        received += 1
+
+    for process in processes:
+        process.join()
+
+    return island_results
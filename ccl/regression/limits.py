@@ -0,0 +1,172 @@
+"""Time and memory limits of the evaluation of a single task in the worker processes"""
+
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import signal
+import tempfile
+import time
+from typing import Any, Callable, List, NamedTuple, Optional, Set
+
+import ccl.regression.evaluate as evaluate_module
+from ccl.regression.cache import FitnessCache
+from ccl.regression.evaluate import reject_individual, task_individuals
+
+# Number of worker crashes a task has to be running at before it is considered their cause
+MAX_CRASHES = 2
+
+
+class TaskLimits(NamedTuple):
+    """Limits of a task and the directory where the workers record the tasks they are running"""
+    timeout: Optional[float]
+    memory: Optional[int]
+    directory: str
+
+
+task_limits: Optional[TaskLimits] = None
+
+
+def create_task_limits(options: dict) -> Optional[TaskLimits]:
+    """Return the limits of the evaluation tasks if any is set, the memory limit is given in MiB"""
+    if options['evaluation_timeout'] is None and options['evaluation_memory_limit'] is None:
+        return None
+
+    memory = options['evaluation_memory_limit']
+    directory = tempfile.mkdtemp(prefix='ccl_regression_tasks_', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    return TaskLimits(options['evaluation_timeout'], memory * 1024 * 1024 if memory is not None else None, directory)
+
+
+def remove_task_limits(limits: Optional[TaskLimits]) -> None:
+    if limits is not None:
+        shutil.rmtree(limits.directory, ignore_errors=True)
+
+
+def init_limited(limits: TaskLimits, initializer: Callable, *initargs: Any) -> None:
+    """Initialize the worker and restrict its address space"""
+    global task_limits
+    task_limits = limits
+
+    # Worker is terminated by the kernel when the timer expires, even while a native code holds the interpreter
+    signal.signal(signal.SIGALRM, signal.SIG_DFL)
+    if limits.memory is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (limits.memory, hard))
+
+    initializer(*initargs)
+
+
+def run_limited(func: Callable, task: Any) -> Any:
+    """Run the task in the worker within the limits
+
+    The task is recorded in the directory of the limits while it runs, so that the main process knows which one was
+    running when the worker was killed. Task exceeding the memory limit in Python code has no result.
+    """
+    codes = [ind.sympy_code for ind in task_individuals(task)]
+    deadline = time.time() + task_limits.timeout if task_limits.timeout is not None else None
+    marker = os.path.join(task_limits.directory, str(os.getpid()))
+    with open(marker, 'w') as f:
+        json.dump({'deadline': deadline, 'codes': codes}, f)
+
+    if task_limits.timeout is not None:
+        signal.setitimer(signal.ITIMER_REAL, task_limits.timeout)
+    try:
+        return func(task)
+    except MemoryError:
+        _, cache, _, _, message_queue = evaluate_module.context
+        for sympy_code in codes:
+            reject_individual(sympy_code, 'Memory', cache, message_queue)
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        os.remove(marker)
+
+
+class RestartableExecutor(concurrent.futures.Executor):
+    """Process pool with the limited workers which is replaced by a new one once a worker is killed"""
+
+    def __init__(self, workers: Optional[int], limits: TaskLimits, initializer: Callable, initargs: tuple) -> None:
+        self.workers: Optional[int] = workers
+        self.initargs: tuple = (limits, initializer, *initargs)
+        self.pool: concurrent.futures.ProcessPoolExecutor = self.create_pool()
+
+    def create_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(self.workers, initializer=init_limited, initargs=self.initargs)
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> concurrent.futures.Future:
+        return self.pool.submit(fn, *args, **kwargs)
+
+    def restart(self) -> None:
+        """Replace the broken pool, its remaining workers are terminated first"""
+        self.pool.shutdown(wait=True)
+        self.pool = self.create_pool()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self.pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def create_executor(workers: Optional[int], initializer: Callable, initargs: tuple,
+                    limits: Optional[TaskLimits]) -> concurrent.futures.Executor:
+    """Create the pool of the evaluation workers, the limited ones are replaced when killed"""
+    if limits is None:
+        return concurrent.futures.ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs)
+
+    return RestartableExecutor(workers, limits, initializer, initargs)
+
+
+class LimitMonitor:
+    """Find the tasks that caused the workers to be killed and give their individuals the invalid fitness
+
+    When the timer of a task expires, its worker is killed and the other ones are terminated with the broken pool, the
+    task with the earliest deadline is the one that timed out. A worker killed otherwise, typically by a native code
+    aborting after exceeding the memory limit, cannot be told apart from the terminated ones. All the tasks that were
+    running are then retried and those running at repeated crashes are rejected.
+    """
+
+    def __init__(self, limits: TaskLimits, cache: FitnessCache, message_queue: multiprocessing.Queue) -> None:
+        self.limits: TaskLimits = limits
+        self.cache: FitnessCache = cache
+        self.message_queue: multiprocessing.Queue = message_queue
+        self.crashes: collections.Counter = collections.Counter()
+
+    def take_running(self) -> List[dict]:
+        """Return the tasks recorded by the killed workers sorted by their deadlines and remove the records"""
+        running = []
+        for name in os.listdir(self.limits.directory):
+            filename = os.path.join(self.limits.directory, name)
+            try:
+                with open(filename) as f:
+                    running.append(json.load(f))
+            except ValueError:
+                # Worker terminated while writing the record had not started the task yet
+                pass
+            os.remove(filename)
+
+        return sorted(running, key=lambda x: x['deadline'] if x['deadline'] is not None else float('inf'))
+
+    def recover(self, executor: RestartableExecutor) -> Optional[Set[str]]:
+        """Restart the broken pool and return the codes of the rejected individuals
+
+        None is returned if the workers were not killed while running any task, the cause is then unknown.
+        """
+        executor.restart()
+        running = self.take_running()
+        if not running:
+            return None
+
+        rejected = {}
+        first = running[0]
+        if first['deadline'] is not None and first['deadline'] <= time.time():
+            rejected.update(dict.fromkeys(first['codes'], 'Timeout'))
+        else:
+            for task in running:
+                self.crashes.update(task['codes'])
+                rejected.update((code, 'Crashed') for code in task['codes'] if self.crashes[code] >= MAX_CRASHES)
+
+        for sympy_code, kind in rejected.items():
+            reject_individual(sympy_code, kind, self.cache, self.message_queue)
+
+        return set(rejected)
@@ -24,7 +24,47 @@ default_options = {
     'max_constant_allowed': None,
     'allow_random_constants': False,
     'metric': 'RMSD',
-    'only_multiplicative_constants': False
+    'only_multiplicative_constants': False,
+    'cache_dir': None,
+    'cache_size_limit': 1024,
+    'batch_compilation': False,
+    'batch_size': 32,
+    'interpret_individuals': False,
+    'incremental_compilation': False,
+    'evaluator': 'chargefw2',
+    'precompiled_header': False,
+    'screening_flags': '-O1',
+    'promotion_flags': None,
+    'promotion_generations': 5,
+    'pipeline': False,
+    'codegen_workers': 2,
+    'compile_jobs': None,
+    'pipeline_queue_size': 8,
+    'fitness_cache_size': 10000,
+    'shared_fitness_cache_size': 1000000,
+    'canonicalizer': 'native',
+    'fit_constants': False,
+    'constant_fitting_iterations': 20,
+    'islands': 1,
+    'migration_interval': 5,
+    'migration_size': 2,
+    'migration_topology': 'ring',
+    'checkpoint': None,
+    'checkpoint_interval': 1,
+    'checkpoint_minutes': None,
+    'resume': False,
+    'racing': False,
+    'racing_fractions': (0.1, 0.3),
+    'racing_quantile': 0.5,
+    'coreset_ratio': None,
+    'scheduler': 'cost',
+    'compile_timeout': None,
+    'compile_memory_limit': None,
+    'evaluation_timeout': None,
+    'evaluation_memory_limit': None,
+    'shared_dataset': True,
+    'steady_state': False,
+    'steady_state_interval': None
 }
 
 
@@ -0,0 +1,82 @@
+"""Precompiled header with the includes shared by all the generated methods"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+
+# Headers included by every generated method
+common_header = '''\
+#include <cmath>
+#include <functional>
+#include <vector>
+#include <Eigen/LU>
+
+#include "structures/molecule.h"
+#include "method.h"
+#include "parameters.h"
+#include "geometry.h"
+#include "periodic_table.h"
+'''
+
+header_name = 'ccl_pch.h'
+
+
+def get_dependencies(args: List[str], cwd: str) -> List[str]:
+    """Return the files the header depends on as reported by the compiler"""
+    p = subprocess.run([*args, '-x', 'c++-header', '-M', header_name], cwd=cwd, stdout=subprocess.PIPE,
+                       stderr=subprocess.PIPE)
+    if p.returncode:
+        print(p.stderr.decode('utf-8'), file=sys.stderr)
+        raise RuntimeError('Cannot get dependencies of the precompiled header')
+
+    rule = p.stdout.decode('utf-8').replace('\\\n', ' ')
+    return [dependency for dependency in rule.split(':', 1)[1].split() if dependency != header_name]
+
+
+def build_precompiled_header(args: List[str], directory: str) -> str:
+    """Build the precompiled header unless an up-to-date one is already stored in the directory
+
+    The arguments are the compiler with the flags used to compile the methods. The header is rebuilt whenever the
+    flags or any of the files it depends on (e.g. ChargeFW2 or Eigen headers) change. Returns the path to the header
+    to be included by the compiler.
+    """
+    os.makedirs(directory, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix='build_', dir=directory)
+    with open(os.path.join(build_dir, header_name), 'w') as f:
+        f.write(common_header)
+
+    h = hashlib.sha256()
+    h.update(common_header.encode('utf-8'))
+    h.update('\0'.join(args).encode('utf-8'))
+    for dependency in get_dependencies(args, build_dir):
+        stat = os.stat(os.path.join(build_dir, dependency))
+        h.update(f'\0{dependency}\0{stat.st_size}\0{stat.st_mtime_ns}'.encode('utf-8'))
+
+    pch_dir = os.path.join(directory, h.hexdigest()[:16])
+    if os.path.exists(os.path.join(pch_dir, f'{header_name}.gch')):
+        shutil.rmtree(build_dir)
+        return os.path.join(pch_dir, header_name)
+
+    start = time.perf_counter()
+    p = subprocess.run([*args, '-x', 'c++-header', '-o', f'{header_name}.gch', header_name], cwd=build_dir,
+                       stderr=subprocess.PIPE)
+    if p.returncode or p.stderr:
+        print(p.stderr.decode('utf-8'), file=sys.stderr)
+        shutil.rmtree(build_dir)
+        raise RuntimeError('Cannot build the precompiled header')
+
+    print(f'Precompiled header built in {time.perf_counter() - start:.2f} s')
+
+    try:
+        os.rename(build_dir, pch_dir)
+    except OSError:
+        # Other process has built the same header in the meantime
+        shutil.rmtree(build_dir)
+
+    return os.path.join(pch_dir, header_name)
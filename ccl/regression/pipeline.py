@@ -0,0 +1,217 @@
+"""Evaluate individuals in a pipeline with separate stages for code generation, compilation and evaluation"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import ccl.regression.evaluate as evaluate_module
+from ccl.regression.cache import FitnessCache, LibraryCache
+from ccl.regression.evaluate import INVALID_RESULT, EncodedIndividual, EvaluationContext, PreparedIndividual, \
+    STDIN_SOURCE, prepare_individual, get_compiler_args, with_precompiled_header, \
+    report_compilation_time, report_library, check_compiler_output, evaluate_library, get_compiler_limits, \
+    limit_address_space, reject_individual
+
+
+def init_codegen(worker_context: EvaluationContext, cache: Optional[LibraryCache] = None,
+                 build_dir: Optional[str] = None) -> None:
+    """Initialize the code generation workers"""
+    evaluate_module.install_context(worker_context)
+    evaluate_module.library_cache = cache
+    evaluate_module.build_directory = build_dir
+
+
+def prepare(individual: EncodedIndividual) -> PreparedIndividual:
+    """Translate the individual using the context installed in the code generation worker"""
+    method_skeleton, cache, _, options, message_queue = evaluate_module.context
+    return prepare_individual(individual, method_skeleton, cache, options, message_queue)
+
+
+def remove_library(library: str) -> None:
+    """Remove the library compiled in the build directory or the link to the cached one"""
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(library)
+
+
+def evaluate_prepared(individual: EncodedIndividual, library: str,
+                      key: Optional[str]) -> Tuple[float, float, float, float, float]:
+    """Evaluate the compiled library using the context installed in the evaluation worker"""
+    _, cache, _, options, message_queue = evaluate_module.context
+    return evaluate_library(individual, library, key, cache, options, message_queue)
+
+
+class StageStats:
+    """Statistics of a stage of the pipeline"""
+
+    def __init__(self, name: str, workers: int) -> None:
+        self.name: str = name
+        self.workers: int = workers
+        self.items: int = 0
+        self.busy_time: float = 0.0
+        self.depth_sum: int = 0
+        self.depth_samples: int = 0
+        self.max_depth: int = 0
+
+    def add_item(self, elapsed: float) -> None:
+        self.items += 1
+        self.busy_time += elapsed
+
+    def sample_depth(self, queue: asyncio.Queue) -> None:
+        """Record the depth of the input queue of the stage"""
+        depth = queue.qsize()
+        self.depth_sum += depth
+        self.depth_samples += 1
+        self.max_depth = max(self.max_depth, depth)
+
+    def summary(self, wall_time: float) -> str:
+        throughput = self.items / wall_time if wall_time else 0.0
+        utilization = self.busy_time / (wall_time * self.workers) if wall_time else 0.0
+        mean_depth = self.depth_sum / self.depth_samples if self.depth_samples else 0.0
+        return f'{self.name:<11}: workers = {self.workers:3d} | items = {self.items:6d} | ' \
+               f'throughput = {throughput:8.3f}/s | utilization = {utilization:6.1%} | ' \
+               f'queue depth mean = {mean_depth:6.2f}, max = {self.max_depth:3d}'
+
+
+class Pipeline:
+    """Scheduler overlapping code generation, compilation and evaluation of different individuals
+
+    Code generation runs in its own process pool, the compiler runs as asynchronous subprocesses with a limited
+    concurrency and the evaluation uses the pool initialized with the data. Stages are connected by bounded queues,
+    so that a slow stage holds back the previous ones instead of accumulating the individuals.
+    """
+
+    def __init__(self, worker_context: EvaluationContext, evaluation_pool: concurrent.futures.Executor,
+                 library_cache: Optional[LibraryCache]) -> None:
+        options = worker_context.options
+        self.options: dict = options
+        self.message_queue: multiprocessing.Queue = worker_context.message_queue
+        self.cache: FitnessCache = worker_context.cache
+        self.library_cache: Optional[LibraryCache] = library_cache
+        self.evaluation_pool: concurrent.futures.Executor = evaluation_pool
+        self.codegen_pool = concurrent.futures.ProcessPoolExecutor(options['codegen_workers'],
+                                                                   initializer=init_codegen,
+                                                                   initargs=(worker_context, library_cache,
+                                                                             evaluate_module.build_directory))
+
+        ncpus = options['ncpus'] if options['ncpus'] is not None else multiprocessing.cpu_count()
+        compile_jobs = options['compile_jobs'] if options['compile_jobs'] is not None else ncpus
+        self.stats: Dict[str, StageStats] = {
+            'codegen': StageStats('Codegen', options['codegen_workers']),
+            'compile': StageStats('Compilation', compile_jobs),
+            'evaluation': StageStats('Evaluation', ncpus),
+        }
+        self.wall_time: float = 0.0
+
+    def evaluate(self, individuals: List[EncodedIndividual]) -> List[Tuple[float, float, float, float, float]]:
+        """Evaluate the individuals, the results are in the same order"""
+        start = time.perf_counter()
+        results = asyncio.run(self.run(individuals))
+        self.wall_time += time.perf_counter() - start
+        return results
+
+    async def run(self, individuals: List[EncodedIndividual]) -> List[Tuple[float, float, float, float, float]]:
+        loop = asyncio.get_running_loop()
+        results: List[Optional[Tuple[float, float, float, float, float]]] = [None] * len(individuals)
+        compile_queue: asyncio.Queue = asyncio.Queue(self.options['pipeline_queue_size'])
+        evaluation_queue: asyncio.Queue = asyncio.Queue(self.options['pipeline_queue_size'])
+        pending = iter(range(len(individuals)))
+
+        async def codegen_worker() -> None:
+            for idx in pending:
+                start = time.perf_counter()
+                prepared = await loop.run_in_executor(self.codegen_pool, prepare, individuals[idx])
+                self.stats['codegen'].add_item(time.perf_counter() - start)
+
+                if prepared.result is not None:
+                    results[idx] = prepared.result
+                elif prepared.library is not None:
+                    await evaluation_queue.put((idx, prepared, prepared.library))
+                    self.stats['evaluation'].sample_depth(evaluation_queue)
+                else:
+                    await compile_queue.put((idx, prepared))
+                    self.stats['compile'].sample_depth(compile_queue)
+
+        async def compile_worker() -> None:
+            limits = get_compiler_limits(self.options)
+            while True:
+                item = await compile_queue.get()
+                if item is None:
+                    break
+
+                idx, prepared = item
+                fd, library = tempfile.mkstemp(prefix='lib', suffix='.so', dir=evaluate_module.build_directory)
+                os.close(fd)
+                args = with_precompiled_header(get_compiler_args(self.options, library, STDIN_SOURCE))
+                start = time.perf_counter()
+                p = await asyncio.create_subprocess_exec(*args, stdin=asyncio.subprocess.PIPE,
+                                                         stderr=asyncio.subprocess.PIPE,
+                                                         preexec_fn=limit_address_space(limits['memory_limit']))
+                try:
+                    _, stderr = await asyncio.wait_for(p.communicate(prepared.source.encode('utf-8')),
+                                                       limits['timeout'])
+                except asyncio.TimeoutError:
+                    p.kill()
+                    await p.wait()
+                    results[idx] = reject_individual(individuals[idx].sympy_code, 'Timeout', self.cache,
+                                                     self.message_queue)
+                    remove_library(library)
+                    continue
+
+                elapsed = time.perf_counter() - start
+                self.stats['compile'].add_item(elapsed)
+                report_compilation_time(self.message_queue, args, elapsed)
+
+                if p.returncode or stderr:
+                    check_compiler_output(p.returncode, stderr, individuals[idx].code)
+                    results[idx] = INVALID_RESULT
+                    remove_library(library)
+                    continue
+
+                # Cache is not installed in the main process, so the library is stored through the pipeline's one
+                report_library(self.message_queue, library, self.library_cache is not None)
+                if self.library_cache is not None:
+                    self.library_cache.store_library(prepared.key, library)
+                await evaluation_queue.put((idx, prepared, library))
+                self.stats['evaluation'].sample_depth(evaluation_queue)
+
+        async def evaluation_worker() -> None:
+            while True:
+                item = await evaluation_queue.get()
+                if item is None:
+                    break
+
+                idx, prepared, library = item
+                start = time.perf_counter()
+                try:
+                    results[idx] = await loop.run_in_executor(self.evaluation_pool, evaluate_prepared,
+                                                              individuals[idx], library, prepared.key)
+                finally:
+                    # Both the compiled library and the link to the cached one are private to the individual
+                    remove_library(library)
+                self.stats['evaluation'].add_item(time.perf_counter() - start)
+
+        codegen_tasks = [asyncio.create_task(codegen_worker()) for _ in range(self.stats['codegen'].workers)]
+        compile_tasks = [asyncio.create_task(compile_worker()) for _ in range(self.stats['compile'].workers)]
+        evaluation_tasks = [asyncio.create_task(evaluation_worker()) for _ in range(self.stats['evaluation'].workers)]
+
+        # Each stage is finished once the previous one is done and all the individuals left in its queue are processed
+        await asyncio.gather(*codegen_tasks)
+        for _ in compile_tasks:
+            await compile_queue.put(None)
+        await asyncio.gather(*compile_tasks)
+        for _ in evaluation_tasks:
+            await evaluation_queue.put(None)
+        await asyncio.gather(*evaluation_tasks)
+
+        return results
+
+    def summary(self) -> List[str]:
+        """Return the statistics of the stages, useful for sizing the pools"""
+        return [stats.summary(self.wall_time) for stats in self.stats.values()]
+
+    def shutdown(self) -> None:
+        self.codegen_pool.shutdown(wait=True)
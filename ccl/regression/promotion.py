@@ -0,0 +1,54 @@
+"""Promotion of the proven individuals from the screening build to the optimized one"""
+
+import concurrent.futures
+import math
+import multiprocessing
+from typing import Callable, Dict, List, Set
+
+from deap import gp, tools
+
+from ccl.regression.evaluate import EncodedIndividual, rebuild_individual, report_stat
+
+
+class Promoter:
+    """Rebuild the individuals entering the hall of fame or surviving in the population with the optimized flags
+
+    Every individual is first compiled with the cheap screening flags, as most of them are discarded after a single
+    evaluation. Those that prove good are promoted once, their rebuild is evaluated again and its times are reported
+    apart from the screening ones. The difference of the objective values of both builds is reported as well.
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor, encode: Callable[[gp.PrimitiveTree], EncodedIndividual],
+                 options: dict, message_queue: multiprocessing.Queue) -> None:
+        self.executor: concurrent.futures.Executor = executor
+        self.encode: Callable[[gp.PrimitiveTree], EncodedIndividual] = encode
+        self.generations: int = options['promotion_generations']
+        self.message_queue: multiprocessing.Queue = message_queue
+        self.ages: Dict[str, int] = {}
+        self.promoted: Set[str] = set()
+        self.failed: int = 0
+
+    def select(self, pop: List[gp.PrimitiveTree], hof: tools.HallOfFame) -> List[gp.PrimitiveTree]:
+        """Return the individuals to be promoted and count the generations the population survived"""
+        self.ages = {code: self.ages.get(code, 0) + 1 for code in {ind.sympy_code for ind in pop}}
+
+        selected = {}
+        for ind in [*hof, *(ind for ind in pop if self.ages[ind.sympy_code] > self.generations)]:
+            if ind.sympy_code not in self.promoted and math.isfinite(ind.fitness.values[0]):
+                selected.setdefault(ind.sympy_code, ind)
+
+        return list(selected.values())
+
+    def promote(self, pop: List[gp.PrimitiveTree], hof: tools.HallOfFame) -> None:
+        """Rebuild the newly promoted individuals of the population and of the hall of fame"""
+        selected = self.select(pop, hof)
+        self.promoted.update(ind.sympy_code for ind in selected)
+        for ind, value in zip(selected, self.executor.map(rebuild_individual, map(self.encode, selected))):
+            if value is None or not math.isfinite(value):
+                self.failed += 1
+            else:
+                report_stat(self.message_queue, 'Objective difference (promoted)', abs(value - ind.fitness.values[0]))
+
+    def summary(self) -> List[str]:
+        return [f'Promoted: {len(self.promoted)}',
+                f'Failed  : {self.failed}']
@@ -0,0 +1,67 @@
+"""Racing evaluation, individuals are screened on growing subsets of molecules before the full evaluation"""
+
+import math
+import random
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from deap import gp
+
+from ccl.regression.dataset import Dataset
+
+# Number of groups of molecules of similar size sampled evenly by every subset
+STRATA = 10
+
+
+class RacingPlan(NamedTuple):
+    """Order of the molecules and the sizes of the nested subsets, the last one is the whole dataset
+
+    Each subset is a prefix of the order, so the charges computed for a smaller subset are reused by the larger ones.
+    """
+    order: np.ndarray
+    sizes: List[int]
+
+
+def stratified_order(dataset: Dataset, seed: Optional[int]) -> np.ndarray:
+    """Return the order of the molecules in which every prefix covers the molecule sizes evenly"""
+    rng = random.Random(seed)
+    atom_counts = np.diff(dataset.atom_offsets)
+    by_size = sorted(range(len(dataset)), key=lambda m: (atom_counts[m], dataset.names[m]))
+
+    strata = [list(stratum) for stratum in np.array_split(by_size, min(STRATA, len(dataset)))]
+    for stratum in strata:
+        rng.shuffle(stratum)
+
+    # Take the molecules from the strata in turns
+    order = []
+    for i in range(max(len(stratum) for stratum in strata)):
+        order.extend(stratum[i] for stratum in strata if i < len(stratum))
+
+    return np.array(order, dtype=np.int64)
+
+
+def create_racing_plan(dataset: Dataset, fractions: Sequence[float], seed: Optional[int]) -> RacingPlan:
+    """Create the plan for the given fractions of the dataset, subsets that would not be smaller are dropped"""
+    n = len(dataset)
+    sizes = sorted({max(1, math.ceil(fraction * n)) for fraction in fractions if 0 < fraction < 1})
+    return RacingPlan(stratified_order(dataset, seed), [size for size in sizes if size < n] + [n])
+
+
+def fully_evaluated(pop: List[gp.PrimitiveTree]) -> List[gp.PrimitiveTree]:
+    """Return the individuals evaluated on the whole dataset"""
+    return [ind for ind in pop if ind.fidelity == 1.0]
+
+
+def get_racing_threshold(pop: List[gp.PrimitiveTree], options: dict) -> float:
+    """Return the objective value an individual has to reach on a subset to be evaluated further
+
+    The threshold is the given quantile of the objective values of the fully evaluated individuals.
+    """
+    if not options['racing']:
+        return math.inf
+
+    values = [ind.fitness.values[0] for ind in fully_evaluated(pop) if math.isfinite(ind.fitness.values[0])]
+    if not values:
+        return math.inf
+
+    return float(np.quantile(values, options['racing_quantile']))
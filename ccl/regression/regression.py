@@ -1,11 +1,14 @@
 """Symbolic regression of CCL code """
 
+import collections
+import os
+import shutil
 import sys
 import random
-from deap import gp, creator, base, tools, algorithms
+import tempfile
+from deap import gp, creator, base, tools
 import math
 import operator
-import concurrent.futures
 import multiprocessing
 import numpy as np
 from typing import Optional
@@ -20,29 +23,68 @@ import ccl.functions
 import ccl.errors
 
 import ccl.regression.deap_gp
-from ccl.regression.evaluate import evaluate, init, evaluate_population, generate_sympy_codes
+from ccl.regression.cache import FitnessCache, LibraryCache, data_digest
+from ccl.regression.batch import evaluate_batch
+from ccl.regression.checkpoint import CHECKPOINT_VERSION, Checkpoint, CheckpointWriter, load_checkpoint, \
+    restore_hall_of_fame
+from ccl.regression.constant_fitting import ConstantFitter
+from ccl.regression.coreset import evaluate_on_dataset, get_correlation, select_coreset
+from ccl.regression.dataset import Dataset
+import ccl.regression.evaluate as evaluate_module
+from ccl.regression.evaluate import EvaluationContext, evaluate, init, get_compile_flags, encode_individual, \
+    generate_sympy_code, share_data, create_build_directory
+from ccl.regression.evolution import evolve
 from ccl.regression.init_gp import prepare_primitive_set
+from ccl.regression.islands import merge_logbooks, run_islands
+from ccl.regression.limits import LimitMonitor, create_executor, create_task_limits, remove_task_limits
+from ccl.regression.pch import build_precompiled_header
+from ccl.regression.pipeline import Pipeline
+from ccl.regression.scheduling import register_map
+from ccl.regression.racing import create_racing_plan, fully_evaluated
+from ccl.regression.interpreter import build_skeleton_library, encode_program, evaluate_program, \
+    get_program_terminals, init_interpreter
+from ccl.regression.incremental import build_skeleton_object, encode_expression, evaluate_expression, init_incremental
 from ccl.regression.options import default_options, print_options
 from ccl.regression.population import generate_population, add_seeded_individuals, load_wanted_expressions
 from ccl.regression.constraints import check_symbol_counts
+from ccl.regression.promotion import Promoter
+from ccl.regression.steady_state import evolve_steady_state
+from ccl.regression.sympy_pool import SympyPool
+from ccl.regression.vectorized import check_skeleton, init_vectorized, evaluate_vectorized, race_vectorized
 
 
-def progress_bar(q: multiprocessing.Queue, options: dict) -> None:
-    """Process the messages sent from worker processes and display the progress bar"""
-    gen_bar = tqdm.tqdm(total=options['generations'] + 1, position=0, desc='Generations')
+def progress_bar(q: multiprocessing.Queue, options: dict, stats: dict) -> None:
+    """Process the messages sent from worker processes and display the progress bar
+
+    Values of the reported statistics are summarized into stats as (count, total, max) at the end, numbers of the
+    messages of each kind are stored under 'messages'.
+    """
+    # Every island reports its own generations
+    gen_bar = tqdm.tqdm(total=(options['generations'] + 1) * options['islands'], position=0, desc='Generations')
     p_bar = tqdm.tqdm(total=0, position=1, desc='Progress inside generation')
     best_bar = tqdm.tqdm(total=0, position=2, bar_format='{desc}')
 
     best_obj = math.inf
+    collected_stats = {}
+    message_counts = collections.Counter()
 
     i = 1
     for message in iter(q.get, None):
-        if message[0] == 'gen':
+        if message[0] == 'stat':
+            _, name, value = message
+            count, total, max_value = collected_stats.get(name, (0, 0.0, -math.inf))
+            collected_stats[name] = count + 1, total + value, max(max_value, value)
+        elif message[0] == 'gen':
             gen_bar.set_description(f'Generation: {message[1]}')
             gen_bar.update()
-            p_bar.reset(total=message[2])
+            if options['islands'] > 1:
+                p_bar.total += message[2]
+                p_bar.refresh()
+            else:
+                p_bar.reset(total=message[2])
         else:
             kind, expr, (obj, rmsd, r2, dmax, davg) = message
+            message_counts[kind] += 1
             p_bar.write(f'[{i:>6}] {kind:>9} (Obj = {obj:8.4f} | R2 = {r2:6.4f} | RMSD = {rmsd:8.4f} | '
                         f'Dmax = {dmax:8.2e} | Davg = {davg:8.4f}): {expr}')
             p_bar.update()
@@ -61,6 +103,9 @@ def progress_bar(q: multiprocessing.Queue, options: dict) -> None:
     p_bar.close()
     best_bar.close()
 
+    stats.update(collected_stats)
+    stats['messages'] = dict(message_counts)
+
 
 def run_symbolic_regression(initial_method: 'CCLMethod', dataset: str, ref_charges: str, parameters: str,
                             user_options: Optional[dict] = None):
@@ -75,10 +120,37 @@ def run_symbolic_regression(initial_method: 'CCLMethod', dataset: str, ref_charg
     if user_options is not None:
         options.update(**user_options)
 
+    if options['checkpoint'] is not None and options['islands'] > 1:
+        raise RuntimeError('Checkpoints are not supported in the island mode')
+    if options['resume'] and options['checkpoint'] is None:
+        raise RuntimeError('No checkpoint to resume from specified')
+    if options['racing'] and options['evaluator'] != 'numpy':
+        raise RuntimeError('Racing evaluation is supported only by the NumPy evaluator')
+    if options['coreset_ratio'] is not None and options['evaluator'] != 'numpy':
+        raise RuntimeError('Coreset is supported only by the NumPy evaluator')
+    if options['steady_state']:
+        if options['checkpoint'] is not None:
+            raise RuntimeError('Checkpoints are not supported in the steady-state mode')
+        if options['pipeline'] or options['batch_compilation']:
+            raise RuntimeError('Steady-state mode evaluates the individuals one by one, without pipeline or batches')
+        if options['evaluation_timeout'] is not None or options['evaluation_memory_limit'] is not None:
+            raise RuntimeError('Evaluation limits are not supported in the steady-state mode')
+    if options['promotion_flags'] is not None:
+        if options['evaluator'] == 'numpy' or options['interpret_individuals'] or options['incremental_compilation']:
+            raise RuntimeError('Promotion is supported only when every individual is compiled on its own')
+        if options['islands'] > 1:
+            raise RuntimeError('Promotion is not supported in the island mode')
+    if options['evaluation_timeout'] is not None or options['evaluation_memory_limit'] is not None:
+        if options['scheduler'] != 'cost' or options['pipeline']:
+            raise RuntimeError('Evaluation limits are supported only by the cost scheduler without the pipeline')
+
     manager = multiprocessing.Manager()
-    cache = manager.dict()
+    cache = FitnessCache.create(options['fitness_cache_size'], options['shared_fitness_cache_size'])
     q = manager.Queue()
     rng = random.Random(options['seed'])
+    if options['seed'] is not None:
+        # Variation of DEAP draws from the global generator
+        random.seed(options['seed'])
 
     table = ccl.symboltable.SymbolTable.get_table_for_node(expr)
 
@@ -87,15 +159,17 @@ def run_symbolic_regression(initial_method: 'CCLMethod', dataset: str, ref_charg
 
     # Main metric, RMSD, R2, Dmax, Davg
     creator.create('FitnessMin', base.Fitness, weights=(-1.0, -1.0, 1.0, -1.0, -1.0))
-    creator.create('Individual', gp.PrimitiveTree, fitness=creator.FitnessMin, sympy_code='')
+    # Fidelity is the fraction of the molecules the fitness was computed on
+    creator.create('Individual', gp.PrimitiveTree, fitness=creator.FitnessMin, sympy_code='', fidelity=1.0)
 
     toolbox = base.Toolbox()
     toolbox.register('expr', ccl.regression.deap_gp.gen_half_and_half, pset=pset, min_=1, max_=6, rng=rng)
     toolbox.register('individual', tools.initIterate, creator.Individual, toolbox.expr)
     toolbox.register('population', tools.initRepeat, list, toolbox.individual)
 
-    toolbox.register('evaluate', evaluate, method_skeleton=initial_method, cache=cache, ccl_objects=ccl_objects,
-                     options=options, message_queue=q)
+    toolbox.register('encode', encode_individual, ccl_objects=ccl_objects)
+    toolbox.register('evaluate', evaluate)
+    toolbox.register('evaluate_batch', evaluate_batch)
     toolbox.register('select', ccl.regression.deap_gp.sel_double_tournament, fitness_size=10, parsimony_size=1.4,
                      rng=rng)
     toolbox.register('mate', ccl.regression.deap_gp.cx_one_point, rng=rng)
@@ -125,78 +199,251 @@ def run_symbolic_regression(initial_method: 'CCLMethod', dataset: str, ref_charg
 
     print_options(options)
 
+    sympy_pool = SympyPool(ccl_objects, options)
+
+    wanted = None
     if options['wanted_individuals'] is not None:
-        wanted = {sympy_code: None for sympy_code in load_wanted_expressions(options, ccl_objects, pset)}
+        wanted = {sympy_code: None for sympy_code in load_wanted_expressions(options, sympy_pool, pset)}
+
+    checkpoint = None
+    if options['resume'] and os.path.exists(options['checkpoint']):
+        print(f'*** Resuming from checkpoint {options["checkpoint"]} ***')
+        checkpoint = load_checkpoint(options['checkpoint'], initial_method.source)
 
     # Run GP algorithm
 
     pop = []
-    if options['seeded_individuals'] is not None:
-        print('*** Seeding initial population ***')
-        try:
-            pop.extend(add_seeded_individuals(toolbox, options, ccl_objects, pset))
-        except Exception as e:
-            print(f'Error: {e}', file=sys.stderr)
-            raise e
+    if checkpoint is not None:
+        pop = checkpoint.population
+        restore_hall_of_fame(hof, checkpoint.hall_of_fame)
+        logbook = checkpoint.logbook
+        wanted = checkpoint.wanted
+        cache.update(checkpoint.fitness_values)
+    else:
+        if options['seeded_individuals'] is not None:
+            print('*** Seeding initial population ***')
+            try:
+                pop.extend(add_seeded_individuals(toolbox, options, sympy_pool, pset))
+            except Exception as e:
+                print(f'Error: {e}', file=sys.stderr)
+                raise e
+
+        print('*** Generating initial population ***')
+        pop.extend(generate_population(toolbox, sympy_pool, options))
 
-    print('*** Generating initial population ***')
-    pop.extend(generate_population(toolbox, ccl_objects, options))
+        if options['wanted_individuals'] is not None:
+            for ind in pop:
+                if ind.sympy_code in wanted:
+                    wanted[ind.sympy_code] = 0
+
+    if options['cache_dir'] is not None:
+        library_cache = LibraryCache(options['cache_dir'], options['cache_size_limit'] * 1024 * 1024,
+                                     data_digest(dataset, ref_charges, parameters))
+    else:
+        library_cache = None
+
+    pch_dir = None
+    precompiled_header = None
+    if options['precompiled_header'] and options['evaluator'] != 'numpy':
+        print('*** Building precompiled header ***')
+        if options['cache_dir'] is not None:
+            pch_dir = os.path.join(options['cache_dir'], 'pch')
+        else:
+            pch_dir = tempfile.mkdtemp(prefix='ccl_regression_pch_')
+        precompiled_header = build_precompiled_header(['g++', *get_compile_flags(options)], pch_dir)
+        evaluate_module.precompiled_header = precompiled_header
+
+    # Compiled libraries are written to memory and each is removed right after its evaluation
+    build_dir = None
+    if options['evaluator'] != 'numpy':
+        build_dir = create_build_directory()
+        evaluate_module.build_directory = build_dir
+
+    # Installed once in every worker, the tasks then carry only the encoded individuals
+    worker_context = EvaluationContext(initial_method, cache, ccl_objects, options, q)
+
+    initializer = init
+    initargs = (dataset, ref_charges, parameters, worker_context, library_cache, precompiled_header, build_dir)
+
+    skeleton_dir = None
+    numpy_dataset = None
+    if options['evaluator'] == 'numpy' or options['fit_constants']:
+        print('*** Loading dataset for the NumPy evaluator ***')
+        numpy_dataset = Dataset.load(dataset, ref_charges, parameters)
+        check_skeleton(initial_method, numpy_dataset, get_program_terminals(pset), ccl_objects)
+
+    full_dataset = None
+    if options['coreset_ratio'] is not None:
+        full_dataset = numpy_dataset
+        molecules, weights = select_coreset(full_dataset, options['coreset_ratio'])
+        numpy_dataset = full_dataset.subset(molecules, weights)
+        print(f'*** Selected coreset of {len(numpy_dataset)} out of {len(full_dataset)} molecules ***')
+
+    if options['shared_dataset']:
+        # Workers map the arrays or inherit the parsed data instead of each loading their own copy
+        if numpy_dataset is not None:
+            numpy_dataset.share()
+        if options['evaluator'] != 'numpy' and multiprocessing.get_start_method() == 'fork':
+            print('*** Loading dataset shared by the workers ***')
+            share_data(dataset, ref_charges, parameters)
+
+    racing_plan = None
+    if options['evaluator'] == 'numpy':
+        terminals = get_program_terminals(pset)
+        toolbox.register('encode', encode_program, terminals=terminals)
+        toolbox.register('evaluate', evaluate_vectorized)
+        if options['racing']:
+            racing_plan = create_racing_plan(numpy_dataset, options['racing_fractions'], options['seed'])
+            print(f'*** Racing on subsets of {", ".join(map(str, racing_plan.sizes))} molecules ***')
+            toolbox.register('race', race_vectorized)
+        initializer = init_vectorized
+        initargs = (numpy_dataset, worker_context, terminals, library_cache, racing_plan)
+    elif options['interpret_individuals']:
+        print('*** Compiling skeleton with the expression interpreter ***')
+        skeleton_dir = tempfile.mkdtemp(prefix='ccl_regression_skeleton_')
+        skeleton_library, skeleton_key, terminals = build_skeleton_library(initial_method, pset, ccl_objects, options,
+                                                                           library_cache, skeleton_dir)
+        toolbox.register('encode', encode_program, terminals=terminals)
+        toolbox.register('evaluate', evaluate_program)
+        initializer = init_interpreter
+        initargs = (dataset, ref_charges, parameters, worker_context, skeleton_library, skeleton_key, library_cache,
+                    precompiled_header)
+    elif options['incremental_compilation']:
+        print('*** Compiling skeleton calling the expression function ***')
+        skeleton_dir = tempfile.mkdtemp(prefix='ccl_regression_skeleton_')
+        skeleton_object, skeleton_key, terminals = build_skeleton_object(initial_method, pset, ccl_objects, options,
+                                                                         skeleton_dir)
+        toolbox.register('encode', encode_expression, terminals=terminals)
+        toolbox.register('evaluate', evaluate_expression)
+        initializer = init_incremental
+        initargs = (dataset, ref_charges, parameters, worker_context, skeleton_object, skeleton_key, len(terminals),
+                    library_cache, build_dir)
+
+    def create_fitter() -> Optional[ConstantFitter]:
+        """Create the pool fitting the constants, each island has its own"""
+        if not options['fit_constants']:
+            return None
+        return ConstantFitter(initial_method, numpy_dataset, get_program_terminals(pset), ccl_objects, options)
+
+    def get_batch_size(n: int) -> Optional[int]:
+        """Split the individuals evenly among the workers in the batch compilation mode"""
+        if not options['batch_compilation'] or options['interpret_individuals'] or \
+                options['incremental_compilation'] or options['evaluator'] == 'numpy':
+            return None
+        ncpus = options['ncpus'] if options['ncpus'] is not None else os.cpu_count()
+        ncpus = max(1, ncpus // options['islands'])
+        return max(1, min(options['batch_size'], math.ceil(n / ncpus)))
+
+    # Workers killed over the limits are replaced by the scheduler, which needs to know the tasks they were running
+    task_limits = create_task_limits(options)
+    monitor = LimitMonitor(task_limits, cache, q) if task_limits is not None else None
+
+    stats = manager.dict()
+    progress_process = multiprocessing.Process(target=progress_bar, args=(q, options, stats))
+    progress_process.start()
 
-    if options['wanted_individuals'] is not None:
-        for ind in pop:
-            if ind.sympy_code in wanted:
-                wanted[ind.sympy_code] = 0
+    executor = None
+    pipeline = None
+    fitter = None
+    promoter = None
+    island_results = []
+    if options['islands'] > 1:
+        print(f'*** Evolving {options["islands"]} islands ***')
+        island_results = run_islands(pop, toolbox, rng, options, ccl_objects, initializer, initargs, create_fitter,
+                                     all_stats, get_batch_size, q, list(wanted) if wanted is not None else None,
+                                     task_limits, cache)
+        pop = [ind for result in island_results for ind in result.population]
+        for result in island_results:
+            hof.update(result.hall_of_fame)
+            if wanted is not None:
+                for sympy_code, gen in result.wanted.items():
+                    if gen is not None and (wanted[sympy_code] is None or gen < wanted[sympy_code]):
+                        wanted[sympy_code] = gen
+        hof.update(fully_evaluated(pop))
+        logbook = merge_logbooks([result.logbook for result in island_results])
+    else:
+        executor = create_executor(options['ncpus'], initializer, initargs, task_limits)
+        register_map(toolbox, executor, options['ncpus'] if options['ncpus'] is not None else os.cpu_count(), options,
+                     monitor)
+
+        if options['pipeline'] and options['evaluator'] != 'numpy' and not options['interpret_individuals'] and \
+                not options['incremental_compilation'] and not options['batch_compilation']:
+            pipeline = Pipeline(worker_context, executor, library_cache)
+            toolbox.register('pipeline', pipeline.evaluate)
+
+        fitter = create_fitter()
+
+        if options['promotion_flags'] is not None:
+            promoter = Promoter(executor, toolbox.encode, options, q)
+            toolbox.register('promote', promoter.promote)
+
+        checkpoint_writer = None
+        if options['checkpoint'] is not None:
+            checkpoint_writer = CheckpointWriter(options['checkpoint'], options['checkpoint_interval'],
+                                                 options['checkpoint_minutes'])
+
+        def save_checkpoint(population: list, gen: int) -> None:
+            if checkpoint_writer.due(gen):
+                checkpoint_writer.write(Checkpoint(CHECKPOINT_VERSION, initial_method.source, gen, population,
+                                                   list(hof), logbook, rng.getstate(), random.getstate(), wanted,
+                                                   fitter.fitted if fitter is not None else None, cache.items()))
+
+        start_gen = None
+        if checkpoint is not None:
+            start_gen = checkpoint.gen
+            if fitter is not None and checkpoint.fitted_constants is not None:
+                fitter.fitted.update(checkpoint.fitted_constants)
+            # Operators draw from both generators, DEAP's variation uses the global one
+            rng.setstate(checkpoint.rng_state)
+            random.setstate(checkpoint.global_rng_state)
+
+        if options['steady_state']:
+            evolve_steady_state(pop, toolbox, options, sympy_pool, fitter, hof, all_stats, logbook, q, wanted,
+                                options['ncpus'] if options['ncpus'] is not None else os.cpu_count())
+        else:
+            evolve(pop, toolbox, options, sympy_pool, fitter, hof, all_stats, logbook, q, wanted, get_batch_size,
+                   checkpoint=save_checkpoint if checkpoint_writer is not None else None, start_gen=start_gen)
+
+        if checkpoint_writer is not None:
+            checkpoint_writer.wait()
+
+    if pipeline is not None:
+        pipeline.shutdown()
+    if fitter is not None:
+        fitter.shutdown()
+    sympy_pool.shutdown()
+    if executor is not None:
+        executor.shutdown(wait=True)
+    q.put(None)
+    progress_process.join()
 
-    executor = concurrent.futures.ProcessPoolExecutor(options['ncpus'],
-                                                      initializer=init,
-                                                      initargs=(dataset, ref_charges, parameters))
-    toolbox.register('map', executor.map)
+    remove_task_limits(task_limits)
+    if numpy_dataset is not None:
+        numpy_dataset.release()
 
-    progress_process = multiprocessing.Process(target=progress_bar, args=(q, options))
+    if skeleton_dir is not None:
+        shutil.rmtree(skeleton_dir)
 
-    q.put(('gen', 0, len(pop)))
+    if build_dir is not None:
+        shutil.rmtree(build_dir, ignore_errors=True)
 
-    progress_process.start()
-    evaluate_population(pop, toolbox)
-
-    hof.update(pop)
-    record = all_stats.compile(pop)
-    logbook.record(gen=0, evals=len(pop), **record, best=hof[0].sympy_code)
-
-    for gen in range(options['generations']):
-        if options['early_exit']:
-            found = False
-            for individual in pop:
-                # Check if RMSD < 0.0001 and R2 > 0.9999
-                if individual.fitness.values[1] < 0.0001 and individual.fitness.values[2] > 0.9999:
-                    found = True
-                    break
-            if found:
-                break
-
-        offspring = toolbox.select(pop, len(pop))
-        offspring = algorithms.varAnd(offspring, toolbox, options['crossover_probability'],
-                                      options['mutation_probability'])
-
-        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-        q.put(('gen', gen + 1, len(invalid_ind)))
-
-        generate_sympy_codes(invalid_ind, ccl_objects)
-        evaluate_population(invalid_ind, toolbox)
-        pop[:] = offspring
-
-        hof.update(pop)
-        record = all_stats.compile(pop)
-        logbook.record(gen=gen + 1, evals=len(invalid_ind), **record, best=hof[0].sympy_code)
+    if pch_dir is not None and options['cache_dir'] is None:
+        shutil.rmtree(pch_dir)
 
-        if options['wanted_individuals'] is not None:
-            for ind in pop:
-                if ind.sympy_code in wanted and wanted[ind.sympy_code] is None:
-                    wanted[ind.sympy_code] = gen
+    cache.remove()
 
-    executor.shutdown(wait=True)
-    q.put(None)
-    progress_process.join()
+    # Fitness of the best individuals on the coreset by their codes, they are ranked by the full one in the end
+    coreset_fitness = {}
+    if full_dataset is not None:
+        print('*** Evaluating the best individuals on the full dataset ***')
+        coreset_fitness = {ind.sympy_code: ind.fitness.values for ind in hof}
+        full_values = evaluate_on_dataset(list(hof), initial_method, full_dataset, get_program_terminals(pset),
+                                          ccl_objects, options)
+        confirmed = tools.HallOfFame(options['top_results'], similar=lambda x, y: x.sympy_code == y.sympy_code)
+        for ind, values in zip(hof, full_values):
+            ind.fitness.values = values
+        confirmed.update(list(hof))
+        hof = confirmed
 
     end_time = datetime.datetime.now().replace(microsecond=0)
 
@@ -228,14 +475,27 @@ def run_symbolic_regression(initial_method: 'CCLMethod', dataset: str, ref_charg
     logger.info(f'\n*** Best individuals encountered ({best_count}) ***')
 
     for i in range(best_count):
+        # The native canonical form identifies the individuals, sympy is used only to present the results
+        if options['canonicalizer'] == 'native':
+            code = generate_sympy_code(hof[i], ccl_objects)
+        else:
+            code = hof[i].sympy_code
         logger.info(f'Obj = {hof[i].fitness.values[0]: 6.4f} | '
                     f'RMSD = {hof[i].fitness.values[1]: 6.4f} | '
                     f'R2 = {hof[i].fitness.values[2]: 8.4f} | '
                     f'Dmax = {hof[i].fitness.values[3]: 8.4f} | '
                     f'Davg = {hof[i].fitness.values[4]: 8.4f}: '
-                    f'{hof[i].sympy_code}')
-
-    logbook.header = 'gen', 'evals', 'RMSD', 'R2', 'Dmax', 'Davg', 'best'
+                    f'{code}')
+
+    # Unchanged are the individuals varied by the operators that kept their fitness
+    logbook.header = 'gen', 'evals', 'unchanged', 'RMSD', 'R2', 'Dmax', 'Davg', 'Schedule', 'best'
+    if island_results:
+        logbook.header = 'gen', 'island', 'evals', 'unchanged', 'RMSD', 'R2', 'Dmax', 'Davg', 'Schedule', 'best'
+    if 'Schedule' not in logbook.chapters:
+        logbook.header = tuple(x for x in logbook.header if x != 'Schedule')
+    else:
+        # Times of the evaluation tasks in seconds
+        logbook.chapters['Schedule'].header = 'makespan', 'tail', 'util', 'slowest'
     logbook.chapters['RMSD'].header = 'min', 'med', 'max'
     logbook.chapters['R2'].header = 'min', 'med', 'max'
     logbook.chapters['Dmax'].header = 'min', 'med', 'max'
@@ -252,6 +512,70 @@ def run_symbolic_regression(initial_method: 'CCLMethod', dataset: str, ref_charg
             else:
                 logger.info(f'{sympy_code:{max_length}}: not found')
 
+    messages = stats.pop('messages', {})
+    hits = messages.get('Cached', 0) + messages.get('Shared', 0)
+    misses = messages.get('Stored', 0) + messages.get('Evaluated', 0)
+    logger.info('\n*** Fitness cache stats ***')
+    logger.info(f'Worker-local hits: {messages.get("Cached", 0)}')
+    logger.info(f'Shared hits      : {messages.get("Shared", 0)}')
+    logger.info(f'Misses           : {misses}')
+    if hits + misses:
+        logger.info(f'Hit rate         : {hits / (hits + misses):.1%}')
+
+    limits = ('compile_timeout', 'compile_memory_limit', 'evaluation_timeout', 'evaluation_memory_limit')
+    if any(options[name] is not None for name in limits):
+        logger.info('\n*** Limits stats ***')
+        logger.info(f'Timeouts      : {messages.get("Timeout", 0)}')
+        logger.info(f'Out of memory : {messages.get("Memory", 0)}')
+        logger.info(f'Crashed       : {messages.get("Crashed", 0)}')
+
+    if stats:
+        logger.info('\n*** Evaluation stats ***')
+        max_size = max(len(name) for name in stats.keys())
+        for name, (count, total, max_value) in sorted(stats.items()):
+            logger.info(f'{name:<{max_size}}: count = {count:6d} | mean = {total / count:8.4f} | '
+                        f'max = {max_value:8.4f} | total = {total:10.2f}')
+
+    if full_dataset is not None:
+        logger.info('\n*** Coreset stats ***')
+        logger.info(f'Molecules  : {len(numpy_dataset)} of {len(full_dataset)} '
+                    f'({len(numpy_dataset) / len(full_dataset):.1%})')
+        logger.info(f'Atoms      : {len(numpy_dataset.ref_charges)} of {len(full_dataset.ref_charges)} '
+                    f'({len(numpy_dataset.ref_charges) / len(full_dataset.ref_charges):.1%})')
+        coreset_obj = [coreset_fitness[ind.sympy_code][0] for ind in hof]
+        full_obj = [ind.fitness.values[0] for ind in hof]
+        correlation = get_correlation(coreset_obj, full_obj)
+        logger.info(f'Correlation: {correlation:.4f}' if correlation is not None else 'Correlation: undefined')
+        for ind, x, y in zip(hof, coreset_obj, full_obj):
+            logger.info(f'Coreset Obj = {x: 6.4f} | Full Obj = {y: 6.4f}: {ind.sympy_code}')
+
+    if racing_plan is not None:
+        logger.info('\n*** Racing stats ***')
+        logger.info(f'Subset sizes   : {", ".join(map(str, racing_plan.sizes))}')
+        logger.info(f'Raced out      : {messages.get("Raced out", 0)}')
+        logger.info(f'Fully evaluated: {messages.get("Evaluated", 0)}')
+
+    if pipeline is not None:
+        logger.info('\n*** Pipeline stats ***')
+        for line in pipeline.summary():
+            logger.info(line)
+
+    if fitter is not None:
+        logger.info('\n*** Constant fitting stats ***')
+        for line in fitter.summary():
+            logger.info(line)
+
+    if promoter is not None:
+        logger.info('\n*** Promotion stats ***')
+        for line in promoter.summary():
+            logger.info(line)
+
+    for i, result in enumerate(island_results):
+        if result.fitting_summary:
+            logger.info(f'\n*** Constant fitting stats (island {i}) ***')
+            for line in result.fitting_summary:
+                logger.info(line)
+
     time_format = '%d %B %Y: %H:%M:%S'
     logger.info('\n*** Time stats ***')
     logger.info(f'Started: {start_time.strftime(time_format)}')
@@ -0,0 +1,154 @@
+"""Scheduling of the evaluation tasks by their estimated cost"""
+
+import collections
+import concurrent.futures
+import concurrent.futures.process
+import functools
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from deap import base
+
+from ccl.regression.evaluate import task_individuals
+from ccl.regression.limits import LimitMonitor, run_limited
+
+# Functions noticeably more expensive to evaluate or compile than the arithmetic
+_EXPENSIVE = re.compile(r'\b(exp|sqrt|cbrt|sin|cos|tan|sinh|cosh|tanh|EE)\b')
+
+# Number of measured tasks needed before the cost model is fitted, and the number of them kept
+MIN_SAMPLES = 16
+MAX_SAMPLES = 2000
+
+
+def task_features(task: Any) -> Tuple[float, float, float, float]:
+    """Return the features of a task (an encoded individual or a batch of them) the cost is estimated from"""
+    individuals = task_individuals(task)
+    codes = [ind.code for ind in individuals]
+    return 1.0, float(len(individuals)), float(sum(len(code) for code in codes)), \
+        float(sum(len(_EXPENSIVE.findall(code)) for code in codes))
+
+
+def run_timed(func: Callable, task: Any) -> Tuple[Any, float]:
+    """Run the task in the worker and return its result with the time it took"""
+    start = time.perf_counter()
+    result = func(task)
+    return result, time.perf_counter() - start
+
+
+class CostScheduler:
+    """Map the tasks on the pool starting with the most expensive ones
+
+    The tasks are submitted one by one in the order of their decreasing estimated cost, so the idle workers take the
+    next one and the cheap tasks fill the gaps at the end of the generation. The cost is estimated by a linear model of
+    the task features fitted by least squares to the times of the already finished tasks, the size of the code is used
+    until enough of them is known.
+
+    With the limits of the tasks, the pool broken by a killed worker is restarted and the unfinished tasks are
+    submitted again except those rejected by the monitor, which have no result.
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor, workers: int,
+                 monitor: Optional[LimitMonitor] = None) -> None:
+        self.executor: concurrent.futures.Executor = executor
+        self.workers: int = workers
+        self.monitor: Optional[LimitMonitor] = monitor
+        self.samples: collections.deque = collections.deque(maxlen=MAX_SAMPLES)
+        self.stats: Dict[str, float] = {}
+
+    def estimate(self, features: np.ndarray) -> np.ndarray:
+        """Return the estimated time of the tasks with the given features"""
+        if len(self.samples) < MIN_SAMPLES:
+            return features[:, 2]
+
+        x = np.array([sample for sample, _ in self.samples])
+        y = np.array([elapsed for _, elapsed in self.samples])
+        coefficients, *_ = np.linalg.lstsq(x, y, rcond=None)
+        return features @ coefficients
+
+    def map(self, func: Callable, tasks: Sequence[Any]) -> List[Any]:
+        """Return the results of the function applied to the tasks in their original order"""
+        tasks = list(tasks)
+        if not tasks:
+            return []
+
+        features = np.array([task_features(task) for task in tasks])
+        order = np.argsort(-self.estimate(features), kind='stable')
+
+        if self.monitor is not None:
+            func = functools.partial(run_limited, func)
+
+        start = time.perf_counter()
+        results: List[Any] = [None] * len(tasks)
+        elapsed = np.zeros(len(tasks))
+        finished = []
+        done = np.zeros(len(tasks), dtype=bool)
+        pending = list(order)
+        while pending:
+            futures = {self.executor.submit(run_timed, func, tasks[i]): i for i in pending}
+            broken = False
+            for future in concurrent.futures.as_completed(futures):
+                if isinstance(future.exception(), concurrent.futures.process.BrokenProcessPool) and \
+                        self.monitor is not None:
+                    broken = True
+                    continue
+
+                i = futures[future]
+                results[i], elapsed[i] = future.result()
+                done[i] = True
+                finished.append(time.perf_counter() - start)
+
+            pending = [i for i in pending if not done[i]]
+            if broken:
+                rejected = self.monitor.recover(self.executor)
+                if rejected is None:
+                    raise concurrent.futures.process.BrokenProcessPool('Worker was killed outside of any task')
+                pending = [i for i in pending
+                           if not all(ind.sympy_code in rejected for ind in task_individuals(tasks[i]))]
+
+        self.samples.extend(zip(map(tuple, features[done]), elapsed[done]))
+        if finished:
+            self.record(finished, elapsed)
+        return results
+
+    def record(self, finished: List[float], elapsed: np.ndarray) -> None:
+        """Add the statistics of the mapped tasks to the ones of the current generation
+
+        The tail is the time since the first worker had no task left to take until the last task finished.
+        """
+        makespan = finished[-1]
+        tail = makespan - finished[max(0, len(finished) - self.workers)]
+        stats = self.stats
+        stats['makespan'] = stats.get('makespan', 0.0) + makespan
+        stats['tail'] = stats.get('tail', 0.0) + tail
+        stats['busy'] = stats.get('busy', 0.0) + float(elapsed.sum())
+        stats['slowest'] = max(stats.get('slowest', 0.0), float(elapsed.max()))
+
+    def take_stats(self) -> Dict[str, float]:
+        """Return the statistics of the tasks mapped since the last call
+
+        Utilization is the fraction of the time the workers spent running the tasks.
+        """
+        stats, self.stats = self.stats, {}
+        if not stats:
+            return {'makespan': 0.0, 'tail': 0.0, 'util': 0.0, 'slowest': 0.0}
+
+        utilization = stats['busy'] / (self.workers * stats['makespan']) if stats['makespan'] > 0 else 0.0
+        return {'makespan': round(stats['makespan'], 3), 'tail': round(stats['tail'], 3),
+                'util': round(min(utilization, 1.0), 3), 'slowest': round(stats['slowest'], 3)}
+
+
+def register_map(toolbox: base.Toolbox, executor: concurrent.futures.Executor, workers: int, options: dict,
+                 monitor: Optional[LimitMonitor] = None) -> None:
+    """Register the map of the evaluation tasks on the pool according to the chosen scheduler
+
+    Submission of a single task is registered as well for the steady-state evolution.
+    """
+    toolbox.register('submit', executor.submit)
+    if options['scheduler'] == 'cost':
+        scheduler = CostScheduler(executor, workers, monitor)
+        toolbox.register('map', scheduler.map)
+        toolbox.register('schedule_stats', scheduler.take_stats)
+    else:
+        toolbox.register('map', executor.map)
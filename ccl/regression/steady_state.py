@@ -0,0 +1,182 @@
+"""Steady-state evolution, offspring are evaluated asynchronously and inserted into the population one by one"""
+
+import concurrent.futures
+import functools
+import multiprocessing
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from deap import base, gp, tools
+
+from ccl.regression.constant_fitting import ConstantFitter
+from ccl.regression.deap_gp import var_and
+from ccl.regression.evaluate import evaluate_population, select_unique
+from ccl.regression.evolution import compile_record
+from ccl.regression.racing import fully_evaluated, get_racing_threshold
+from ccl.regression.scheduling import run_timed
+from ccl.regression.sympy_pool import SympyPool
+
+# Number of random individuals of the population the replaced one is the worst of
+REPLACEMENT_TOURNAMENT = 3
+
+# Number of tasks submitted per worker, so that a worker finishing a task takes the next one immediately
+TASKS_PER_WORKER = 2
+
+
+def insert_individual(pop: List[gp.PrimitiveTree], ind: gp.PrimitiveTree) -> bool:
+    """Replace the worst of randomly chosen individuals by the new one if it is better, return whether it was inserted
+
+    Individual whose code is already in the population is not inserted, so that the copies of a good individual do not
+    take over the population.
+    """
+    if any(x.sympy_code == ind.sympy_code for x in pop):
+        return False
+
+    worst = min(random.sample(range(len(pop)), min(REPLACEMENT_TOURNAMENT, len(pop))), key=lambda i: pop[i].fitness)
+    if not ind.fitness > pop[worst].fitness:
+        return False
+
+    pop[worst] = ind
+    return True
+
+
+def breed(pop: List[gp.PrimitiveTree], toolbox: base.Toolbox, options: dict,
+          n: int) -> Tuple[List[gp.PrimitiveTree], int]:
+    """Return n offspring of the parents selected from the population and the number of those that kept the fitness"""
+    offspring = []
+    unchanged = 0
+    while len(offspring) < n:
+        children, count = var_and(toolbox.select(pop, 2), toolbox, options['crossover_probability'],
+                                  options['mutation_probability'])
+        offspring.extend(children)
+        unchanged += count
+
+    return offspring[:n], unchanged
+
+
+def evolve_steady_state(pop: List[gp.PrimitiveTree], toolbox: base.Toolbox, options: dict, sympy_pool: SympyPool,
+                        fitter: Optional[ConstantFitter], hof: tools.HallOfFame, stats: tools.MultiStatistics,
+                        logbook: tools.Logbook, message_queue: multiprocessing.Queue,
+                        wanted: Optional[Dict[str, Optional[int]]], workers: int,
+                        migrate: Optional[Callable[[List[gp.PrimitiveTree], int], None]] = None) -> None:
+    """Evaluate the initial population and evolve it without waiting for whole generations
+
+    New offspring are bred from the current population whenever a worker can take another task, each evaluated one
+    replaces the worst of a small tournament. The same number of offspring as by the generational loop is produced in
+    total. Statistics are recorded after every interval of the completed offspring (the population size by default),
+    the intervals take place of the generations in the logbook and in the migration. The population is modified in
+    place. The order of the completed evaluations depends on timing, so the runs are not reproducible.
+    """
+    count = len(select_unique(pop))
+    message_queue.put(('gen', 0, count))
+    evaluate_population(pop, toolbox)
+
+    hof.update(fully_evaluated(pop))
+    logbook.record(gen=0, evals=len(pop), unchanged=0, **compile_record(pop, toolbox, stats),
+                   best=hof[0].sympy_code)
+
+    interval = options['steady_state_interval'] or len(pop)
+    budget = options['generations'] * len(pop)
+
+    # Individuals waiting for the evaluation of their code, duplicates are not submitted again
+    waiting: Dict[str, List[gp.PrimitiveTree]] = {}
+    pending: Dict[concurrent.futures.Future, str] = {}
+    produced = 0
+    stop = False
+
+    # Counters of the current interval
+    gen = 1
+    completed = 0
+    evals = 0
+    unchanged = 0
+    busy = 0.0
+    slowest = 0.0
+    start = time.perf_counter()
+    message_queue.put(('gen', gen, interval))
+
+    def complete(ind: gp.PrimitiveTree) -> None:
+        nonlocal gen, completed, evals, unchanged, busy, slowest, start, stop
+        if insert_individual(pop, ind):
+            hof.update(fully_evaluated([ind]))
+            # Intervals are numbered from one like the generations, but the wanted individuals record the zero-based
+            # index of the generation as in the generational loop
+            if wanted is not None and ind.sympy_code in wanted and wanted[ind.sympy_code] is None:
+                wanted[ind.sympy_code] = gen - 1
+            # Check if RMSD < 0.0001 and R2 > 0.9999
+            if options['early_exit'] and ind.fitness.values[1] < 0.0001 and ind.fitness.values[2] > 0.9999:
+                stop = True
+
+        completed += 1
+        if completed == interval:
+            record_interval()
+            gen += 1
+            completed = evals = unchanged = 0
+            busy = slowest = 0.0
+            start = time.perf_counter()
+            if produced < budget and not stop:
+                message_queue.put(('gen', gen, interval))
+
+    def record_interval() -> None:
+        if hasattr(toolbox, 'promote'):
+            toolbox.promote(pop, hof)
+        record = stats.compile(pop)
+        if hasattr(toolbox, 'schedule_stats'):
+            elapsed = time.perf_counter() - start
+            record['Schedule'] = {'makespan': round(elapsed, 3), 'tail': 0.0,
+                                  'util': round(min(busy / (workers * elapsed), 1.0), 3) if elapsed > 0 else 0.0,
+                                  'slowest': round(slowest, 3)}
+        logbook.record(gen=gen, evals=evals, unchanged=unchanged, **record, best=hof[0].sympy_code)
+        if migrate is not None:
+            migrate(pop, gen)
+
+    while True:
+        free = TASKS_PER_WORKER * workers - len(pending)
+        if not stop and produced < budget and free > 0:
+            offspring, kept = breed(pop, toolbox, options, min(free, budget - produced))
+            produced += len(offspring)
+            unchanged += kept
+
+            invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+            sympy_pool.generate_sympy_codes(invalid_ind)
+            if fitter is not None:
+                sympy_pool.generate_sympy_codes(fitter.fit(invalid_ind))
+
+            # Offspring have to be as good as the current population on the subsets to be evaluated on all molecules
+            if hasattr(toolbox, 'race'):
+                func = functools.partial(toolbox.race, threshold=get_racing_threshold(pop, options))
+            else:
+                func = toolbox.evaluate
+
+            present = {ind.sympy_code: ind for ind in pop}
+            for ind in offspring:
+                if ind.fitness.valid:
+                    complete(ind)
+                elif ind.sympy_code in present:
+                    ind.fitness.values = present[ind.sympy_code].fitness.values
+                    ind.fidelity = present[ind.sympy_code].fidelity
+                    complete(ind)
+                elif ind.sympy_code in waiting:
+                    waiting[ind.sympy_code].append(ind)
+                else:
+                    waiting[ind.sympy_code] = [ind]
+                    pending[toolbox.submit(run_timed, func, toolbox.encode(ind))] = ind.sympy_code
+            continue
+
+        if not pending:
+            break
+
+        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            result, elapsed = future.result()
+            busy += elapsed
+            slowest = max(slowest, elapsed)
+            evals += 1
+            fitness, fidelity = result if hasattr(toolbox, 'race') else (result, 1.0)
+            for ind in waiting.pop(pending.pop(future)):
+                ind.fitness.values = fitness
+                ind.fidelity = fidelity
+                complete(ind)
+
+    if completed:
+        record_interval()
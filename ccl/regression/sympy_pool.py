@@ -0,0 +1,100 @@
+"""Long-lived pool of workers converting individuals into the codes identifying them"""
+
+import concurrent.futures
+import math
+import os
+from typing import Callable, List, Optional
+
+import sympy
+from deap import gp
+
+from ccl.regression.canonical import Canonicalizer, NonRealError, render
+from ccl.regression.constraints import check_max_constant, check_max_canonical_constant
+from ccl.regression.evaluate import generate_sympy_code
+from ccl.regression.generators import generate_sympy_expr
+
+
+worker_ccl_objects: Optional[dict] = None
+worker_options: Optional[dict] = None
+worker_canonicalizer: Optional[Canonicalizer] = None
+
+
+def init_sympy_worker(ccl_objects: dict, options: dict) -> None:
+    """Initialize the objects shared by all the conversions in the worker"""
+    global worker_ccl_objects, worker_options, worker_canonicalizer
+    worker_ccl_objects = ccl_objects
+    worker_options = options
+    worker_canonicalizer = Canonicalizer(ccl_objects)
+
+
+def convert(x: gp.PrimitiveTree) -> str:
+    """Generate the code of an individual, invalid ones are marked as in generate_sympy_code"""
+    if worker_options['canonicalizer'] == 'native':
+        return worker_canonicalizer.code(x)
+
+    return generate_sympy_code(x, worker_ccl_objects)
+
+
+def convert_checked(x: gp.PrimitiveTree) -> Optional[str]:
+    """Generate the code of an individual, None is returned if it is not allowed in the initial population"""
+    max_constant_allowed = worker_options['max_constant_allowed']
+    if worker_options['canonicalizer'] == 'native':
+        try:
+            expr = worker_canonicalizer.canonicalize(x)
+        except (NonRealError, OverflowError):
+            return None
+
+        if max_constant_allowed is not None and not check_max_canonical_constant(expr, worker_options):
+            return None
+
+        return render(expr)
+
+    try:
+        sympy_expr = generate_sympy_expr(x, worker_ccl_objects)
+    except RuntimeError:
+        return None
+
+    if sympy_expr.has(sympy.zoo, sympy.oo, sympy.nan, sympy.I):
+        return None
+
+    if max_constant_allowed is not None and not check_max_constant(sympy_expr, worker_options):
+        return None
+
+    return str(sympy_expr)
+
+
+class SympyPool:
+    """Pool of workers used for all the sympy conversions during the regression
+
+    Starting the workers and importing sympy is paid only once per run. Individuals are submitted in chunks, so that
+    the overhead of the communication is small compared to the conversion itself. The native canonical form is cheaper
+    than sending the individuals to other processes, so it is computed directly without the workers.
+    """
+
+    def __init__(self, ccl_objects: dict, options: dict) -> None:
+        self.workers: int = options['ncpus'] if options['ncpus'] is not None else os.cpu_count()
+        self.executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        if options['canonicalizer'] == 'native':
+            init_sympy_worker(ccl_objects, options)
+        else:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=init_sympy_worker,
+                                                                   initargs=(ccl_objects, options))
+
+    def map(self, fn: Callable[[gp.PrimitiveTree], Optional[str]],
+            individuals: List[gp.PrimitiveTree]) -> List[Optional[str]]:
+        """Apply the conversion to all the individuals, the results are in the same order"""
+        if self.executor is None:
+            return [fn(x) for x in individuals]
+
+        # Few chunks per worker balance the load while keeping the number of messages low
+        chunksize = max(1, math.ceil(len(individuals) / (4 * self.workers)))
+        return list(self.executor.map(fn, individuals, chunksize=chunksize))
+
+    def generate_sympy_codes(self, pop: List[gp.PrimitiveTree]) -> None:
+        """Generate codes for all individuals in the population"""
+        for ind, sympy_code in zip(pop, self.map(convert, pop)):
+            ind.sympy_code = sympy_code
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
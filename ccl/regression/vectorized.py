@@ -0,0 +1,528 @@
+"""Evaluate individuals by interpreting the method with NumPy, no C++ toolchain is needed"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+import numpy as np
+
+import ccl.regression.evaluate as evaluate_module
+from ccl import ast, symboltable
+from ccl.functions import ELEMENT_PROPERTIES
+from ccl.types import ArrayType, ObjectType, ParameterType
+from ccl.regression.cache import LibraryCache
+from ccl.regression.dataset import Dataset
+from ccl.regression.evaluate import INVALID_RESULT, EncodedIndividual, EvaluationContext, get_cached_result, \
+    get_stored_result, process_result, record_result
+from ccl.regression.interpreter import create_program_skeleton
+from ccl.regression.racing import RacingPlan
+
+
+class Tensor(NamedTuple):
+    """Value of an expression, i-th axis of the array goes over the atoms bound to the i-th name in indices"""
+    value: np.ndarray
+    indices: Tuple[str, ...]
+
+
+# Operations of the expression interpreter, names are the same as in the C++ one
+_UNARY_OPS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    'sqrt': np.sqrt,
+    'cbrt': lambda x: np.power(x, 1.0 / 3.0),
+    'square': np.square,
+    'cube': lambda x: np.power(x, 3.0),
+    'exp': np.exp,
+    'inv': lambda x: 1.0 / x,
+    'double': lambda x: 2.0 * x,
+    'half': lambda x: 0.5 * x,
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'sinh': np.sinh,
+    'cosh': np.cosh,
+    'tanh': np.tanh,
+}
+
+_BINARY_OPS: Dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    'add': np.add,
+    'sub': np.subtract,
+    'mul': np.multiply,
+    'div': np.divide,
+}
+
+_AST_BINARY_OPS = {
+    ast.BinaryOp.Ops.ADD: np.add,
+    ast.BinaryOp.Ops.SUB: np.subtract,
+    ast.BinaryOp.Ops.MUL: np.multiply,
+    ast.BinaryOp.Ops.DIV: np.divide,
+    ast.BinaryOp.Ops.POW: np.power,
+}
+
+Instruction = Tuple[str, Union[int, float, None]]
+
+
+def parse_program(code: str) -> List[Instruction]:
+    """Parse the code of the expression interpreter, see generate_program"""
+    program: List[Instruction] = []
+    for token in code.split():
+        if token[0] == '@':
+            program.append(('term', int(token[1:])))
+        elif token[0].isdigit() or token[0] in '-.':
+            program.append(('const', float(token)))
+        elif token in _UNARY_OPS or token in _BINARY_OPS:
+            program.append((token, None))
+        else:
+            raise RuntimeError(f'Unknown regression instruction: {token}')
+
+    return program
+
+
+def align(x: Tensor, indices: Tuple[str, ...]) -> np.ndarray:
+    """Reorder axes of the tensor to match indices, axes missing in the tensor have length one"""
+    if not x.indices:
+        return x.value
+
+    present = [i for i in indices if i in x.indices]
+    value = np.transpose(x.value, [x.indices.index(i) for i in present])
+    return value.reshape([value.shape[present.index(i)] if i in x.indices else 1 for i in indices])
+
+
+def combine(f: Callable[..., np.ndarray], *args: Tensor) -> Tensor:
+    """Apply the element-wise function to the tensors, the result goes over all the indices of the arguments"""
+    indices = tuple(dict.fromkeys(i for x in args for i in x.indices))
+    return Tensor(f(*(align(x, indices) for x in args)), indices)
+
+
+def index_tensor(value: np.ndarray, indices: Tuple[str, ...]) -> Tensor:
+    """Create tensor from an array indexed by the names, repeated name selects the diagonal"""
+    if len(indices) == 2 and indices[0] == indices[1]:
+        return Tensor(np.diagonal(value), indices[:1])
+
+    return Tensor(value, indices)
+
+
+# noinspection PyPep8Naming
+class VectorizedMethod(ast.ASTVisitor):
+    """Calculate charges by interpreting the method AST, operations are vectorized over the atoms of a molecule"""
+
+    def __init__(self, method: ast.Method, dataset: Dataset) -> None:
+        self.method: ast.Method = method
+        self.dataset: Dataset = dataset
+        self.program: List[Instruction] = []
+        self.variables: Dict[str, np.ndarray] = {}
+        # Mapping of indices of the substitution being evaluated to the actual ones
+        self.mapping: Dict[str, str] = {}
+        self.atoms: slice = slice(0, 0)
+        self.n: int = 0
+        self.total_charge: float = 0.0
+        self.distances: Optional[np.ndarray] = None
+        # Element properties of all atoms of the dataset
+        self.properties: Dict[str, np.ndarray] = {}
+
+    def calculate_charges(self, m: int, program: List[Instruction]) -> np.ndarray:
+        """Calculate charges of the m-th molecule of the dataset using the program as the regression expression"""
+        self.atoms = self.dataset.atoms(m)
+        self.n = self.atoms.stop - self.atoms.start
+        self.total_charge = self.dataset.total_charges[m]
+        self.distances = None
+        self.program = program
+        self.variables = {'q': np.zeros(self.n)}
+
+        for statement in self.method.statements:
+            self.visit(statement)
+
+        return self.variables['q']
+
+    def get_distances(self) -> np.ndarray:
+        """Return the matrix of distances between the atoms"""
+        if self.distances is None:
+            coordinates = self.dataset.coordinates[self.atoms]
+            self.distances = np.linalg.norm(coordinates[:, np.newaxis, :] - coordinates[np.newaxis, :, :], axis=-1)
+
+        return self.distances
+
+    def get_property(self, name: str) -> np.ndarray:
+        """Return the element property of the atoms of the molecule"""
+        if name not in self.properties:
+            self.properties[name] = self.dataset.element_property(name)
+
+        return self.properties[name][self.atoms]
+
+    def index_name(self, node: ast.Name) -> str:
+        return self.mapping.get(node.val, node.val)
+
+    def check_object(self, node: ast.ASTNode, name: str) -> None:
+        """Check that the object goes over all atoms as only such objects are vectorized"""
+        symbol = symboltable.SymbolTable.get_table_for_node(node).resolve(name)
+        if isinstance(symbol, symboltable.ObjectSymbol):
+            if symbol.type != ObjectType.ATOM or symbol.constraints is not None:
+                raise NotImplementedError(f'Only unconstrained atom objects are supported: {name}')
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        value = self.visit(node.rhs)
+        if isinstance(node.lhs, ast.Name):
+            if value.indices:
+                raise NotImplementedError(f'Cannot assign value depending on objects to {node.lhs.val}')
+            self.variables[node.lhs.val] = value.value
+        else:
+            indices = tuple(self.index_name(i) for i in node.lhs.indices)
+            if set(value.indices) - set(indices):
+                raise NotImplementedError(f'Cannot assign value depending on other objects to {node.lhs.name.val}')
+            self.variables[node.lhs.name.val] = np.broadcast_to(align(value, indices), (self.n,) * len(indices))
+
+    def visit_For(self, node: ast.For) -> None:
+        for i in range(int(node.value_from.val), int(node.value_to.val) + 1):
+            self.variables[node.name.val] = np.float64(i)
+            for statement in node.body:
+                self.visit(statement)
+
+    def visit_ForEach(self, node: ast.ForEach) -> None:
+        # The body is executed for all atoms at once
+        if node.type != ObjectType.ATOM or node.constraints is not None:
+            raise NotImplementedError('Only unconstrained loops over atoms are supported')
+        LoopDependencyChecker(node).visit(node)
+
+        for statement in node.body:
+            self.visit(statement)
+
+    def visit_Number(self, node: ast.Number) -> Tensor:
+        return Tensor(np.float64(node.val), ())
+
+    def visit_Name(self, node: ast.Name) -> Tensor:
+        name = node.val
+        symbol = symboltable.SymbolTable.get_table_for_node(node).resolve(name)
+        if isinstance(symbol, symboltable.ParameterSymbol) and symbol.type == ParameterType.COMMON:
+            return Tensor(np.float64(self.dataset.common_parameters[name]), ())
+        elif isinstance(symbol, symboltable.VariableSymbol):
+            return Tensor(self.variables[name], ())
+        elif isinstance(symbol, symboltable.SubstitutionSymbol):
+            return self.substitute(symbol, ())
+
+        raise NotImplementedError(f'Cannot evaluate symbol {name} with NumPy')
+
+    def visit_Subscript(self, node: ast.Subscript) -> Tensor:
+        name = node.name.val
+        symbol = symboltable.SymbolTable.get_table_for_node(node).resolve(name)
+        indices = tuple(self.index_name(i) for i in node.indices)
+        if isinstance(symbol, symboltable.ParameterSymbol) and symbol.type == ParameterType.ATOM:
+            column = self.dataset.atom_parameter_names.index(name)
+            return Tensor(self.dataset.atom_parameters[self.atoms, column], indices)
+        elif isinstance(symbol, symboltable.VariableSymbol):
+            return index_tensor(self.variables[name], indices)
+        elif isinstance(symbol, symboltable.SubstitutionSymbol):
+            return self.substitute(symbol, indices)
+        elif isinstance(symbol, symboltable.FunctionSymbol) and symbol.function.name == 'distance':
+            return index_tensor(self.get_distances(), indices)
+        elif isinstance(symbol, symboltable.FunctionSymbol) and symbol.function.name in ELEMENT_PROPERTIES:
+            return Tensor(self.get_property(symbol.function.name), indices)
+
+        raise NotImplementedError(f'Cannot evaluate symbol {name} with NumPy')
+
+    def substitute(self, symbol: symboltable.SubstitutionSymbol, indices: Tuple[str, ...]) -> Tensor:
+        if len(symbol.rules) != 1:
+            raise NotImplementedError(f'Substitutions with constraints are not supported: {symbol.name}')
+
+        mapping = self.mapping
+        self.mapping = {formal.val: actual for formal, actual in zip(symbol.indices, indices)}
+        value = self.visit(symbol.rules[None])
+        self.mapping = mapping
+        return value
+
+    def visit_BinaryOp(self, node: ast.BinaryOp) -> Tensor:
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if isinstance(node.left.result_type, ArrayType) and isinstance(node.right.result_type, ArrayType) and \
+                node.op == ast.BinaryOp.Ops.MUL:
+            return Tensor(left.value @ right.value, ())
+
+        return combine(_AST_BINARY_OPS[node.op], left, right)
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> Tensor:
+        value = self.visit(node.expr)
+        return Tensor(np.negative(value.value), value.indices)
+
+    def visit_Function(self, node: ast.Function) -> Tensor:
+        value = self.visit(node.arg)
+        if node.name == 'inv':
+            return Tensor(np.linalg.inv(value.value), ())
+
+        return Tensor(getattr(np, node.name)(value.value), value.indices)
+
+    def visit_Sum(self, node: ast.Sum) -> Tensor:
+        name = node.name.val
+        self.check_object(node, name)
+        value = self.visit(node.expr)
+        if name not in value.indices:
+            return Tensor(value.value * self.n, value.indices)
+
+        axis = value.indices.index(name)
+        return Tensor(np.sum(value.value, axis=axis), value.indices[:axis] + value.indices[axis + 1:])
+
+    def visit_EE(self, node: ast.EE) -> Tensor:
+        row, col = node.idx_row, node.idx_col
+        n = self.n
+
+        matrix = np.ones((n + 1, n + 1))
+        matrix[:n, :n] = np.broadcast_to(align(self.visit(node.off), (row, col)), (n, n))
+        matrix[np.arange(n), np.arange(n)] = np.broadcast_to(align(self.visit(node.diag), (row,)), (n,))
+        matrix[n, n] = 0.0
+
+        b = np.empty(n + 1)
+        b[:n] = np.broadcast_to(align(self.visit(node.rhs), (row,)), (n,))
+        b[n] = self.total_charge
+
+        try:
+            return Tensor(np.linalg.solve(matrix, b)[:n], ())
+        except np.linalg.LinAlgError:
+            return Tensor(np.full(n, np.nan), ())
+
+    def visit_RegressionProgram(self, node: ast.RegressionProgram) -> Tensor:
+        terminals: Dict[int, Tensor] = {}
+        stack: List[Tensor] = []
+        for op, arg in self.program:
+            if op == 'const':
+                stack.append(Tensor(np.float64(arg), ()))
+            elif op == 'term':
+                if arg not in terminals:
+                    terminals[arg] = self.visit(node.terminals[arg])
+                stack.append(terminals[arg])
+            elif op in _BINARY_OPS:
+                x = stack.pop()
+                y = stack.pop()
+                stack.append(combine(_BINARY_OPS[op], x, y))
+            else:
+                x = stack.pop()
+                stack.append(Tensor(_UNARY_OPS[op](x.value), x.indices))
+
+        if not stack:
+            raise RuntimeError('Empty regression program')
+
+        return stack[-1]
+
+    def generic_visit(self, node: ast.ASTNode) -> None:
+        raise NotImplementedError(f'Cannot evaluate {node.__class__.__name__} with NumPy')
+
+
+class LoopDependencyChecker(ast.ASTVisitor):
+    """Reject the loop over atoms whose body reads a variable written by the other iterations
+
+    The vectorized body sees the values from before the loop where the sequential one sees those of the earlier
+    iterations. Variable indexed by the loop's atom is read by its own iteration only, a scalar has to be assigned
+    before it is read. Values read through substitutions are not followed and are rejected.
+    """
+
+    def __init__(self, loop: ast.ForEach) -> None:
+        self.index: str = loop.name.val
+        self.written: Dict[str, Set[Tuple[str, ...]]] = {}
+        self.assigned: Set[str] = set()
+        self.substitution_depth: int = 0
+        self.collect_writes(loop.body)
+
+    def collect_writes(self, statements: List[ast.Statement]) -> None:
+        for statement in statements:
+            if isinstance(statement, ast.Assign):
+                if isinstance(statement.lhs, ast.Name):
+                    self.written.setdefault(statement.lhs.val, set()).add(())
+                else:
+                    self.written.setdefault(statement.lhs.name.val, set()).add(
+                        tuple(i.val for i in statement.lhs.indices))
+            elif isinstance(statement, (ast.For, ast.ForEach)):
+                self.collect_writes(statement.body)
+
+    def reject(self, name: str) -> None:
+        raise NotImplementedError(f'Loop over atoms {self.index} reads {name} written by its other iterations')
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        self.visit(node.rhs)
+        if isinstance(node.lhs, ast.Name):
+            self.assigned.add(node.lhs.val)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        symbol = symboltable.SymbolTable.get_table_for_node(node).resolve(node.val)
+        if isinstance(symbol, symboltable.VariableSymbol) and node.val in self.written:
+            if self.substitution_depth or node.val not in self.assigned:
+                self.reject(node.val)
+        elif isinstance(symbol, symboltable.SubstitutionSymbol):
+            self.visit_substitution(symbol)
+
+    def visit_Subscript(self, node: ast.Subscript) -> None:
+        name = node.name.val
+        symbol = symboltable.SymbolTable.get_table_for_node(node).resolve(name)
+        if isinstance(symbol, symboltable.VariableSymbol) and name in self.written:
+            indices = tuple(i.val for i in node.indices)
+            if self.substitution_depth or self.written[name] != {indices} or self.index not in indices:
+                self.reject(name)
+        elif isinstance(symbol, symboltable.SubstitutionSymbol):
+            self.visit_substitution(symbol)
+
+    def visit_substitution(self, symbol: symboltable.SubstitutionSymbol) -> None:
+        self.substitution_depth += 1
+        for expr in symbol.rules.values():
+            self.visit(expr)
+        self.substitution_depth -= 1
+
+
+class VectorizedEvaluator:
+    """Compute the metrics of the individuals on the dataset without compiling them"""
+
+    def __init__(self, method: 'CCLMethod', dataset: Dataset) -> None:
+        self.dataset: Dataset = dataset
+        self.method: VectorizedMethod = VectorizedMethod(method.ast, dataset)
+        self.weights: Optional[np.ndarray] = dataset.atom_weights()
+
+    def calculate_charges(self, code: str) -> np.ndarray:
+        """Calculate charges of all the molecules of the dataset"""
+        return self.calculate_program_charges(parse_program(code))
+
+    def calculate_program_charges(self, program: List[Instruction]) -> np.ndarray:
+        """Calculate charges of all the molecules of the dataset using the already parsed program"""
+        charges = np.empty_like(self.dataset.ref_charges)
+        with np.errstate(all='ignore'):
+            for m in range(len(self.dataset)):
+                charges[self.dataset.atoms(m)] = self.method.calculate_charges(m, program)
+
+        return charges
+
+    def calculate_molecule_charges(self, program: List[Instruction], molecules: np.ndarray) -> np.ndarray:
+        """Calculate charges of the given molecules, they are concatenated in the order of the molecules"""
+        with np.errstate(all='ignore'):
+            return np.concatenate([self.method.calculate_charges(m, program) for m in molecules])
+
+    def evaluate(self, code: str) -> Tuple[float, float, float, float]:
+        """Return RMSD, R2, Dmax and Davg computed over all atoms of the dataset"""
+        return compare_charges(self.calculate_charges(code), self.dataset.ref_charges, self.weights)
+
+
+def compare_charges(charges: np.ndarray, ref_charges: np.ndarray,
+                    weights: Optional[np.ndarray] = None) -> Tuple[float, float, float, float]:
+    """Return RMSD, R2, Dmax and Davg of the charges, the atoms can be weighted"""
+    if not np.all(np.isfinite(charges)):
+        raise RuntimeError('Charges cannot be calculated')
+
+    diff = np.abs(charges - ref_charges)
+    with np.errstate(all='ignore'):
+        if weights is None:
+            r2 = np.corrcoef(charges, ref_charges)[0, 1] ** 2
+        else:
+            cov = np.cov(charges, ref_charges, aweights=weights)
+            r2 = cov[0, 1] ** 2 / (cov[0, 0] * cov[1, 1])
+
+    return float(np.sqrt(np.average(diff ** 2, weights=weights))), float(r2), float(np.max(diff)), \
+        float(np.average(diff, weights=weights))
+
+
+evaluator: Optional[VectorizedEvaluator] = None
+evaluator_key: str = ''
+racing_plan: Optional[RacingPlan] = None
+# Reference charges of the molecules of each racing subset, in the order of the plan
+racing_ref_charges: List[np.ndarray] = []
+racing_weights: List[Optional[np.ndarray]] = []
+
+
+def get_evaluator_key(method_skeleton: 'CCLMethod', dataset: Dataset, terminals: List[str]) -> str:
+    """Return the key the fitness of the programs is stored under in the persistent cache
+
+    The cache is specific to the input files only, so the weighted subset of the molecules is a part of the key.
+    """
+    args = ['numpy', *terminals]
+    if dataset.weights is not None:
+        args += ['coreset', *dataset.names, dataset.weights.astype(np.float64).tobytes().hex()]
+    return LibraryCache.make_key(method_skeleton.source, args)
+
+
+def init_vectorized(dataset: Dataset, worker_context: EvaluationContext, terminals: List[str],
+                    cache: Optional[LibraryCache] = None, plan: Optional[RacingPlan] = None) -> None:
+    """Initialize the evaluator shared across the evaluations"""
+    global evaluator, evaluator_key, racing_plan, racing_ref_charges, racing_weights
+    method_skeleton = worker_context.method_skeleton
+    method = create_program_skeleton(method_skeleton, terminals, worker_context.ccl_objects)
+    evaluator = VectorizedEvaluator(method, dataset)
+    evaluator_key = get_evaluator_key(method_skeleton, dataset, terminals)
+    evaluate_module.install_context(worker_context)
+    evaluate_module.library_cache = cache
+
+    racing_plan = plan
+    if plan is not None:
+        racing_ref_charges = [np.concatenate([dataset.ref_charges[dataset.atoms(m)] for m in plan.order[:size]])
+                              for size in plan.sizes]
+        weights = dataset.atom_weights()
+        racing_weights = [np.concatenate([weights[dataset.atoms(m)] for m in plan.order[:size]])
+                          if weights is not None else None for size in plan.sizes]
+
+
+def evaluate_vectorized(program: EncodedIndividual) -> Tuple[float, float, float, float, float]:
+    """Evaluate the individual using the NumPy interpreter of the method"""
+    _, cache, _, options, message_queue = evaluate_module.context
+    result = get_cached_result(program, cache, message_queue)
+    if result is not None:
+        return result
+
+    key = None
+    if evaluate_module.library_cache is not None:
+        key = LibraryCache.make_key(program.code, [evaluator_key])
+        result = get_stored_result(program, key, cache, options, message_queue)
+        if result is not None:
+            return result
+
+    try:
+        raw_result = evaluator.evaluate(program.code)
+    except RuntimeError:
+        message_queue.put(('Invalid', program.sympy_code, INVALID_RESULT))
+        return INVALID_RESULT
+
+    return record_result(program, raw_result, key, cache, options, message_queue)
+
+
+def race_vectorized(program: EncodedIndividual,
+                    threshold: float) -> Tuple[Tuple[float, float, float, float, float], float]:
+    """Evaluate the individual on the growing subsets while its objective value does not exceed the threshold
+
+    Returns the fitness and the fraction of the molecules it was computed on. Only the fitness computed on the whole
+    dataset is stored in the caches.
+    """
+    _, cache, _, options, message_queue = evaluate_module.context
+    result = get_cached_result(program, cache, message_queue)
+    if result is not None:
+        return result, 1.0
+
+    key = None
+    if evaluate_module.library_cache is not None:
+        key = LibraryCache.make_key(program.code, [evaluator_key])
+        result = get_stored_result(program, key, cache, options, message_queue)
+        if result is not None:
+            return result, 1.0
+
+    parsed = parse_program(program.code)
+    n = len(evaluator.dataset)
+    charges = []
+    start = 0
+    try:
+        for size, ref_charges, weights in zip(racing_plan.sizes, racing_ref_charges, racing_weights):
+            charges.append(evaluator.calculate_molecule_charges(parsed, racing_plan.order[start:size]))
+            start = size
+            raw_result = compare_charges(np.concatenate(charges), ref_charges, weights)
+            if size == n:
+                break
+
+            result = process_result(raw_result, options)
+            if not result[0] <= threshold:
+                message_queue.put(('Raced out', program.sympy_code, result))
+                return result, size / n
+    except RuntimeError:
+        # Charges that cannot be calculated for a subset cannot be calculated for the whole dataset either
+        message_queue.put(('Invalid', program.sympy_code, INVALID_RESULT))
+        return INVALID_RESULT, 1.0
+
+    return record_result(program, raw_result, key, cache, options, message_queue), 1.0
+
+
+def check_skeleton(method_skeleton: 'CCLMethod', dataset: Dataset, terminals: List[str], ccl_objects: dict) -> None:
+    """Raise an error if the skeleton uses a feature not supported by the NumPy evaluator"""
+    method = create_program_skeleton(method_skeleton, terminals, ccl_objects)
+
+    # Use all the terminals, so that every part of the skeleton is evaluated
+    code = ' '.join([f'@{i}' for i in range(len(terminals))] + ['add'] * (len(terminals) - 1)) or '1.0'
+    try:
+        with np.errstate(all='ignore'):
+            VectorizedMethod(method.ast, dataset).calculate_charges(0, parse_program(code))
+    except NotImplementedError as e:
+        raise RuntimeError(f'Skeleton cannot be evaluated by the NumPy evaluator: {e}')
+    except KeyError as e:
+        raise RuntimeError(f'Parameter {e} not found for the NumPy evaluator')
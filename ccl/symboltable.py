@@ -160,6 +160,28 @@ class SymbolTable:
         visitor.visit(node)
         return visitor.symbol_table
 
+    @classmethod
+    def check_expression(cls, node: ast.Expression) -> None:
+        """Set the types of an expression inserted into an already analyzed AST and check them
+
+        The objects bound by the enclosing loops, sums, EE expressions and substitutions can be used as indices.
+        """
+        visitor = SymbolTableBuilder()
+        visitor.current_table = cls.get_table_for_node(node)
+        parent = node.parent
+        while parent is not None:
+            if isinstance(parent, (ast.For, ast.ForEach, ast.Sum)):
+                visitor._iterating_over.add(parent.name.val)
+            if isinstance(parent, ast.ForEach) and parent.atom_indices is not None:
+                visitor._iterating_over.update(parent.atom_indices)
+            elif isinstance(parent, ast.EE):
+                visitor._iterating_over.update((parent.idx_row, parent.idx_col))
+            elif isinstance(parent, ast.Substitution) and isinstance(parent.lhs, ast.Subscript):
+                visitor._iterating_over.update(idx.val for idx in parent.lhs.indices)
+            parent = parent.parent
+
+        visitor.visit(node)
+
     @classmethod
     def get_table_for_node(cls, node: ast.ASTNode) -> 'SymbolTable':
         if isinstance(node, ast.HasSymbolTable):
@@ -15,6 +15,10 @@ def main():
     files.add_argument('--wanted-individuals', type=str, default=None, help='File with individuals to search for')
     files.add_argument('--save-best', type=str, default=None, help='File to store the best individuals')
     files.add_argument('--results', type=str, default=None, help='File to store results')
+    files.add_argument('--cache-dir', type=str, default=None,
+                       help='Directory with a persistent cache of compiled individuals and their fitness')
+    files.add_argument('--checkpoint', type=str, default=None,
+                       help='File to periodically store the state of the regression to')
 
     options = parser.add_argument_group('Regression options')
     options.add_argument('--population-size', type=int, default=500, help='Size of the initial population')
@@ -46,6 +50,87 @@ def main():
     options.add_argument('--symbol-counts', type=str, nargs='+', default=[],
                          help="Specify the occurrence limits of symbols in the expression")
     options.add_argument('--max-tree-height', type=int, default=17, help='Maximum height of the expression tree')
+    options.add_argument('--cache-size-limit', type=int, default=1024,
+                         help='Maximum size (in MiB) of the compiled libraries kept in the cache')
+    options.add_argument('--batch-compilation', action='store_true', default=False,
+                         help='Compile individuals of a generation together in a single translation unit')
+    options.add_argument('--batch-size', type=int, default=32,
+                         help='Maximum number of individuals compiled together in the batch compilation mode')
+    options.add_argument('--interpret-individuals', action='store_true', default=False,
+                         help='Compile the skeleton only once and evaluate individuals by a runtime interpreter')
+    options.add_argument('--incremental-compilation', action='store_true', default=False,
+                         help='Compile the skeleton into an object file once and compile only the expression of each '
+                              'individual')
+    options.add_argument('--evaluator', type=str, choices=['chargefw2', 'numpy'], default='chargefw2',
+                         help='Evaluate individuals by compiled methods in ChargeFW2 or by interpreting them with NumPy')
+    options.add_argument('--precompiled-header', action='store_true', default=False,
+                         help='Precompile the headers shared by all the generated methods')
+    options.add_argument('--screening-flags', type=str, default='-O1',
+                         help='Optimization flags of the first build of every individual, e.g. --screening-flags=-O0')
+    options.add_argument('--promotion-flags', type=str, default=None,
+                         help='Optimization flags of the rebuild of the individuals entering the hall of fame or '
+                              'surviving the promotion generations, e.g. --promotion-flags="-O2 -march=native"')
+    options.add_argument('--promotion-generations', type=int, default=5,
+                         help='Number of generations an individual has to survive in the population to be promoted')
+    options.add_argument('--pipeline', action='store_true', default=False,
+                         help='Overlap code generation, compilation and evaluation of different individuals')
+    options.add_argument('--codegen-workers', type=int, default=2,
+                         help='Number of processes generating the code in the pipeline mode')
+    options.add_argument('--compile-jobs', type=int, default=None,
+                         help='Maximum number of compilers running at once in the pipeline mode (default: ncpus)')
+    options.add_argument('--pipeline-queue-size', type=int, default=8,
+                         help='Maximum number of individuals waiting between the stages of the pipeline')
+    options.add_argument('--fitness-cache-size', type=int, default=10000,
+                         help='Number of fitness values kept by each worker process')
+    options.add_argument('--shared-fitness-cache-size', type=int, default=1000000,
+                         help='Number of fitness values shared by all the worker processes')
+    options.add_argument('--canonicalizer', type=str, choices=['native', 'sympy'], default='native',
+                         help='Canonical form identifying equivalent individuals, sympy is always used for the results')
+    options.add_argument('--fit-constants', action='store_true', default=False,
+                         help='Fit numeric constants of the individuals to the reference charges before evaluation')
+    options.add_argument('--constant-fitting-iterations', type=int, default=20,
+                         help='Maximum number of Levenberg-Marquardt iterations when fitting the constants')
+    options.add_argument('--islands', type=int, default=1,
+                         help='Number of sub-populations evolved by separate processes')
+    options.add_argument('--migration-interval', type=int, default=5,
+                         help='Number of generations between migrations of the best individuals among the islands')
+    options.add_argument('--migration-size', type=int, default=2,
+                         help='Number of the best individuals sent by an island in each migration')
+    options.add_argument('--migration-topology', type=str, choices=['ring', 'complete'], default='ring',
+                         help='Islands receiving the migrants: the next one in a ring or all the others')
+    options.add_argument('--checkpoint-interval', type=int, default=1,
+                         help='Number of generations between checkpoints (0 to write them only by time)')
+    options.add_argument('--checkpoint-minutes', type=float, default=None,
+                         help='Maximum number of minutes between checkpoints')
+    options.add_argument('--resume', action='store_true', default=False,
+                         help='Continue from the checkpoint if it exists')
+    options.add_argument('--racing', action='store_true', default=False,
+                         help='Evaluate individuals on growing subsets of molecules first (NumPy evaluator only)')
+    options.add_argument('--racing-fractions', type=float, nargs='+', default=[0.1, 0.3],
+                         help='Fractions of the molecules in the subsets used by the racing evaluation')
+    options.add_argument('--racing-quantile', type=float, default=0.5,
+                         help='Quantile of the population objective values an individual has to reach on a subset')
+    options.add_argument('--coreset-ratio', type=float, default=None,
+                         help='Evolve on a weighted representative subset of this fraction of the molecules, the best '
+                              'individuals are evaluated on all of them in the end (NumPy evaluator only)')
+    options.add_argument('--scheduler', type=str, choices=['cost', 'map'], default='cost',
+                         help='Submit the evaluations ordered by their estimated cost, or in the order of the population')
+    options.add_argument('--compile-timeout', type=float, default=None,
+                         help='Maximum number of seconds a single run of the compiler can take')
+    options.add_argument('--compile-memory-limit', type=int, default=None,
+                         help='Maximum address space of the compiler in MiB')
+    options.add_argument('--evaluation-timeout', type=float, default=None,
+                         help='Maximum number of seconds the evaluation of an individual (or a batch) can take, '
+                              'the worker is replaced after that')
+    options.add_argument('--evaluation-memory-limit', type=int, default=None,
+                         help='Maximum address space of an evaluation worker in MiB')
+    options.add_argument('--no-shared-dataset', action='store_false', dest='shared_dataset',
+                         help='Let every worker load its own copy of the dataset instead of sharing the one loaded once')
+    options.add_argument('--steady-state', action='store_true', default=False,
+                         help='Evaluate the offspring asynchronously and insert them one by one instead of generations')
+    options.add_argument('--steady-state-interval', type=int, default=None,
+                         help='Number of the completed offspring between the records of the steady-state evolution '
+                              '(population size by default)')
     sys_dirs = parser.add_argument_group('System directories')
     sys_dirs.add_argument('--eigen-include', type=str, default='/usr/include/eigen3',
                           help='Directory with Eigen3 include files')
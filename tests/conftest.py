@@ -1,5 +1,38 @@
+import json
 import os
 
+import numpy as np
+import pytest
+
+from ccl.regression.dataset import Dataset
+
+# Skeleton of the EEM method with the regression expression in place of the distance term
+eem_skeleton = '''\
+name EEM
+
+q = EE[i, j](B[i], {}, -A[i])
+
+where
+
+A is atom parameter
+B is atom parameter
+R is distance
+'''
+
+water = '''\
+water
+  test
+
+  3  2  0  0  0  0  0  0  0  0999 V2000
+    0.0000    0.0000    0.0000 O   0  0  0  0  0  0  0  0  0  0  0  0
+    0.9572    0.0000    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+   -0.2400    0.9266    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+  1  2  1  0
+  1  3  1  0
+M  END
+$$$$
+'''
+
 
 def pytest_generate_tests(metafunc):
     if 'method' in metafunc.fixturenames:
@@ -26,3 +59,50 @@ def pytest_generate_tests(metafunc):
                 method_src += line
 
         metafunc.parametrize('example', methods.items())
+
+
+@pytest.fixture(scope='session')
+def skeleton():
+    """Return the source of the EEM skeleton, the regression expression is the format placeholder"""
+    return eem_skeleton
+
+
+@pytest.fixture(scope='session')
+def water_sdf():
+    """Return the SDF of a single water molecule"""
+    return water
+
+
+@pytest.fixture(scope='session')
+def eem_water():
+    """Return the atom parameters of the water molecule and its charges computed by the EEM method"""
+    parameters = {'O': [3.0, 1.4], 'H': [2.0, 1.1]}
+    elements = ['O', 'H', 'H']
+    coordinates = np.array([[0.0, 0.0, 0.0], [0.9572, 0.0, 0.0], [-0.24, 0.9266, 0.0]])
+
+    distances = np.linalg.norm(coordinates[:, np.newaxis] - coordinates[np.newaxis, :], axis=-1)
+    matrix = np.ones((4, 4))
+    matrix[:3, :3] = 1 / (distances + np.eye(3))
+    matrix[range(3), range(3)] = [parameters[e][1] for e in elements]
+    matrix[3, 3] = 0
+    charges = np.linalg.solve(matrix, [-parameters[e][0] for e in elements] + [0])[:3]
+    return parameters, charges
+
+
+@pytest.fixture
+def water_dataset(tmp_path, water_sdf):
+    """Return a function loading the dataset of copies of the water molecule
+
+    Atoms have the parameters A and B given by the element, the reference charges are the same in all the copies.
+    """
+    def load(parameters, charges, names=('water',)):
+        elements = ['O', 'H', 'H']
+        (tmp_path / 'set.sdf').write_text(''.join(water_sdf.replace('water', name, 1) for name in names))
+        (tmp_path / 'ref.chg').write_text(''.join(f'{name}\n3\n' + ''.join(f'{i + 1} {e} {q}\n' for i, (e, q) in
+                                                                          enumerate(zip(elements, charges)))
+                                                  for name in names))
+        data = [{'key': [e, 'plain', '*'], 'value': v} for e, v in parameters.items()]
+        (tmp_path / 'params.json').write_text(json.dumps({'atom': {'names': ['A', 'B'], 'data': data}}))
+        return Dataset.load(str(tmp_path / 'set.sdf'), str(tmp_path / 'ref.chg'), str(tmp_path / 'params.json'))
+
+    return load
@@ -0,0 +1,59 @@
+"""Pytest batch compilation of the individuals in the regression"""
+
+import queue
+import shutil
+import subprocess
+
+import pytest
+
+import ccl.regression.batch as batch_module
+import ccl.regression.evaluate as evaluate_module
+from ccl.regression.batch import batch_member_template, evaluate_batch, get_member_suffix
+from ccl.regression.cache import FitnessCache
+from ccl.regression.evaluate import EncodedIndividual, EvaluationContext, PreparedIndividual
+from ccl.regression.options import default_options
+
+
+class Method:
+    name = 'eem'
+
+
+def test_duplicate_code(monkeypatch):
+    """Check that the individuals with the same C++ code are compiled once and share the result"""
+    prepared = []
+    monkeypatch.setattr(batch_module, 'prepare_individual', lambda ind, skeleton, cache, options, message_queue: (
+        prepared.append(ind.code) or PreparedIndividual(None, 'code' if ind.code != 'y' else 'other code', None,
+                                                        None)))
+    compiled = []
+    monkeypatch.setattr(batch_module, 'compile_batch', lambda directory, members, options, message_queue: (
+        compiled.extend(members) or [('batch.o', [idx for idx, _ in members])]))
+    monkeypatch.setattr(batch_module, 'run_compiler', lambda args, cwd, description: True)
+    monkeypatch.setattr(batch_module, 'evaluate_library', lambda ind, library, key, cache, options, message_queue: (
+        float(len(ind.code)), 0.0, 0.0, 0.0, 0.0))
+
+    cache = FitnessCache.create(10, 10)
+    try:
+        message_queue = queue.Queue()
+        monkeypatch.setattr(evaluate_module, 'context', EvaluationContext(Method(), cache, None, default_options,
+                                                                          message_queue))
+        results = evaluate_batch([EncodedIndividual('a', 'x'), EncodedIndividual('b', 'y'),
+                                  EncodedIndividual('c', 'xx')])
+
+        # Every individual is translated once, only the unique sources are compiled
+        assert prepared == ['x', 'y', 'xx']
+        assert [idx for idx, _ in compiled] == [0, 1]
+        assert [result[0] for result in results] == [1.0, 1.0, 1.0]
+        assert cache.lookup('c')[0] == results[0]
+        assert message_queue.get() == ('Cached', 'c', results[0])
+    finally:
+        cache.remove()
+
+
+@pytest.mark.skipif(shutil.which('g++') is None, reason='C++ compiler not available')
+def test_member_names():
+    """Check that the methods of the individuals compiled in one translation unit do not clash"""
+    source = '#define EXPORT(name) extern "C" name *method = new name();\nclass Eem {};\nEXPORT(Eem)\n'
+    batch = ''.join(batch_member_template.format(class_name='Eem', suffix=get_member_suffix(EncodedIndividual('', x)),
+                                                 source=source) for x in ['x', 'y'])
+    result = subprocess.run(['g++', '-fsyntax-only', '-x', 'c++', '-'], input=batch, text=True, capture_output=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,95 @@
+"""Pytest caches of the regression"""
+
+import multiprocessing
+import os
+import pickle
+
+from ccl.regression.cache import FitnessCache, LibraryCache
+
+
+def test_library_cache(tmp_path):
+    """Check storing, lookup and LRU eviction of the libraries"""
+    cache = LibraryCache(str(tmp_path / 'cache'), 150, 'digest')
+    library = tmp_path / 'libREGRESSION.so'
+    library.write_bytes(b'x' * 100)
+
+    key1 = cache.make_key('source 1', ['g++', '-O1'])
+    key2 = cache.make_key('source 2', ['g++', '-O1'])
+    assert key1 != cache.make_key('source 1', ['g++', '-O2'])
+
+    build_dir = tmp_path / 'build'
+    build_dir.mkdir()
+    assert cache.get_library(key1, str(build_dir)) is None
+    assert cache.get_fitness(key1) is None
+
+    stored = cache.store_library(key1, str(library))
+    linked = cache.get_library(key1, str(build_dir))
+    assert os.path.dirname(linked) == str(build_dir) and os.path.samefile(linked, stored)
+    cache.store_fitness(key1, (0.1, 0.9, 0.5, float('nan')))
+    rmsd, r2, dmax, davg = cache.get_fitness(key1)
+    assert (rmsd, r2, dmax) == (0.1, 0.9, 0.5) and davg != davg
+
+    # Storing another library exceeds the limit, the least recently used one is evicted, its link is still usable
+    cache.store_library(key2, str(library))
+    assert cache.get_library(key1, str(build_dir)) is None
+    assert not os.path.exists(stored)
+    assert open(linked, 'rb').read() == b'x' * 100
+    assert cache.get_library(key2, str(build_dir)) is not None
+
+    # Library removed by another process after the lookup in the index is a miss
+    os.remove(cache._library_filename(key2))
+    assert cache.get_library(key2, str(build_dir)) is None
+    assert len(os.listdir(build_dir)) == 2
+
+    # Fitness is kept even for evicted libraries but is specific to the data used
+    assert cache.get_fitness(key1) is not None
+    assert LibraryCache(cache.directory, 150, 'other digest').get_fitness(key1) is None
+
+
+def test_fitness_cache():
+    """Check the local and shared tiers of the fitness cache"""
+    cache = FitnessCache.create(2, 3)
+    try:
+        fitness = (0.1, 0.1, 0.9, 0.5, float('nan'))
+        assert cache.lookup('x') == (None, False)
+        cache['x'] = fitness
+        assert cache.lookup('x') == (fitness, True)
+
+        # Unpickled cache is the instance of the process, other processes see only the shared tier
+        assert pickle.loads(pickle.dumps(cache)) is cache
+        other = FitnessCache(cache.filename, 2, 3)
+        value, local = other.lookup('x')
+        assert not local and value[:4] == fitness[:4] and value[4] != value[4]
+        assert other.lookup('x')[1]
+
+        # Both tiers are bounded
+        for name in 'abc':
+            cache[name] = fitness
+        assert len(cache.local) == 2
+        assert FitnessCache(cache.filename, 2, 3).lookup('x') == (None, False)
+        assert FitnessCache(cache.filename, 2, 3).lookup('a')[0] is not None
+    finally:
+        cache.remove()
+
+
+def test_fitness_cache_fork():
+    """Check that a forked process opens its own connection instead of using the one of its parent"""
+    cache = FitnessCache.create(2, 3)
+    try:
+        cache['x'] = (0.1, 0.1, 0.9, 0.5, 0.1)
+        parent_connection = cache.connection
+
+        def child(q):
+            cache['y'] = (0.2, 0.2, 0.8, 0.5, 0.1)
+            q.put(cache.connection is parent_connection)
+
+        context = multiprocessing.get_context('fork')
+        q = context.Queue()
+        process = context.Process(target=child, args=(q,))
+        process.start()
+        assert q.get(timeout=30) is False
+        process.join()
+        assert process.exitcode == 0
+        assert cache.lookup('y')[0] is not None
+    finally:
+        cache.remove()
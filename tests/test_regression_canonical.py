@@ -0,0 +1,55 @@
+"""Pytest canonical form of the regression individuals"""
+
+import random
+
+import pytest
+from deap import gp
+
+from ccl.method import CCLMethod
+from ccl.regression.canonical import Canonicalizer
+from ccl.regression.init_gp import prepare_primitive_set
+from ccl.regression.options import default_options
+from ccl.symboltable import SymbolTable
+
+@pytest.fixture(scope='module')
+def primitives(skeleton):
+    expr = CCLMethod(skeleton).get_regression_expr()
+    pset, ccl_objects = prepare_primitive_set(SymbolTable.get_table_for_node(expr), expr, random.Random(1),
+                                              default_options)
+    return pset, Canonicalizer(ccl_objects)
+
+
+@pytest.mark.parametrize('first, second', [
+    ('add(R, _term_A_i)', 'add(_term_A_i, R)'),
+    ('inv(R)', 'div(1.0, R)'),
+    ('square(_term_A_i)', 'mul(_term_A_i, _term_A_i)'),
+    ('cube(R)', 'mul(square(R), R)'),
+    ('mul(2.0, add(R, 0.5))', 'add(1.0, add(R, R))'),
+    ('sub(_term_A_i, add(R, _term_A_i))', 'sub(0.5, add(R, 0.5))'),
+    ('mul(add(R, _term_A_i), add(_term_A_i, R))', 'square(add(R, _term_A_i))'),
+    ('div(add(R, _term_B_j), add(mul(2.0, R), mul(2.0, _term_B_j)))', '0.5'),
+    ('mul(exp(R), exp(_term_A_i))', 'exp(add(_term_A_i, R))'),
+    ('sqrt(square(R))', 'R'),
+])
+def test_equivalent(primitives, first, second):
+    pset, canonicalizer = primitives
+    assert canonicalizer.code(gp.PrimitiveTree.from_string(first, pset)) == \
+        canonicalizer.code(gp.PrimitiveTree.from_string(second, pset))
+
+
+@pytest.mark.parametrize('first, second', [
+    ('sub(R, _term_A_i)', 'sub(_term_A_i, R)'),
+    ('sqrt(square(_term_A_i))', '_term_A_i'),
+    ('cbrt(cube(_term_A_i))', '_term_A_i'),
+    ('add(_term_A_i, _term_A_j)', 'mul(2.0, _term_A_i)'),
+])
+def test_different(primitives, first, second):
+    pset, canonicalizer = primitives
+    assert canonicalizer.code(gp.PrimitiveTree.from_string(first, pset)) != \
+        canonicalizer.code(gp.PrimitiveTree.from_string(second, pset))
+
+
+@pytest.mark.parametrize('individual', ['inv(sub(R, R))', 'sqrt(sub(0.5, 1.0))', 'div(R, sub(0.5, 0.5))'])
+def test_non_real(primitives, individual):
+    pset, canonicalizer = primitives
+    assert canonicalizer.code(gp.PrimitiveTree.from_string(individual, pset)).startswith('<non-real>')
@@ -0,0 +1,74 @@
+"""Pytest checkpoints of the regression"""
+
+import random
+
+import pytest
+from deap import base, tools
+
+from ccl.regression.checkpoint import CHECKPOINT_VERSION, Checkpoint, CheckpointWriter, load_checkpoint, \
+    restore_hall_of_fame
+
+
+class FitnessMin(base.Fitness):
+    weights = (-1.0,)
+
+
+class Individual(list):
+    def __init__(self, sympy_code: str, value: float) -> None:
+        super().__init__(sympy_code)
+        self.sympy_code = sympy_code
+        self.fitness = FitnessMin((value,))
+
+
+def create_checkpoint(gen: int, source: str = 'skeleton') -> Checkpoint:
+    pop = [Individual('a', 2.0), Individual('b', 1.0), Individual('c', 3.0)]
+    logbook = tools.Logbook()
+    logbook.record(gen=gen, RMSD={'min': 1.0})
+    rng = random.Random(42)
+    return Checkpoint(CHECKPOINT_VERSION, source, gen, pop, pop[:2], logbook, rng.getstate(), rng.getstate(),
+                      {'a': 0, 'x': None}, {'#': [1.0]}, [('a', (2.0, 2.0, 1.0, 2.0, 2.0))])
+
+
+def test_write_and_load(tmp_path):
+    filename = str(tmp_path / 'checkpoint')
+    writer = CheckpointWriter(filename, 2, None)
+    for gen in range(5):
+        if writer.due(gen):
+            writer.write(create_checkpoint(gen))
+    writer.wait()
+
+    assert writer.written == 3
+    assert [path.name for path in tmp_path.iterdir()] == ['checkpoint']
+
+    checkpoint = load_checkpoint(filename, 'skeleton')
+    assert checkpoint.gen == 4
+    assert [ind.sympy_code for ind in checkpoint.population] == ['a', 'b', 'c']
+    assert checkpoint.population[2].fitness.values == (3.0,)
+    assert checkpoint.logbook.chapters['RMSD'].select('min') == [1.0]
+    rng = random.Random()
+    rng.setstate(checkpoint.rng_state)
+    assert rng.random() == random.Random(42).random()
+
+    with pytest.raises(RuntimeError):
+        load_checkpoint(filename, 'other skeleton')
+
+
+def test_due_by_time():
+    writer = CheckpointWriter('unused', None, 1.0)
+    assert not writer.due(1)
+    writer.last_time -= 61
+    assert writer.due(1)
+
+
+def test_restore_hall_of_fame():
+    pop = [Individual('a', 2.0), Individual('b', 1.0), Individual('c', 3.0)]
+    hof = tools.HallOfFame(2, similar=lambda x, y: x.sympy_code == y.sympy_code)
+    hof.update(pop)
+
+    restored = tools.HallOfFame(2, similar=lambda x, y: x.sympy_code == y.sympy_code)
+    restore_hall_of_fame(restored, list(hof))
+    assert [ind.sympy_code for ind in restored] == ['b', 'a']
+
+    hof.update([Individual('d', 1.5)])
+    restored.update([Individual('d', 1.5)])
+    assert [ind.sympy_code for ind in restored] == [ind.sympy_code for ind in hof] == ['b', 'd']
@@ -0,0 +1,60 @@
+"""Pytest fitting of the constants of the regression individuals"""
+
+import random
+
+import numpy as np
+from deap import gp
+
+from ccl.method import CCLMethod
+from ccl.regression.constant_fitting import levenberg_marquardt, round_constant, set_allowed_constants, set_constants, \
+    structure_key
+from ccl.regression.init_gp import prepare_primitive_set
+from ccl.regression.options import default_options
+from ccl.symboltable import SymbolTable
+
+def test_levenberg_marquardt():
+    """Check that the parameters of an exponential are recovered"""
+    t = np.linspace(0.0, 2.0, 20)
+    y = 1.5 * np.exp(-0.7 * t)
+
+    fitted = levenberg_marquardt(lambda x: x[0] * np.exp(x[1] * t) - y, np.array([1.0, 0.0]), 50)
+    assert np.allclose(fitted, [1.5, -0.7], atol=1e-4)
+
+    # Optimum cannot be improved
+    assert levenberg_marquardt(lambda x: x[0] * np.exp(x[1] * t) - y, np.array([1.5, -0.7]), 50) is None
+
+
+def test_round_constant():
+    assert round_constant(0.123456789) == 0.123457
+    assert round_constant(-0.0) == 0.0
+    assert round_constant(0.00001234) == 0.0
+    assert round_constant(1.5e20) is None
+
+
+def test_set_constants(skeleton):
+    """Check that fitted constants are written back and the structure is kept"""
+    expr = CCLMethod(skeleton).get_regression_expr()
+    pset, _ = prepare_primitive_set(SymbolTable.get_table_for_node(expr), expr, random.Random(1), default_options)
+    individual = gp.PrimitiveTree.from_string('add(mul(0.5, inv(R)), 2.0)', pset)
+    key = structure_key(individual)
+
+    # Values are in the order of the interpreter program, i.e. reversed
+    assert set_constants(individual, [-1.25, 0.75])
+    assert str(individual) == 'add(mul(0.75, inv(R)), -1.25)'
+    assert structure_key(individual) == key
+    assert not set_constants(individual, [-1.25, 0.75])
+    assert str(gp.PrimitiveTree.from_string(str(individual), pset)) == str(individual)
+
+
+def test_set_allowed_constants(skeleton):
+    """Check that the fitted constants exceeding the maximal allowed one are not written back"""
+    expr = CCLMethod(skeleton).get_regression_expr()
+    pset, ccl_objects = prepare_primitive_set(SymbolTable.get_table_for_node(expr), expr, random.Random(1),
+                                              default_options)
+    options = dict(default_options, max_constant_allowed=1.0)
+    individual = gp.PrimitiveTree.from_string('add(mul(0.5, inv(R)), 0.25)', pset)
+
+    assert not set_allowed_constants(individual, [-1.25, 0.75], ccl_objects, options)
+    assert str(individual) == 'add(mul(0.5, inv(R)), 0.25)'
+    assert set_allowed_constants(individual, [-0.5, 0.75], ccl_objects, options)
+    assert str(individual) == 'add(mul(0.75, inv(R)), -0.5)'
@@ -0,0 +1,60 @@
+"""Pytest coreset of the regression"""
+
+import numpy as np
+
+from ccl.regression.coreset import allocate, get_correlation, get_strata, select_coreset
+from ccl.regression.dataset import Dataset
+from ccl.regression.vectorized import compare_charges
+
+
+def create_dataset(molecules):
+    """Create dataset from the lists of elements and reference charges of the molecules"""
+    elements = [e for mol_elements, _ in molecules for e in mol_elements]
+    n_atoms = len(elements)
+    atom_offsets = np.concatenate([[0], np.cumsum([len(mol_elements) for mol_elements, _ in molecules])])
+    ref_charges = np.concatenate([charges for _, charges in molecules]).astype(np.float64)
+    return Dataset([f'm{i}' for i in range(len(molecules))], elements, np.arange(3 * n_atoms).reshape(-1, 3),
+                   atom_offsets, np.empty((0, 3), dtype=np.int64), np.zeros(len(molecules) + 1, dtype=np.int64),
+                   np.zeros(len(molecules)), ref_charges, np.arange(n_atoms).reshape(-1, 1), ['A'], {})
+
+
+def test_allocate():
+    assert allocate([10, 1, 5], 2) == [1, 0, 1]
+    assert allocate([10, 1, 5], 6) == [3, 1, 2]
+    assert allocate([2, 1], 10) == [2, 1]
+
+
+def test_select_coreset():
+    """Check that every stratum is represented and the weights sum up to the size of the dataset"""
+    molecules = [(['O', 'H', 'H'], [-0.8 - 0.01 * i, 0.4, 0.4]) for i in range(30)]
+    molecules += [(['C', 'H', 'H', 'H', 'H'], [-0.4, 0.1, 0.1, 0.1, 0.1]) for _ in range(10)]
+    dataset = create_dataset(molecules)
+
+    assert len(get_strata(dataset)) >= 2
+    selected, weights = select_coreset(dataset, 0.1)
+    assert len(selected) == 4
+    assert any(m >= 30 for m in selected)
+    assert np.isclose(weights.sum(), len(dataset))
+
+    subset = dataset.subset(selected, weights)
+    assert subset.names == [f'm{m}' for m in selected]
+    assert np.array_equal(subset.ref_charges, np.concatenate([dataset.ref_charges[dataset.atoms(m)]
+                                                              for m in selected]))
+    assert np.array_equal(subset.atom_parameters[:, 0],
+                          np.concatenate([np.arange(dataset.atom_offsets[m], dataset.atom_offsets[m + 1])
+                                          for m in selected]))
+    assert len(subset.atom_weights()) == len(subset.ref_charges)
+
+
+def test_weighted_metrics():
+    """Weight of an atom has to be equivalent to its repetition"""
+    charges = np.array([0.1, -0.3, 0.5])
+    ref_charges = np.array([0.2, -0.2, 0.3])
+    weighted = compare_charges(charges, ref_charges, np.array([1.0, 2.0, 1.0]))
+    repeated = compare_charges(charges[[0, 1, 1, 2]], ref_charges[[0, 1, 1, 2]])
+    assert np.allclose(weighted, repeated)
+
+
+def test_correlation():
+    assert get_correlation([1.0, 2.0, float('inf'), 3.0], [2.0, 4.0, 1.0, 6.0]) == 1.0
+    assert get_correlation([1.0], [1.0]) is None
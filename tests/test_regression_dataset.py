@@ -0,0 +1,48 @@
+"""Pytest dataset of the regression shared by the worker processes"""
+
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from ccl.regression.dataset import Dataset
+
+
+def test_shared_dataset():
+    """Check that the pickled shared dataset maps the same arrays instead of carrying them"""
+    n_atoms = 10000
+    dataset = Dataset(['a', 'b'], ['H'] * n_atoms, np.random.default_rng(0).random((n_atoms, 3)),
+                      np.array([0, 4000, n_atoms]), np.empty((0, 3), dtype=np.int64), np.zeros(3, dtype=np.int64),
+                      np.zeros(2), np.linspace(-1.0, 1.0, n_atoms), np.ones((n_atoms, 2)), ['A', 'B'], {},
+                      np.array([1.0, 2.0]))
+    coordinates = dataset.coordinates.copy()
+
+    dataset.share()
+    try:
+        data = pickle.dumps(dataset)
+        assert len(data) < coordinates.nbytes // 10
+
+        copy = pickle.loads(data)
+        assert np.array_equal(copy.coordinates, coordinates)
+        assert np.array_equal(copy.atom_weights(), np.repeat([1.0, 2.0], [4000, 6000]))
+        assert copy.bonds.shape == (0, 3)
+        assert list(copy.elements[:2]) == ['H', 'H']
+        assert not copy.ref_charges.flags.writeable
+        assert len(copy.subset([1])) == 1
+    finally:
+        dataset.release()
+
+    assert not os.path.exists(dataset.shared.filename)
+
+
+def test_element_property():
+    """Check that the property of every atom is taken from the table and unknown elements are reported"""
+    def create(elements):
+        n = len(elements)
+        return Dataset(['a'], elements, np.zeros((n, 3)), np.array([0, n]), np.empty((0, 3), dtype=np.int64),
+                       np.zeros(2, dtype=np.int64), np.zeros(1), np.zeros(n), np.ones((n, 0)), [], {})
+
+    assert np.array_equal(create(['O', 'H', 'H']).element_property('atomic number'), [8, 1, 1])
+    with pytest.raises(RuntimeError, match='electronegativity is not known for Xx'):
+        create(['O', 'Xx']).element_property('electronegativity')
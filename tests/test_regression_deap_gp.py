@@ -0,0 +1,44 @@
+"""Pytest genetic operators of the regression"""
+
+import copy
+
+from deap import base
+
+from ccl.regression.deap_gp import var_and
+
+
+class FitnessMin(base.Fitness):
+    weights = (-1.0,)
+
+
+class Individual(list):
+    def __init__(self, nodes: str, value: float) -> None:
+        super().__init__(nodes)
+        self.sympy_code = nodes
+        self.fitness = FitnessMin((value,))
+        self.fidelity = 1.0
+
+
+def test_var_and():
+    """Check that the individuals left unchanged by the operators or replaced by a parent keep the fitness"""
+    def mate(ind1, ind2):
+        # Mimic the limit replacing the offspring by a copy of the other parent
+        return ind1, copy.deepcopy(ind1)
+
+    def mutate(ind):
+        if ind.sympy_code == 'c':
+            ind[:] = 'cc'
+        return ind,
+
+    toolbox = base.Toolbox()
+    toolbox.register('clone', copy.deepcopy)
+    toolbox.register('mate', mate)
+    toolbox.register('mutate', mutate)
+
+    pop = [Individual('a', 1.0), Individual('b', 2.0), Individual('c', 3.0)]
+    offspring, unchanged = var_and(pop, toolbox, 1.0, 1.0)
+
+    assert unchanged == 2
+    assert [ind.fitness.values for ind in offspring] == [(1.0,), (1.0,), ()]
+    assert [ind.sympy_code for ind in offspring[:2]] == ['a', 'a']
+    assert [ind.fitness.values for ind in pop] == [(1.0,), (2.0,), (3.0,)]
@@ -0,0 +1,110 @@
+"""Pytest evaluation of the population in the regression"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import random
+
+import pytest
+from deap import base, gp
+
+import ccl.regression.evaluate as evaluate_module
+from ccl.method import CCLMethod
+from ccl.regression.cache import FitnessCache
+from ccl.regression.evaluate import EvaluationContext, evaluate_population, install_context, select_unique, \
+    temporary_library
+from ccl.regression.generators import generate_optimized_ccl_code, read_optimized_ccl
+from ccl.regression.init_gp import prepare_primitive_set
+from ccl.regression.options import default_options
+from ccl.symboltable import SymbolTable
+
+class FitnessMin(base.Fitness):
+    weights = (-1.0,)
+
+
+class Individual:
+    def __init__(self, sympy_code: str, value: float = None) -> None:
+        self.sympy_code = sympy_code
+        self.fitness = FitnessMin((value,) if value is not None else ())
+        self.fidelity = 1.0
+
+
+def test_evaluate_unique_codes():
+    """Check that each unknown code is sent to the workers once and its fitness is shared by all the duplicates"""
+    sent = []
+    toolbox = base.Toolbox()
+    toolbox.register('encode', lambda ind: ind.sympy_code)
+    toolbox.register('evaluate', lambda code: (float(len(code)),))
+    toolbox.register('map', lambda f, xs: [f(x) for x in sent.extend(xs) or xs])
+
+    parents = [Individual('x', 0.5)]
+    pop = [Individual('ab'), Individual('x'), Individual('ab'), Individual('abc')]
+    assert list(select_unique(pop, parents)) == ['ab', 'abc']
+
+    evaluate_population(pop, toolbox, evaluated=parents)
+    assert sent == ['ab', 'abc']
+    assert [ind.fitness.values for ind in pop] == [(2.0,), (0.5,), (2.0,), (3.0,)]
+
+
+def test_inline_header():
+    """Check that the method translated for the standard input of the compiler does not include its own header"""
+    with open('examples/eem.ccl') as f:
+        cpp_code = CCLMethod(f.read()).translate('cpp', inline_header=True, format_code=False)
+
+    assert '#include "ccl_method.h"' not in cpp_code
+    assert cpp_code.index('class Eem') < cpp_code.index('CHARGEFW2_METHOD(Eem)')
+
+
+def test_temporary_library(tmp_path, monkeypatch):
+    """Check that the library file is removed even if the compilation fails"""
+    monkeypatch.setattr(evaluate_module, 'build_directory', str(tmp_path))
+    with pytest.raises(RuntimeError):
+        with temporary_library() as library:
+            assert os.path.dirname(library) == str(tmp_path)
+            raise RuntimeError
+
+    assert not os.listdir(tmp_path)
+
+
+def test_substitute_regression_expr(skeleton):
+    """Check that the individual spliced into the skeleton is translated the same as the parsed one"""
+    method = CCLMethod(skeleton)
+    expr = method.get_regression_expr()
+    options = dict(default_options, use_math_functions=True, allow_random_constants=True)
+    pset, ccl_objects = prepare_primitive_set(SymbolTable.get_table_for_node(expr), expr, random.Random(1), options)
+
+    random.seed(1)
+    codes = [generate_optimized_ccl_code(gp.PrimitiveTree(gp.genHalfAndHalf(pset, 1, 5)), ccl_objects)
+             for _ in range(20)]
+    for code in [*codes, '-R[i, j] ^ 2 * -A[i]', '2 ^ 3 ^ -B[j] - 1 - -1.5', '+(1 / B[i] + 1.0 / B[j])']:
+        node = read_optimized_ccl(code)
+        assert node is not None, code
+        parsed = CCLMethod(skeleton.format(f'({code})'))
+        spliced = method.substitute_regression_expr(node, code)
+        assert spliced.source == parsed.source
+        assert spliced.translate('cpp', format_code=False) == parsed.translate('cpp', format_code=False)
+
+    assert method.get_regression_expr() is expr
+
+
+@pytest.mark.parametrize('code', ['R[i, j] -1', '1e-05 * R[i, j]', 'sum[j](A[j])', '(A[i]', 'A[i, j, k]', 'A[i] @ 2'])
+def test_read_unparsable_code(code):
+    """Check that the code not generated for an individual is left to the parser"""
+    assert read_optimized_ccl(code) is None
+
+
+def get_cache_pid():
+    return os.getpid(), evaluate_module.context.cache.pid
+
+
+def test_install_context():
+    """Check that the forked worker uses its own fitness cache instead of the inherited one of the main process"""
+    cache = FitnessCache.create(2, 3)
+    try:
+        context = EvaluationContext(None, cache, None, default_options, None)
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('fork'),
+                                                    initializer=install_context, initargs=(context,)) as executor:
+            pid, cache_pid = executor.submit(get_cache_pid).result()
+        assert pid == cache_pid != os.getpid()
+    finally:
+        cache.remove()
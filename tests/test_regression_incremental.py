@@ -0,0 +1,49 @@
+"""Pytest incremental compilation of the individuals in the regression"""
+
+import random
+import shutil
+import subprocess
+
+import pytest
+from deap import gp
+
+from ccl.method import CCLMethod
+from ccl.regression.incremental import EXPRESSION_FUNCTION, generate_expression, get_expression_source
+from ccl.regression.init_gp import prepare_primitive_set
+from ccl.regression.interpreter import create_program_skeleton, get_program_terminals
+from ccl.regression.options import default_options
+from ccl.symboltable import SymbolTable
+
+def prepare(skeleton: str, options: dict):
+    method = CCLMethod(skeleton)
+    expr = method.get_regression_expr()
+    pset, ccl_objects = prepare_primitive_set(SymbolTable.get_table_for_node(expr), expr, random.Random(1), options)
+    return method, pset, ccl_objects
+
+
+def test_skeleton_calls_function(skeleton):
+    """Check that the skeleton declares the expression function and calls it with all the terminals"""
+    method, pset, ccl_objects = prepare(skeleton, default_options)
+    terminals = get_program_terminals(pset)
+    program = create_program_skeleton(method, terminals, ccl_objects)
+    cpp_code = program.translate('cpp', format_code=False, regression_function=EXPRESSION_FUNCTION)
+
+    args = ', '.join(['double'] * len(terminals))
+    assert cpp_code.count(f'extern "C" double {EXPRESSION_FUNCTION}({args});') == 1
+    assert f'{EXPRESSION_FUNCTION}(' in cpp_code.split('extern "C"', 1)[1]
+    assert 'ccl_regression.h' not in cpp_code
+
+
+@pytest.mark.skipif(shutil.which('g++') is None, reason='C++ compiler not available')
+def test_expression_source(skeleton):
+    """Check that the expression of the individuals compiles"""
+    _, pset, _ = prepare(skeleton, dict(default_options, use_math_functions=True, allow_random_constants=True))
+    terminals = get_program_terminals(pset)
+
+    random.seed(1)
+    for _ in range(20):
+        code = generate_expression(gp.PrimitiveTree(gp.genHalfAndHalf(pset, 1, 5)), terminals)
+        source = get_expression_source(code, len(terminals))
+        result = subprocess.run(['g++', '-fsyntax-only', '-x', 'c++', '-'], input=source,
+                                text=True, capture_output=True)
+        assert result.returncode == 0, result.stderr
@@ -0,0 +1,34 @@
+"""Pytest runtime interpreter of the expressions in the regression"""
+
+import ctypes
+import shutil
+import subprocess
+
+import pytest
+
+from ccl.generators.cpp.cpp import regression_template
+
+driver = '''
+extern "C" double run(double a, double b) {
+    ccl_regression::load_program();
+    return ccl_regression::evaluate({a, b});
+}
+'''
+
+
+@pytest.mark.skipif(shutil.which('g++') is None, reason='C++ compiler not available')
+def test_set_program(tmp_path):
+    """Check that the program set through the exported setter is interpreted"""
+    library = str(tmp_path / 'libinterpreter.so')
+    subprocess.run(['g++', '-std=c++17', '-O1', '-fPIC', '-shared', '-o', library, '-x', 'c++', '-'],
+                   input=regression_template + driver, text=True, check=True)
+
+    lib = ctypes.CDLL(library)
+    lib.ccl_regression_set_program.argtypes = [ctypes.c_char_p]
+    lib.run.argtypes = [ctypes.c_double, ctypes.c_double]
+    lib.run.restype = ctypes.c_double
+
+    lib.ccl_regression_set_program(b'@0 @1 add')
+    assert lib.run(1.0, 2.0) == 3.0
+    lib.ccl_regression_set_program(b'@1 @0 1.5 mul div')
+    assert lib.run(2.0, 6.0) == 0.5
@@ -0,0 +1,77 @@
+"""Pytest island model of the regression"""
+
+import copy
+import queue
+import random
+
+from deap import base, tools
+
+from ccl.regression.deap_gp import var_and
+from ccl.regression.islands import get_neighbours, merge_logbooks, migrate, seed_island
+
+
+class FitnessMin(base.Fitness):
+    weights = (-1.0,)
+
+
+class Individual(list):
+    def __init__(self, sympy_code: str, value: float) -> None:
+        super().__init__(sympy_code)
+        self.sympy_code = sympy_code
+        self.fitness = FitnessMin((value,))
+        self.fidelity = 1.0
+
+
+def test_neighbours():
+    assert get_neighbours(2, 3, 'ring') == [0]
+    assert get_neighbours(1, 3, 'complete') == [0, 2]
+    assert get_neighbours(0, 1, 'complete') == []
+
+
+def test_migrate():
+    """Check that the best individuals are sent and the worst ones are replaced by new immigrants"""
+    options = {'migration_interval': 2, 'migration_size': 1, 'migration_topology': 'ring'}
+    inboxes = [queue.Queue(), queue.Queue()]
+    pop = [Individual('a', 1.0), Individual('b', 3.0), Individual('c', 2.0)]
+    inboxes[0].put([Individual('a', 1.0), Individual('x', 0.5)])
+
+    migrate(pop, 1, 0, inboxes, options)
+    assert inboxes[1].empty()
+
+    migrate(pop, 2, 0, inboxes, options)
+    assert [ind.sympy_code for ind in inboxes[1].get_nowait()] == ['a']
+    assert [ind.sympy_code for ind in pop] == ['a', 'x', 'c']
+
+
+def test_merge_logbooks():
+    logbooks = []
+    for island in range(2):
+        logbook = tools.Logbook()
+        for gen in range(2):
+            logbook.record(gen=gen, evals=10, RMSD={'min': island + gen}, best=f'{island}')
+        logbooks.append(logbook)
+
+    merged = merge_logbooks(logbooks)
+    assert merged.select('gen', 'island') == ([0, 0, 1, 1], [0, 1, 0, 1])
+    assert merged.chapters['RMSD'].select('min') == [0, 1, 1, 2]
+
+
+def test_seed_island():
+    """Check that the islands forked with the same generators vary different individuals"""
+    def mutate(ind):
+        ind.append('m')
+        return ind,
+
+    rng = random.Random()
+    toolbox = base.Toolbox()
+    toolbox.register('clone', copy.deepcopy)
+    toolbox.register('mutate', mutate)
+    pop = [Individual(f'{k}', 1.0) for k in range(20)]
+
+    def vary(index: int, seed) -> list:
+        seed_island(index, rng, {'seed': seed})
+        return [''.join(ind) for ind in var_and(pop, toolbox, 0.0, 0.5)[0]]
+
+    assert vary(0, 1) != vary(1, 1)
+    assert vary(0, None) != vary(1, None)
+    assert vary(0, 1) == vary(0, 1)
@@ -0,0 +1,37 @@
+"""Pytest time limits of the evaluation tasks in the regression"""
+
+import queue
+import time
+
+from ccl.regression.evaluate import INVALID_RESULT, EncodedIndividual
+from ccl.regression.limits import LimitMonitor, RestartableExecutor, TaskLimits
+from ccl.regression.scheduling import CostScheduler
+
+
+def init_worker() -> None:
+    pass
+
+
+def evaluate(ind: EncodedIndividual) -> int:
+    time.sleep(60 if ind.sympy_code == 'slow' else 0.01)
+    return len(ind.code)
+
+
+def test_timeout(tmp_path):
+    """Check that the task over the time limit is rejected and the others are evaluated by the restarted pool"""
+    limits = TaskLimits(0.5, None, str(tmp_path))
+    cache = {}
+    message_queue = queue.Queue()
+    executor = RestartableExecutor(2, limits, init_worker, ())
+    scheduler = CostScheduler(executor, 2, LimitMonitor(limits, cache, message_queue))
+
+    tasks = [EncodedIndividual(code, 'x' * size) for code, size in [('a', 1), ('slow', 9), ('b', 2), ('c', 3)]]
+    try:
+        assert scheduler.map(evaluate, tasks) == [1, None, 2, 3]
+        assert scheduler.map(evaluate, tasks[:1]) == [1]
+    finally:
+        executor.shutdown()
+
+    assert cache == {'slow': INVALID_RESULT}
+    assert message_queue.get_nowait() == ('Timeout', 'slow', INVALID_RESULT)
+    assert not list(tmp_path.iterdir())
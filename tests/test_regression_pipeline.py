@@ -0,0 +1,44 @@
+"""Pytest pipeline of the code generation, compilation and evaluation in the regression"""
+
+import concurrent.futures
+import os
+import queue
+
+import ccl.regression.evaluate as evaluate_module
+import ccl.regression.pipeline as pipeline_module
+from ccl.regression.cache import LibraryCache
+from ccl.regression.evaluate import EncodedIndividual, EvaluationContext, PreparedIndividual
+from ccl.regression.options import default_options
+from ccl.regression.pipeline import Pipeline
+
+
+def test_pipeline_stores_libraries(tmp_path, monkeypatch):
+    """Check that the libraries compiled in a pipelined generation end up in the persistent cache"""
+    library_cache = LibraryCache(str(tmp_path / 'cache'), 1024, 'digest')
+    build_dir = tmp_path / 'build'
+    build_dir.mkdir()
+    monkeypatch.setattr(evaluate_module, 'build_directory', str(build_dir))
+    monkeypatch.setattr(pipeline_module, 'prepare', lambda ind: PreparedIndividual(
+        None, ind.code, library_cache.make_key(ind.code, ['g++']), None))
+    # The compiler only writes its input into the library
+    monkeypatch.setattr(pipeline_module, 'get_compiler_args', lambda options, library, sources: [
+        'sh', '-c', 'cat > "$0"', library])
+    monkeypatch.setattr(pipeline_module, 'evaluate_prepared', lambda ind, library, key: (
+        float(len(open(library).read())), 0.0, 0.0, 0.0, 0.0))
+
+    options = dict(default_options, ncpus=1, compile_jobs=1, codegen_workers=1)
+    context = EvaluationContext(None, None, None, options, queue.Queue())
+    with concurrent.futures.ThreadPoolExecutor(1) as evaluation_pool:
+        pipeline = Pipeline(context, evaluation_pool, library_cache)
+        pipeline.codegen_pool.shutdown()
+        pipeline.codegen_pool = concurrent.futures.ThreadPoolExecutor(1)
+        try:
+            results = pipeline.evaluate([EncodedIndividual('a', 'x'), EncodedIndividual('b', 'xyz')])
+        finally:
+            pipeline.shutdown()
+
+    assert [result[0] for result in results] == [1.0, 3.0]
+    for code in ['x', 'xyz']:
+        library = library_cache.get_library(library_cache.make_key(code, ['g++']), str(tmp_path))
+        assert library is not None and open(library).read() == code
+    assert not os.listdir(build_dir)
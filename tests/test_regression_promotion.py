@@ -0,0 +1,58 @@
+"""Pytest promotion of the individuals to the optimized build in the regression"""
+
+import concurrent.futures
+import math
+import queue
+
+from deap import base, tools
+
+import ccl.regression.promotion as promotion_module
+from ccl.regression.evaluate import EncodedIndividual, get_compile_flags
+from ccl.regression.options import default_options
+from ccl.regression.promotion import Promoter
+
+
+class FitnessMin(base.Fitness):
+    weights = (-1.0,)
+
+
+class Individual:
+    def __init__(self, sympy_code: str, value: float) -> None:
+        self.sympy_code = sympy_code
+        self.fitness = FitnessMin((value,))
+
+
+def test_compile_flags():
+    options = dict(default_options, screening_flags='-O0', promotion_flags='-O2 -march=native')
+    assert get_compile_flags(options)[:2] == ['-O0', '-fPIC']
+    assert get_compile_flags(options, promoted=True)[:3] == ['-O2', '-march=native', '-fPIC']
+
+
+def test_promote(monkeypatch):
+    """Check that the hall of fame and the surviving individuals are rebuilt only once"""
+    rebuilt = []
+
+    def rebuild(individual):
+        rebuilt.append(individual.sympy_code)
+        return 1.5
+
+    monkeypatch.setattr(promotion_module, 'rebuild_individual', rebuild)
+    q = queue.Queue()
+    hof = tools.HallOfFame(1)
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        promoter = Promoter(executor, lambda ind: EncodedIndividual(ind.sympy_code, ind.sympy_code),
+                            dict(default_options, promotion_generations=1), q)
+        pop = [Individual('a', 1.0), Individual('b', 2.0), Individual('c', math.inf)]
+        hof.update(pop)
+        promoter.promote(pop, hof)
+        assert rebuilt == ['a']
+
+        pop = [pop[1], pop[2], Individual('d', 3.0)]
+        promoter.promote(pop, hof)
+        assert rebuilt == ['a', 'b']
+
+        promoter.promote(pop, hof)
+        assert rebuilt == ['a', 'b', 'd']
+
+    assert q.get() == ('stat', 'Objective difference (promoted)', 0.5)
+    assert promoter.summary() == ['Promoted: 3', 'Failed  : 0']
@@ -0,0 +1,85 @@
+"""Pytest racing evaluation of the regression"""
+
+import math
+import queue
+
+import numpy as np
+from deap import base
+
+import ccl.regression.vectorized as vectorized
+from ccl.method import CCLMethod
+from ccl.regression.cache import FitnessCache
+from ccl.regression.dataset import Dataset
+from ccl.regression.evaluate import EncodedIndividual, EvaluationContext
+from ccl.regression.options import default_options
+from ccl.regression.racing import create_racing_plan, get_racing_threshold, stratified_order
+
+
+class FitnessMin(base.Fitness):
+    weights = (-1.0,)
+
+
+class Individual:
+    def __init__(self, value: float, fidelity: float = 1.0) -> None:
+        self.fitness = FitnessMin((value,))
+        self.fidelity = fidelity
+
+
+def create_dataset(atom_counts):
+    n = len(atom_counts)
+    atom_offsets = np.concatenate([[0], np.cumsum(atom_counts)])
+    return Dataset([f'm{i}' for i in range(n)], ['H'] * atom_offsets[-1], np.zeros((atom_offsets[-1], 3)),
+                   atom_offsets, np.empty((0, 3)), np.zeros(n + 1, dtype=np.int64), np.zeros(n),
+                   np.zeros(atom_offsets[-1]), np.zeros((atom_offsets[-1], 0)), [], {})
+
+
+def test_stratified_order():
+    """Check that every prefix of the order contains both small and large molecules"""
+    atom_counts = [3] * 50 + [30] * 50
+    order = stratified_order(create_dataset(atom_counts), 1)
+    assert sorted(order) == list(range(100))
+    for size in (10, 20, 50):
+        large = sum(atom_counts[m] == 30 for m in order[:size])
+        assert large == size // 2
+
+    assert list(order) == list(stratified_order(create_dataset(atom_counts), 1))
+
+
+def test_racing_plan():
+    dataset = create_dataset([3] * 20)
+    assert create_racing_plan(dataset, (0.3, 0.1, 1.0), None).sizes == [2, 6, 20]
+    assert create_racing_plan(create_dataset([3]), (0.1, 0.3), None).sizes == [1]
+
+
+def test_racing_threshold():
+    options = {**default_options, 'racing': True, 'racing_quantile': 0.5}
+    pop = [Individual(1.0), Individual(2.0), Individual(3.0), Individual(0.1, fidelity=0.1), Individual(math.inf)]
+    assert get_racing_threshold(pop, options) == 2.0
+    assert get_racing_threshold(pop, {**options, 'racing': False}) == math.inf
+    assert get_racing_threshold([Individual(0.1, fidelity=0.5)], options) == math.inf
+
+
+def test_race_vectorized(skeleton, eem_water, water_dataset):
+    """Check that a bad individual is stopped on the smallest subset and a good one is evaluated on all molecules"""
+    parameters, charges = eem_water
+    dataset = water_dataset(parameters, charges, [f'water{k}' for k in range(10)])
+
+    cache = FitnessCache.create(10, 100)
+    message_queue = queue.Queue()
+    ccl_objects = {'distance': 'R', 'atom_objects': ['i', 'j']}
+    context = EvaluationContext(CCLMethod(skeleton), cache, ccl_objects, default_options, message_queue)
+    plan = create_racing_plan(dataset, (0.1, 0.3), 0)
+    try:
+        vectorized.init_vectorized(dataset, context, ['R', '_term_A_i'], None, plan)
+
+        result, fidelity = vectorized.race_vectorized(EncodedIndividual('bad', '@0 @1 add inv'), 0.0)
+        assert fidelity == 0.1 and result[1] > 1e-3
+        assert message_queue.get_nowait()[0] == 'Raced out'
+        assert cache.lookup('bad') == (None, False)
+
+        result, fidelity = vectorized.race_vectorized(EncodedIndividual('good', '@0 inv'), 0.0)
+        assert fidelity == 1.0 and result[1] < 1e-8
+        assert message_queue.get_nowait()[0] == 'Evaluated'
+        assert cache.lookup('good')[0] == result
+    finally:
+        cache.remove()
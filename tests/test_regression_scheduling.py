@@ -0,0 +1,47 @@
+"""Pytest scheduling of the evaluation tasks in the regression"""
+
+import concurrent.futures
+
+import numpy as np
+
+from ccl.regression.evaluate import EncodedIndividual
+from ccl.regression.scheduling import MIN_SAMPLES, CostScheduler, task_features
+
+
+def test_task_features():
+    ind = EncodedIndividual('x', 'exp(a) * sqrt(b)')
+    assert task_features(ind) == (1.0, 1.0, 16.0, 2.0)
+    assert task_features([ind, ind]) == (1.0, 2.0, 32.0, 4.0)
+
+
+def test_longest_first():
+    """Check that the largest tasks are run first and the results keep the order of the tasks"""
+    started = []
+
+    def evaluate(ind):
+        started.append(ind.sympy_code)
+        return len(ind.code)
+
+    tasks = [EncodedIndividual(str(i), 'x' * size) for i, size in enumerate([3, 10, 1, 7])]
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        scheduler = CostScheduler(executor, 1)
+        assert scheduler.map(evaluate, tasks) == [3, 10, 1, 7]
+
+        stats = scheduler.take_stats()
+        assert set(stats) == {'makespan', 'tail', 'util', 'slowest'}
+        assert stats['tail'] <= stats['makespan']
+        assert scheduler.take_stats()['makespan'] == 0.0
+
+    assert started == ['1', '3', '0', '2']
+
+
+def test_estimate():
+    """Check that the measured times override the size of the code"""
+    scheduler = CostScheduler(None, 1)
+    for i in range(MIN_SAMPLES):
+        # Only the expensive functions take time
+        scheduler.samples.append(((1.0, 1.0, float(i % 4), float(i % 3)), 0.5 * (i % 3)))
+
+    features = np.array([task_features(EncodedIndividual('x', 'x' * 100)),
+                         task_features(EncodedIndividual('x', 'exp(x)'))])
+    assert np.argmax(scheduler.estimate(features)) == 1
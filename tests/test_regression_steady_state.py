@@ -0,0 +1,80 @@
+"""Pytest steady-state evolution of the regression"""
+
+import concurrent.futures
+import copy
+import itertools
+import queue
+import random
+
+from deap import base, tools
+
+from ccl.regression.evaluate import EncodedIndividual
+from ccl.regression.steady_state import evolve_steady_state, insert_individual
+
+
+class FitnessMin(base.Fitness):
+    weights = (-1.0,)
+
+
+class Individual(list):
+    def __init__(self, nodes: str, value: float = None) -> None:
+        super().__init__(nodes)
+        self.sympy_code = nodes
+        self.fitness = FitnessMin((value,) if value is not None else ())
+        self.fidelity = 1.0
+
+
+class SympyPool:
+    @staticmethod
+    def generate_sympy_codes(pop):
+        for ind in pop:
+            ind.sympy_code = ''.join(ind)
+
+
+def test_insert_individual():
+    pop = [Individual('a', 1.0), Individual('b', 2.0), Individual('c', 3.0)]
+    assert not insert_individual(pop, Individual('a', 0.5))
+    assert not insert_individual(pop, Individual('d', 4.0))
+    assert insert_individual(pop, Individual('d', 0.5))
+    assert [ind.sympy_code for ind in pop] == ['a', 'b', 'd']
+
+
+def test_evolve_steady_state():
+    """Check that the budget of the generational loop is kept and one record is made per interval"""
+    random.seed(0)
+
+    def mutate(ind):
+        ind.append(random.choice('ab'))
+        return ind,
+
+    toolbox = base.Toolbox()
+    toolbox.register('clone', copy.deepcopy)
+    toolbox.register('select', lambda pop, k: random.sample(pop, k))
+    toolbox.register('mate', lambda ind1, ind2: (ind1, ind2))
+    toolbox.register('mutate', mutate)
+    toolbox.register('encode', lambda ind: EncodedIndividual(ind.sympy_code, ind.sympy_code))
+    toolbox.register('evaluate', lambda ind: (abs(len(ind.code) - 4.0),))
+
+    stats = tools.Statistics(key=lambda ind: ind.fitness.values[0])
+    stats.register('min', min)
+    hof = tools.HallOfFame(2, similar=lambda x, y: x.sympy_code == y.sympy_code)
+    logbook = tools.Logbook()
+    message_queue = queue.Queue()
+    options = {'generations': 5, 'steady_state_interval': None, 'crossover_probability': 0.0,
+               'mutation_probability': 1.0, 'early_exit': False}
+
+    # Generations of the wanted individuals are zero-based as in the generational loop
+    wanted = dict.fromkeys(''.join(x) for n in range(3, 10) for x in itertools.product('ab', repeat=n))
+
+    pop = [Individual(code) for code in ['a', 'b', 'ab', 'ba']]
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        toolbox.register('map', executor.map)
+        toolbox.register('submit', executor.submit)
+        evolve_steady_state(pop, toolbox, options, SympyPool(), None, hof, stats, logbook, message_queue, wanted, 2)
+
+    assert len(pop) == 4
+    assert logbook.select('gen') == [0, 1, 2, 3, 4, 5]
+    assert sum(logbook.select('evals')[1:]) <= 5 * 4
+    assert logbook.select('min') == sorted(logbook.select('min'), reverse=True)
+    assert hof[0].fitness.values == (0.0,)
+    assert min(gen for gen in wanted.values() if gen is not None) == 0
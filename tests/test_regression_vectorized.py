@@ -0,0 +1,98 @@
+"""Pytest NumPy evaluator of the regression"""
+
+import numpy as np
+import pytest
+
+from ccl.method import CCLMethod
+from ccl.regression.dataset import read_element_properties
+from ccl.regression.interpreter import create_program_skeleton
+from ccl.regression.vectorized import VectorizedEvaluator, check_skeleton, get_evaluator_key
+
+# Neutral parameters and charges of the tests not checking the charges themselves
+parameters = {'O': [1.0, 1.0], 'H': [1.0, 1.0]}
+charges = [-0.8, 0.4, 0.4]
+
+
+def test_vectorized_evaluator(skeleton, eem_water, water_dataset):
+    """Check that the charges are equal to the ones of the EEM method"""
+    eem_parameters, eem_charges = eem_water
+    dataset = water_dataset(eem_parameters, eem_charges)
+    method = create_program_skeleton(CCLMethod(skeleton), ['R', '_term_A_i'], {'distance': 'R',
+                                                                               'atom_objects': ['i', 'j']})
+    evaluator = VectorizedEvaluator(method, dataset)
+
+    assert np.allclose(evaluator.calculate_charges('@0 inv'), eem_charges)
+    rmsd, r2, dmax, davg = evaluator.evaluate('@0 inv')
+    assert rmsd < 1e-8 and r2 > 0.9999
+    assert evaluator.evaluate('@0 @1 add inv')[0] > 1e-3
+
+
+property_skeleton = '''\
+name EEM
+
+q = EE[i, j](B[i], {}, -A[i] - chi[i])
+
+where
+
+A is atom parameter
+B is atom parameter
+R is distance
+chi is electronegativity
+'''
+
+
+def test_element_property(eem_water, water_dataset):
+    """Check that the element properties are evaluated, the parameters are shifted by the electronegativity"""
+    eem_parameters, eem_charges = eem_water
+    electronegativity = read_element_properties()['electronegativity']
+    dataset = water_dataset({e: [a - electronegativity[e], b] for e, (a, b) in eem_parameters.items()}, eem_charges)
+    terminals = ['R', '_term_chi_i']
+    check_skeleton(CCLMethod(property_skeleton), dataset, terminals, {'distance': 'R', 'atom_objects': ['i', 'j']})
+
+    method = create_program_skeleton(CCLMethod(property_skeleton), terminals, {'distance': 'R',
+                                                                                'atom_objects': ['i', 'j']})
+    evaluator = VectorizedEvaluator(method, dataset)
+    assert np.allclose(evaluator.calculate_charges('@0 inv'), eem_charges)
+
+
+def test_evaluator_key(skeleton, water_dataset):
+    """Check that the fitness on a coreset is not stored under the key of the whole dataset"""
+    dataset = water_dataset(parameters, charges, ['water', 'water'])
+    method = CCLMethod(skeleton)
+    keys = {get_evaluator_key(method, dataset, ['R']),
+            get_evaluator_key(method, dataset.subset([0], np.array([2.0])), ['R']),
+            get_evaluator_key(method, dataset.subset([0, 1], np.array([1.0, 1.0])), ['R']),
+            get_evaluator_key(method, dataset.subset([0, 1], np.array([0.5, 1.5])), ['R'])}
+    assert len(keys) == 4
+
+
+loop_skeleton = '''\
+name Loop
+
+for each atom i:
+    x[i] = A[i]
+done
+
+for each atom i:
+    x[i] = {}
+done
+
+for each atom i:
+    q[i] = x[i] * {{}}
+done
+
+where
+
+A is atom parameter
+B is atom parameter
+j is atom
+'''
+
+
+def test_loop_dependency(water_dataset):
+    """Check that the loop reading the values written by its other iterations is rejected"""
+    dataset = water_dataset(parameters, charges)
+    ccl_objects = {'atom_objects': ['i', 'j']}
+    check_skeleton(CCLMethod(loop_skeleton.format('x[i] + B[i]')), dataset, ['_term_A_i'], ccl_objects)
+    with pytest.raises(RuntimeError, match='reads x written by its other iterations'):
+        check_skeleton(CCLMethod(loop_skeleton.format('sum[j](x[j]) + B[i]')), dataset, ['_term_A_i'], ccl_objects)
@@ -0,0 +1,60 @@
+import collections
+import random
+import sys
+import time
+from typing import Dict, List
+
+from ccl.method import CCLMethod
+from ccl.regression.canonical import Canonicalizer
+from ccl.regression.deap_gp import gen_half_and_half
+from ccl.regression.evaluate import generate_sympy_code
+from ccl.regression.init_gp import prepare_primitive_set
+from ccl.regression.options import default_options
+from ccl.symboltable import SymbolTable
+
+
+def count_disagreements(codes: List[str], other_codes: List[str]) -> int:
+    """Return the number of individuals with the same code whose other codes differ"""
+    groups: Dict[str, set] = collections.defaultdict(set)
+    for code, other_code in zip(codes, other_codes):
+        groups[code].add(other_code)
+
+    return sum(len(other) - 1 for other in groups.values())
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(f'Usage: {sys.argv[0]} skeleton.ccl [population size] [seed]', file=sys.stderr)
+        sys.exit(1)
+
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    method = CCLMethod.from_file(sys.argv[1])
+    expr = method.get_regression_expr()
+    rng = random.Random(seed)
+    options = {**default_options, 'allow_random_constants': True, 'use_math_functions': True}
+    pset, ccl_objects = prepare_primitive_set(SymbolTable.get_table_for_node(expr), expr, rng, options)
+    pop = [gen_half_and_half(pset, 1, 6, rng=rng) for _ in range(size)]
+
+    canonicalizer = Canonicalizer(ccl_objects)
+    start = time.perf_counter()
+    native_codes = [canonicalizer.code(x) for x in pop]
+    native_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sympy_codes = [generate_sympy_code(x, ccl_objects) for x in pop]
+    sympy_time = time.perf_counter() - start
+
+    print(f'Individuals      : {size}')
+    print(f'Native           : {native_time / size * 1e6:10.1f} us per individual, '
+          f'{len(set(native_codes))} unique')
+    print(f'Sympy            : {sympy_time / size * 1e6:10.1f} us per individual, '
+          f'{len(set(sympy_codes))} unique')
+    print(f'Speedup          : {sympy_time / native_time:10.1f}x')
+    print(f'Merged by native only: {count_disagreements(native_codes, sympy_codes)}')
+    print(f'Merged by sympy only : {count_disagreements(sympy_codes, native_codes)}')
+
+
+if __name__ == '__main__':
+    main()